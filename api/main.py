@@ -1,3 +1,5 @@
+import asyncio
+import os
 from fastapi import FastAPI
 from temporalio.client import Client
 from contextlib import asynccontextmanager
@@ -6,22 +8,36 @@ from fastapi.middleware.cors import CORSMiddleware
 from .utils import sio
 from socketio import ASGIApp
 from .utils import set_client
-from config.configuration import TEMPORAL_ADDRESS
+from temporal.codec import connect_client
+from config.configuration import WORKFLOW_RUN_RECONCILE_INTERVAL_SECONDS
+from .services.workflow_run_service import run_workflow_run_reconciler
+from db.session import engine
 
 # Global Temporal client
 client: Client = None
 
 
-# Lifespan để kết nối Temporal
+# Lifespan để kết nối Temporal và chạy tiến trình đồng bộ bảng workflow_runs.
+# Chạy riêng trong từng process API (`uvicorn --workers N`): mỗi process có Temporal client, connection pool DB
+# và status hub của mình; Socket.IO giữa các process đi qua `SOCKETIO_MESSAGE_QUEUE`.
+# Mọi process đều khởi động reconciler nhưng chỉ process giữ lease `service_leases` mới thực sự đồng bộ.
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     global client
-    client = await Client.connect(TEMPORAL_ADDRESS)
+    client = await connect_client()
     set_client(client)
-    print("✅ Temporal client connected.")
+    print(f"✅ Temporal client connected (pid {os.getpid()}).")
+    reconciler = asyncio.create_task(run_workflow_run_reconciler(client)) if WORKFLOW_RUN_RECONCILE_INTERVAL_SECONDS > 0 else None
     yield
-    await client.close()
-    print("🛑 Temporal client closed.")
+    if reconciler is not None:
+        reconciler.cancel()
+        # Chờ reconciler trả lease trước khi đóng connection pool
+        await asyncio.gather(reconciler, return_exceptions=True)
+    # Temporal client không có close(): kết nối được giải phóng khi không còn tham chiếu
+    set_client(None)
+    client = None
+    await engine.dispose()
+    print(f"🛑 Temporal client released (pid {os.getpid()}).")
 
 
 # Tạo FastAPI app riêng
@@ -1,13 +1,65 @@
-from db.models import Base
+import argparse
+
+from sqlalchemy import func, select, text
+
+from db.models import Base, XmlFile
 from db.session import engine
 
 
-async def migrate():
+class XmlFileConflictError(RuntimeError):
+    """
+    Bảng `xml_files` có nhiều bản ghi cùng `(module, filename)` nên không tạo được unique index.
+    """
+
+
+def _xml_file_conflicts(conn) -> list[tuple[str, str, list[int]]]:
+    duplicated = select(XmlFile.module, XmlFile.filename).group_by(XmlFile.module, XmlFile.filename).having(func.count() > 1).subquery()
+    rows = conn.execute(select(XmlFile.module, XmlFile.filename, XmlFile.id).join(duplicated, (XmlFile.module == duplicated.c.module) & (XmlFile.filename == duplicated.c.filename)).order_by(XmlFile.module, XmlFile.filename, XmlFile.id))
+    conflicts = {}
+    for module, filename, xml_file_id in rows:
+        conflicts.setdefault((module, filename), []).append(xml_file_id)
+    return [(module, filename, ids) for (module, filename), ids in conflicts.items()]
+
+
+def _ensure_xml_file_unique_index(conn, dedupe: bool = False):
+    """
+    Chuẩn bị bảng `xml_files` đã tồn tại từ trước cho khóa `(module, filename)` (`create_all` không sửa bảng cũ):
+
+    - Đổi `module` NULL thành `""` và (PostgreSQL) đặt cột `NOT NULL DEFAULT ''`; SQLite không đổi được ràng buộc cột,
+      nhưng mọi chỗ ghi đều đi qua `xml_file_row` nên không ghi NULL.
+    - Nếu còn bản ghi trùng khóa: mặc định dừng migrate và liệt kê các bản ghi trùng để xử lý tay; với `dedupe=True`
+      (`python -m api.migrate --dedupe-xml-files`) xóa bản ghi cũ, giữ bản ghi mới nhất (`id` lớn nhất) và in ra từng bản ghi đã xóa.
+    - Tạo unique index `uq_xml_files_module_filename`. Chạy lại nhiều lần không sao.
+    """
+    backfilled = conn.execute(XmlFile.__table__.update().where(XmlFile.module.is_(None)).values(module="")).rowcount
+    if backfilled:
+        print(f"xml_files: {backfilled} bản ghi module NULL -> ''")
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("ALTER TABLE xml_files ALTER COLUMN module SET DEFAULT '', ALTER COLUMN module SET NOT NULL"))
+
+    conflicts = _xml_file_conflicts(conn)
+    if conflicts and not dedupe:
+        details = "\n".join(f"  module={module!r} filename={filename!r} ids={ids}" for module, filename, ids in conflicts)
+        raise XmlFileConflictError(f"xml_files có {len(conflicts)} khóa (module, filename) trùng, không tạo được unique index:\n{details}\nXử lý các bản ghi trên, hoặc chạy `python -m api.migrate --dedupe-xml-files` để giữ bản ghi có id lớn nhất.")
+    for module, filename, ids in conflicts:
+        removed = ids[:-1]
+        conn.execute(XmlFile.__table__.delete().where(XmlFile.id.in_(removed)))
+        print(f"xml_files: module={module!r} filename={filename!r} giữ id={ids[-1]}, xóa ids={removed}")
+
+    for index in XmlFile.__table__.indexes:
+        index.create(conn, checkfirst=True)
+
+
+async def migrate(dedupe_xml_files: bool = False):
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_ensure_xml_file_unique_index, dedupe_xml_files)
 
 
 if __name__ == "__main__":
     import asyncio
 
-    asyncio.run(migrate())
+    parser = argparse.ArgumentParser(description="Tạo/cập nhật schema cơ sở dữ liệu.")
+    parser.add_argument("--dedupe-xml-files", action="store_true", help="Xóa bản ghi xml_files trùng (module, filename), giữ bản ghi có id lớn nhất")
+    args = parser.parse_args()
+    asyncio.run(migrate(dedupe_xml_files=args.dedupe_xml_files))
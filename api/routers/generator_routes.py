@@ -1,7 +1,7 @@
 # generator_route.py
-from fastapi import APIRouter, File, UploadFile, Depends, Request, Body
+from fastapi import APIRouter, File, UploadFile, Depends, Request, Body, Query, Header
 from typing import Any, List
-from ..services.generator_service import start_generate, download_result, get_all_workflows, get_workflows_by_page, start_raw_generate, get_workflow_result
+from ..services.generator_service import start_generate, download_result, get_all_workflows, get_workflows_by_page, get_workflow_statuses, start_raw_generate, get_workflow_result, start_stored_generate, stream_workflow_progress, client_key_from_request, get_admission_status, update_admission_limits
 from ..utils import get_client
 from temporalio.client import Client
 
@@ -9,54 +9,72 @@ router = APIRouter()
 
 
 @router.post("/generate_fe/")
-async def generate_fe(templates: List[UploadFile] = File(...), client: Client = Depends(get_client)):
-    return await start_generate(templates, "FE", client=client)
+async def generate_fe(templates: List[UploadFile] = File(...), client: Client = Depends(get_client), request: Request = None, priority: str = None):
+    return await start_generate(templates, "FE", client=client, client_key=client_key_from_request(request), priority=priority)
 
 
 @router.post("/generate_be/")
-async def generate_be(templates: List[UploadFile] = File(...), client: Client = Depends(get_client), request: Request = None):
+async def generate_be(templates: List[UploadFile] = File(...), client: Client = Depends(get_client), request: Request = None, priority: str = None):
     form = await request.form()
     kwargs = dict(form)
     kwargs = {k: v for k, v in kwargs.items() if k not in ["templates", "client"]}
-    return await start_generate(templates, "BE", client=client, kw=kwargs)
+    priority = priority or kwargs.pop("priority", None)
+    return await start_generate(templates, "BE", client=client, client_key=client_key_from_request(request), priority=priority, kw=kwargs)
 
 
 @router.post("/generate_ut/")
-async def generate_be(templates: List[UploadFile] = File(...), client: Client = Depends(get_client)):
-    return await start_generate(templates, "UT", client=client)
+async def generate_be(templates: List[UploadFile] = File(...), client: Client = Depends(get_client), request: Request = None, priority: str = None):
+    return await start_generate(templates, "UT", client=client, client_key=client_key_from_request(request), priority=priority)
 
 
 @router.post("/generate_raw_fe/")
-async def generate_raw_fe(templates: List[dict] = Body(...), client: Client = Depends(get_client)):
-    return await start_raw_generate(templates, "FE", client=client)
+async def generate_raw_fe(templates: List[dict] = Body(...), client: Client = Depends(get_client), request: Request = None, priority: str = None):
+    return await start_raw_generate(templates, "FE", client=client, client_key=client_key_from_request(request), priority=priority)
 
 
 @router.post("/generate_raw_be/")
-async def generate_raw_be(body: Any = Body(...), client: Client = Depends(get_client)):
+async def generate_raw_be(body: Any = Body(...), client: Client = Depends(get_client), request: Request = None, priority: str = None):
     templates = body
     kwargs = {}
     if isinstance(body, dict):
         templates = body.get("templates", body.get("template", []))
         kwargs = body.get("kw", {})
-    return await start_raw_generate(templates, "BE", client=client, kw=kwargs)
+        priority = priority or body.get("priority")
+    return await start_raw_generate(templates, "BE", client=client, client_key=client_key_from_request(request), priority=priority, kw=kwargs)
 
 
 @router.post("/generate_raw_ut/")
-async def generate_raw_be(templates: List[dict] = Body(...), client: Client = Depends(get_client)):
-    return await start_raw_generate(templates, "UT", client=client)
+async def generate_raw_be(templates: List[dict] = Body(...), client: Client = Depends(get_client), request: Request = None, priority: str = None):
+    return await start_raw_generate(templates, "UT", client=client, client_key=client_key_from_request(request), priority=priority)
+
+
+@router.post("/generate_stored_fe/")
+async def generate_stored_fe(body: dict = Body(...), client: Client = Depends(get_client), request: Request = None, priority: str = None):
+    return await start_stored_generate(body, "FE", client=client, client_key=client_key_from_request(request), priority=priority or body.get("priority"), kw=body.get("kw"))
+
+
+@router.post("/generate_stored_be/")
+async def generate_stored_be(body: dict = Body(...), client: Client = Depends(get_client), request: Request = None, priority: str = None):
+    return await start_stored_generate(body, "BE", client=client, client_key=client_key_from_request(request), priority=priority or body.get("priority"), kw=body.get("kw"))
+
+
+@router.post("/generate_stored_ut/")
+async def generate_stored_ut(body: dict = Body(...), client: Client = Depends(get_client), request: Request = None, priority: str = None):
+    return await start_stored_generate(body, "UT", client=client, client_key=client_key_from_request(request), priority=priority or body.get("priority"), kw=body.get("kw"))
 
 
 @router.post("/generate_xml/")
-async def generate_xml(excel_files: List[UploadFile] = File(...), client: Client = Depends(get_client), request: Request = None):
+async def generate_xml(excel_files: List[UploadFile] = File(...), client: Client = Depends(get_client), request: Request = None, priority: str = None):
     form = await request.form()
     kwargs = dict(form)
     kwargs = {k: v for k, v in kwargs.items() if k not in ["excel_files", "client"]}
-    return await start_generate(excel_files, "XML", client=client, kw=kwargs)
+    priority = priority or kwargs.pop("priority", None)
+    return await start_generate(excel_files, "XML", client=client, client_key=client_key_from_request(request), priority=priority, kw=kwargs)
 
 
 @router.get("/download/{workflow_id}")
-async def download_file(workflow_id: str, client=Depends(get_client)):
-    return await download_result(workflow_id, client=client)
+async def download_file(workflow_id: str, request: Request, client=Depends(get_client)):
+    return await download_result(workflow_id, client=client, request=request)
 
 
 @router.get("/result/{workflow_id}")
@@ -64,11 +82,31 @@ async def workflow_result(workflow_id: str, client=Depends(get_client)):
     return await get_workflow_result(workflow_id, client=client)
 
 
+@router.get("/progress/{workflow_id}")
+async def workflow_progress(workflow_id: str, request: Request, client=Depends(get_client)):
+    return await stream_workflow_progress(workflow_id, client=client, request=request)
+
+
 @router.get("/workflows")
-async def list_all_temporal(client: Client = Depends(get_client), status: str = None):
-    return await get_all_workflows(client, status=status)
+async def list_all_temporal(client: Client = Depends(get_client), status: str = None, workflow_type: str = None):
+    return await get_all_workflows(client, status=status, workflow_type=workflow_type)
 
 
 @router.get("/workflows/page")
-async def list_temporal_by_page(client: Client = Depends(get_client), page_size: int = 50, next_token: str = None, status: str = None):
-    return await get_workflows_by_page(client, page_size=page_size, next_page_token=next_token, status=status)
+async def list_temporal_by_page(client: Client = Depends(get_client), page_size: int = Query(50, ge=1, le=500), next_token: str = None, status: str = None, workflow_type: str = None):
+    return await get_workflows_by_page(client, page_size=page_size, next_page_token=next_token, status=status, workflow_type=workflow_type)
+
+
+@router.post("/workflows/status")
+async def workflow_statuses(workflow_ids: List[str] = Body(..., embed=True), client: Client = Depends(get_client)):
+    return await get_workflow_statuses(workflow_ids, client=client)
+
+
+@router.get("/admission")
+async def admission_status():
+    return await get_admission_status()
+
+
+@router.put("/admission")
+async def admission_update(limits: dict = Body(...), x_admin_token: str = Header(None)):
+    return await update_admission_limits(limits, admin_token=x_admin_token)
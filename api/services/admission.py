@@ -0,0 +1,491 @@
+# services/admission.py
+
+import asyncio
+import json
+import math
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+
+from config.configuration import (
+    ADMISSION_BACKEND,
+    ADMISSION_LIMITS_CACHE_SECONDS,
+    ADMISSION_MAX_IN_FLIGHT_PER_CLIENT,
+    ADMISSION_MAX_IN_FLIGHT_PER_TYPE,
+    ADMISSION_MAX_WAIT_SECONDS,
+    ADMISSION_POLL_INTERVAL_SECONDS,
+    ADMISSION_QUEUE_SIZE,
+    ADMISSION_RETRY_AFTER_SECONDS,
+    ADMISSION_SLOT_TTL_SECONDS,
+    ADMISSION_TYPE_LIMITS,
+    ADMISSION_WAIT_CHECK_SECONDS,
+    REDIS_URL,
+)
+from db.models import AdmissionSetting, AdmissionSlotEntry
+from db.session import async_session
+from ..utils import get_client
+from ..workflow_status import redis_asyncio
+from .status_hub import TERMINAL_STATUSES, describe_workflows
+
+RUN_SLOT = "run"
+WAIT_SLOT = "wait"
+LIMIT_KEYS = ("max_in_flight_per_type", "max_in_flight_per_client", "queue_size", "max_wait_seconds", "retry_after_seconds")
+
+
+class AdmissionRejected(Exception):
+    """
+    Yêu cầu bị từ chối vì hàng đợi đầy hoặc chờ quá `max_wait_seconds`; API trả 429 kèm `Retry-After`.
+    """
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionTicket:
+    """
+    Slot đã được cấp cho một yêu cầu. `bind(workflow_id)` sau khi start workflow thành công để slot được giữ
+    tới khi workflow kết thúc; ticket chưa bind (lỗi, hoặc yêu cầu được dedupe vào workflow cũ) được trả lại ngay.
+    """
+
+    def __init__(self, controller: "AdmissionController", workflow_type: str, client_key: str, kind: str = RUN_SLOT):
+        self.controller = controller
+        self.workflow_type = workflow_type
+        self.client_key = client_key
+        self.kind = kind
+        self.slot_id = uuid.uuid4().hex
+        self.workflow_id = None
+
+    def bind(self, workflow_id: str):
+        self.workflow_id = workflow_id
+        self.controller._track(self)
+
+
+class AdmissionStore:
+    """
+    Nơi lưu slot admission và giới hạn runtime, dùng chung cho mọi process API để một giới hạn áp dụng cho cả deployment.
+    - Mỗi slot có hạn `ttl`; process giữ slot gia hạn định kỳ (`refresh`), slot của process đã dừng tự hết hạn.
+    - Giới hạn `None` là không giới hạn; `0` là không cho thêm slot nào (dùng cho hàng đợi `queue_size` = 0).
+    """
+
+    async def add(self, ticket: AdmissionTicket, type_limit: int | None, client_limit: int | None, ttl: float) -> bool:
+        """
+        Thêm slot của `ticket` nếu số slot cùng loại (`ticket.kind`, `ticket.workflow_type`) dưới `type_limit`
+        và số slot cùng client dưới `client_limit`; kiểm tra và thêm là một thao tác nguyên tử.
+        """
+        raise NotImplementedError
+
+    async def remove(self, ticket: AdmissionTicket):
+        raise NotImplementedError
+
+    async def refresh(self, tickets: list[AdmissionTicket], ttl: float):
+        raise NotImplementedError
+
+    async def counts(self) -> dict:
+        """
+        Trả về `{"in_flight_by_type", "in_flight_by_client", "waiting_by_type"}` của các slot chưa hết hạn.
+        """
+        raise NotImplementedError
+
+    async def get_limits(self) -> dict | None:
+        raise NotImplementedError
+
+    async def set_limits(self, limits: dict):
+        raise NotImplementedError
+
+
+class MemoryAdmissionStore(AdmissionStore):
+    """
+    Slot trong process, chỉ dùng khi chạy một process API (`ADMISSION_BACKEND=memory`).
+    """
+
+    def __init__(self):
+        self.slots: dict[str, tuple[AdmissionTicket, float]] = {}
+        self.limits = None
+
+    def _live(self, kind: str) -> list[AdmissionTicket]:
+        now = time.monotonic()
+        for slot_id, (_, expires_at) in list(self.slots.items()):
+            if expires_at <= now:
+                del self.slots[slot_id]
+        return [ticket for ticket, _ in self.slots.values() if ticket.kind == kind]
+
+    async def add(self, ticket: AdmissionTicket, type_limit: int | None, client_limit: int | None, ttl: float) -> bool:
+        live = self._live(ticket.kind)
+        if type_limit is not None and sum(other.workflow_type == ticket.workflow_type for other in live) >= type_limit:
+            return False
+        if client_limit is not None and sum(other.client_key == ticket.client_key for other in live) >= client_limit:
+            return False
+        self.slots[ticket.slot_id] = (ticket, time.monotonic() + ttl)
+        return True
+
+    async def remove(self, ticket: AdmissionTicket):
+        self.slots.pop(ticket.slot_id, None)
+
+    async def refresh(self, tickets: list[AdmissionTicket], ttl: float):
+        for ticket in tickets:
+            if ticket.slot_id in self.slots:
+                self.slots[ticket.slot_id] = (ticket, time.monotonic() + ttl)
+
+    async def counts(self) -> dict:
+        running, waiting = self._live(RUN_SLOT), self._live(WAIT_SLOT)
+        return {
+            "in_flight_by_type": _count(ticket.workflow_type for ticket in running),
+            "in_flight_by_client": _count(ticket.client_key for ticket in running),
+            "waiting_by_type": _count(ticket.workflow_type for ticket in waiting),
+        }
+
+    async def get_limits(self) -> dict | None:
+        return self.limits
+
+    async def set_limits(self, limits: dict):
+        self.limits = dict(limits)
+
+
+class SqlAdmissionStore(AdmissionStore):
+    """
+    Slot trong bảng `admission_slots`, giới hạn runtime trong bảng `admission_settings`.
+    - Mỗi lần cấp slot khóa bản ghi `limits` (`SELECT ... FOR UPDATE`) nên các process đếm và thêm slot tuần tự;
+      slot hết hạn được xóa ngay trong transaction đó.
+    """
+
+    LIMITS = "limits"
+
+    def __init__(self):
+        self._limits_row_ready = False
+
+    async def _ensure_limits_row(self):
+        if self._limits_row_ready:
+            return
+        async with async_session() as session:
+            exists = (await session.execute(select(AdmissionSetting.id).where(AdmissionSetting.name == self.LIMITS))).scalar_one_or_none()
+            if exists is None:
+                session.add(AdmissionSetting(name=self.LIMITS, value=None))
+                try:
+                    await session.commit()
+                except IntegrityError:
+                    # Process khác vừa tạo bản ghi
+                    await session.rollback()
+        self._limits_row_ready = True
+
+    async def add(self, ticket: AdmissionTicket, type_limit: int | None, client_limit: int | None, ttl: float) -> bool:
+        await self._ensure_limits_row()
+        now = datetime.now(timezone.utc)
+        async with async_session() as session:
+            async with session.begin():
+                await session.execute(select(AdmissionSetting.id).where(AdmissionSetting.name == self.LIMITS).with_for_update())
+                await session.execute(delete(AdmissionSlotEntry).where(AdmissionSlotEntry.expires_at <= now))
+                live = select(func.count()).select_from(AdmissionSlotEntry).where(AdmissionSlotEntry.kind == ticket.kind)
+                if type_limit is not None and (await session.execute(live.where(AdmissionSlotEntry.workflow_type == ticket.workflow_type))).scalar() >= type_limit:
+                    return False
+                if client_limit is not None and (await session.execute(live.where(AdmissionSlotEntry.client_key == ticket.client_key))).scalar() >= client_limit:
+                    return False
+                session.add(AdmissionSlotEntry(slot_id=ticket.slot_id, kind=ticket.kind, workflow_type=ticket.workflow_type, client_key=ticket.client_key, expires_at=now + timedelta(seconds=ttl)))
+        return True
+
+    async def remove(self, ticket: AdmissionTicket):
+        async with async_session() as session:
+            await session.execute(delete(AdmissionSlotEntry).where(AdmissionSlotEntry.slot_id == ticket.slot_id))
+            await session.commit()
+
+    async def refresh(self, tickets: list[AdmissionTicket], ttl: float):
+        async with async_session() as session:
+            await session.execute(update(AdmissionSlotEntry).where(AdmissionSlotEntry.slot_id.in_([ticket.slot_id for ticket in tickets])).values(expires_at=datetime.now(timezone.utc) + timedelta(seconds=ttl)))
+            await session.commit()
+
+    async def counts(self) -> dict:
+        live = AdmissionSlotEntry.expires_at > datetime.now(timezone.utc)
+        async with async_session() as session:
+
+            async def grouped(kind: str, column) -> dict:
+                rows = await session.execute(select(column, func.count()).where(live, AdmissionSlotEntry.kind == kind).group_by(column))
+                return {key: count for key, count in rows}
+
+            return {
+                "in_flight_by_type": await grouped(RUN_SLOT, AdmissionSlotEntry.workflow_type),
+                "in_flight_by_client": await grouped(RUN_SLOT, AdmissionSlotEntry.client_key),
+                "waiting_by_type": await grouped(WAIT_SLOT, AdmissionSlotEntry.workflow_type),
+            }
+
+    async def get_limits(self) -> dict | None:
+        async with async_session() as session:
+            value = (await session.execute(select(AdmissionSetting.value).where(AdmissionSetting.name == self.LIMITS))).scalar_one_or_none()
+        return json.loads(value) if value else None
+
+    async def set_limits(self, limits: dict):
+        await self._ensure_limits_row()
+        async with async_session() as session:
+            await session.execute(update(AdmissionSetting).where(AdmissionSetting.name == self.LIMITS).values(value=json.dumps(limits)))
+            await session.commit()
+
+
+class RedisAdmissionStore(AdmissionStore):
+    """
+    Slot trong Redis: mỗi loại workflow / client là một sorted set `slot_id -> hạn`, kiểm tra và thêm slot trong một
+    script Lua nên nguyên tử giữa các process. Cần cài package `redis`.
+    """
+
+    KEY_PREFIX = "admission:"
+    # KEYS: các sorted set cần kiểm tra; ARGV: now, expires_at, slot_id, ttl rồi giới hạn của từng key (-1 = không giới hạn)
+    ADD_SCRIPT = """
+for i, key in ipairs(KEYS) do
+    redis.call('ZREMRANGEBYSCORE', key, '-inf', ARGV[1])
+    local limit = tonumber(ARGV[4 + i])
+    if limit >= 0 and redis.call('ZCARD', key) >= limit then
+        return 0
+    end
+end
+for _, key in ipairs(KEYS) do
+    redis.call('ZADD', key, ARGV[2], ARGV[3])
+    redis.call('EXPIRE', key, ARGV[4])
+end
+return 1
+"""
+
+    def __init__(self, url: str):
+        if redis_asyncio is None:
+            raise ValueError("ADMISSION_BACKEND=redis requires the `redis` package")
+        self.redis = redis_asyncio.from_url(url, decode_responses=True)
+        self.add_script = self.redis.register_script(self.ADD_SCRIPT)
+
+    def _keys(self, ticket: AdmissionTicket) -> list[str]:
+        keys = [f"{self.KEY_PREFIX}{ticket.kind}:type:{ticket.workflow_type}"]
+        if ticket.kind == RUN_SLOT:
+            keys.append(f"{self.KEY_PREFIX}{ticket.kind}:client:{ticket.client_key}")
+        return keys
+
+    async def add(self, ticket: AdmissionTicket, type_limit: int | None, client_limit: int | None, ttl: float) -> bool:
+        keys = self._keys(ticket)
+        limits = [-1 if limit is None else limit for limit in (type_limit, client_limit)][: len(keys)]
+        now = time.time()
+        return bool(await self.add_script(keys=keys, args=[now, now + ttl, ticket.slot_id, math.ceil(ttl), *limits]))
+
+    async def remove(self, ticket: AdmissionTicket):
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key in self._keys(ticket):
+                pipe.zrem(key, ticket.slot_id)
+            await pipe.execute()
+
+    async def refresh(self, tickets: list[AdmissionTicket], ttl: float):
+        expires_at = time.time() + ttl
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for ticket in tickets:
+                for key in self._keys(ticket):
+                    pipe.zadd(key, {ticket.slot_id: expires_at}, xx=True)
+                    pipe.expire(key, math.ceil(ttl))
+            await pipe.execute()
+
+    async def counts(self) -> dict:
+        counts = {"in_flight_by_type": {}, "in_flight_by_client": {}, "waiting_by_type": {}}
+        names = {(RUN_SLOT, "type"): "in_flight_by_type", (RUN_SLOT, "client"): "in_flight_by_client", (WAIT_SLOT, "type"): "waiting_by_type"}
+        now = time.time()
+        async for key in self.redis.scan_iter(match=f"{self.KEY_PREFIX}*:*:*"):
+            kind, group, name = key[len(self.KEY_PREFIX) :].split(":", 2)
+            count = await self.redis.zcount(key, f"({now}", "+inf")
+            if (kind, group) in names and count:
+                counts[names[kind, group]][name] = count
+        return counts
+
+    async def get_limits(self) -> dict | None:
+        value = await self.redis.get(self.KEY_PREFIX + "limits")
+        return json.loads(value) if value else None
+
+    async def set_limits(self, limits: dict):
+        await self.redis.set(self.KEY_PREFIX + "limits", json.dumps(limits))
+
+
+def _count(values) -> dict:
+    counts = {}
+    for value in values:
+        counts[value] = counts.get(value, 0) + 1
+    return counts
+
+
+class AdmissionController:
+    """
+    Kiểm soát số workflow sinh mã đang chạy (in-flight) để burst request không dồn hết lên worker.
+
+    - Giới hạn theo loại workflow (`type_limits`, mặc định `max_in_flight_per_type`) và theo client
+      (`max_in_flight_per_client`); giá trị 0 là không giới hạn.
+    - Khi hết slot, request chờ trong hàng đợi tối đa `queue_size` request mỗi loại, mỗi request chờ tối đa
+      `max_wait_seconds`; hàng đợi đầy hoặc chờ quá hạn thì bị từ chối ngay (429) với `Retry-After`.
+    - Slot và request đang chờ nằm trong `store` dùng chung (`ADMISSION_BACKEND`: bảng SQL hoặc Redis), nên giới hạn
+      áp dụng cho cả deployment dù chạy `API_WORKERS` process. Request đang chờ kiểm tra lại mỗi `wait_check_interval` giây,
+      và được đánh thức ngay khi process của nó trả slot.
+    - Slot được trả khi workflow kết thúc: một vòng lặp nền trong process giữ slot tra trạng thái các workflow in-flight mỗi
+      `poll_interval` giây bằng `describe_workflows` (một truy vấn visibility cho mỗi nhóm ID) và gia hạn slot thêm `slot_ttl`
+      giây; slot của process đã dừng tự hết hạn sau `slot_ttl`.
+    - `Retry-After` ước lượng từ thời gian chạy trung bình gần đây (trong process) của loại workflow đó, mặc định `retry_after_seconds`.
+    - Các giới hạn đổi được lúc runtime qua `update_limits` (ghi vào `store`); mọi process đọc lại sau tối đa `limits_cache_seconds`.
+    """
+
+    def __init__(self, store: AdmissionStore, defaults: dict, poll_interval: float, slot_ttl: float, wait_check_interval: float, limits_cache_seconds: float):
+        self.store = store
+        self.defaults = defaults
+        self.poll_interval = poll_interval
+        self.slot_ttl = slot_ttl
+        self.wait_check_interval = wait_check_interval
+        self.limits_cache_seconds = limits_cache_seconds
+        self.held: dict[str, AdmissionTicket] = {}
+        self.tracked: dict[str, tuple[AdmissionTicket, float]] = {}
+        self.avg_duration: dict[str, float] = {}
+        self.condition: asyncio.Condition = None
+        self.reaper: asyncio.Task = None
+        self._limits: tuple[dict, float] = None
+
+    def _condition(self) -> asyncio.Condition:
+        if self.condition is None:
+            self.condition = asyncio.Condition()
+        return self.condition
+
+    async def limits(self, fresh: bool = False) -> dict:
+        if not fresh and self._limits is not None and time.monotonic() - self._limits[1] < self.limits_cache_seconds:
+            return self._limits[0]
+        limits = {**self.defaults, **(await self.store.get_limits() or {})}
+        self._limits = (limits, time.monotonic())
+        return limits
+
+    @staticmethod
+    def type_limit(limits: dict, workflow_type: str) -> int:
+        return limits["type_limits"].get(workflow_type, limits["max_in_flight_per_type"])
+
+    def _retry_after(self, limits: dict, workflow_type: str) -> int:
+        average = self.avg_duration.get(workflow_type)
+        if average is None:
+            return limits["retry_after_seconds"]
+        # Thời gian trung bình để một slot được giải phóng khi mọi slot đều bận
+        return max(1, min(300, math.ceil(average / max(1, self.type_limit(limits, workflow_type)))))
+
+    async def _try_acquire(self, ticket: AdmissionTicket, limits: dict) -> bool:
+        if not await self.store.add(ticket, self.type_limit(limits, ticket.workflow_type) or None, limits["max_in_flight_per_client"] or None, self.slot_ttl):
+            return False
+        self.held[ticket.slot_id] = ticket
+        if self.reaper is None or self.reaper.done():
+            self.reaper = asyncio.create_task(self._reap())
+        return True
+
+    async def acquire(self, workflow_type: str, client_key: str) -> AdmissionTicket:
+        """
+        Cấp một slot cho `workflow_type`/`client_key`, chờ trong hàng đợi nếu cần. Raise `AdmissionRejected` khi hàng đợi đầy
+        hoặc chờ quá `max_wait_seconds`. Ticket chưa `bind` phải được trả lại bằng `release`.
+        """
+        limits = await self.limits()
+        ticket = AdmissionTicket(self, workflow_type, client_key)
+        if await self._try_acquire(ticket, limits):
+            return ticket
+
+        waiter = AdmissionTicket(self, workflow_type, client_key, WAIT_SLOT)
+        if not await self.store.add(waiter, limits["queue_size"], None, limits["max_wait_seconds"] + self.slot_ttl):
+            raise AdmissionRejected(f"Too many {workflow_type} requests in progress, queue is full", self._retry_after(limits, workflow_type))
+
+        deadline = time.monotonic() + limits["max_wait_seconds"]
+        condition = self._condition()
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise AdmissionRejected(f"Timed out waiting for a {workflow_type} slot", self._retry_after(limits, workflow_type))
+                async with condition:
+                    try:
+                        await asyncio.wait_for(condition.wait(), min(self.wait_check_interval, remaining))
+                    except asyncio.TimeoutError:
+                        pass
+                limits = await self.limits()
+                if await self._try_acquire(ticket, limits):
+                    return ticket
+        finally:
+            await self.store.remove(waiter)
+
+    async def release(self, ticket: AdmissionTicket):
+        self.held.pop(ticket.slot_id, None)
+        await self.store.remove(ticket)
+        condition = self._condition()
+        async with condition:
+            condition.notify_all()
+
+    def _track(self, ticket: AdmissionTicket):
+        self.tracked[ticket.workflow_id] = (ticket, time.monotonic())
+
+    async def _reap(self):
+        """
+        Gia hạn các slot process này đang giữ và trả slot của các workflow đã kết thúc; dừng khi không còn giữ slot nào.
+        """
+        while self.held:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.store.refresh(list(self.held.values()), self.slot_ttl)
+            except Exception as e:
+                print(f"⚠️ Admission: không gia hạn được slot: {e}")
+            if not self.tracked:
+                continue
+            try:
+                statuses = await describe_workflows(await get_client(), list(self.tracked))
+            except Exception as e:
+                print(f"⚠️ Admission: không tra được trạng thái workflow: {e}")
+                continue
+
+            for workflow_id in list(self.tracked):
+                status = statuses.get(workflow_id)
+                # Không tìm thấy (đã hết retention hoặc chưa index quá lâu) cũng coi như đã kết thúc
+                if status is not None and status["status"] not in TERMINAL_STATUSES:
+                    continue
+                ticket, started = self.tracked.pop(workflow_id)
+                duration = time.monotonic() - started
+                previous = self.avg_duration.get(ticket.workflow_type)
+                self.avg_duration[ticket.workflow_type] = duration if previous is None else 0.8 * previous + 0.2 * duration
+                await self.release(ticket)
+
+    async def update_limits(self, **limits):
+        """
+        Cập nhật giới hạn lúc runtime cho mọi process. Nhận `max_in_flight_per_type`, `max_in_flight_per_client`, `queue_size`,
+        `max_wait_seconds`, `retry_after_seconds` và `type_limits` (dict loại workflow -> giới hạn, `None` để bỏ ghi đè).
+        """
+        current = dict(await self.limits(fresh=True))
+        current["type_limits"] = dict(current["type_limits"])
+        for key in LIMIT_KEYS:
+            if limits.get(key) is not None:
+                current[key] = limits[key]
+        for workflow_type, limit in (limits.get("type_limits") or {}).items():
+            if limit is None:
+                current["type_limits"].pop(workflow_type, None)
+            else:
+                current["type_limits"][workflow_type] = limit
+        await self.store.set_limits(current)
+        self._limits = (current, time.monotonic())
+        condition = self._condition()
+        async with condition:
+            condition.notify_all()
+
+    async def snapshot(self) -> dict:
+        limits = await self.limits(fresh=True)
+        return {
+            "limits": {**limits, "type_limits": dict(limits["type_limits"])},
+            **(await self.store.counts()),
+            "avg_duration_seconds": {workflow_type: round(duration, 1) for workflow_type, duration in self.avg_duration.items()},
+        }
+
+
+@lru_cache(maxsize=1)
+def get_admission_controller() -> AdmissionController:
+    if ADMISSION_BACKEND == "memory":
+        store = MemoryAdmissionStore()
+    elif ADMISSION_BACKEND == "sql":
+        store = SqlAdmissionStore()
+    elif ADMISSION_BACKEND == "redis":
+        store = RedisAdmissionStore(REDIS_URL)
+    else:
+        raise ValueError(f"Unsupported admission backend: {ADMISSION_BACKEND}")
+
+    defaults = {
+        "max_in_flight_per_type": ADMISSION_MAX_IN_FLIGHT_PER_TYPE,
+        "max_in_flight_per_client": ADMISSION_MAX_IN_FLIGHT_PER_CLIENT,
+        "queue_size": ADMISSION_QUEUE_SIZE,
+        "max_wait_seconds": ADMISSION_MAX_WAIT_SECONDS,
+        "retry_after_seconds": ADMISSION_RETRY_AFTER_SECONDS,
+        "type_limits": dict(ADMISSION_TYPE_LIMITS),
+    }
+    return AdmissionController(store, defaults, ADMISSION_POLL_INTERVAL_SECONDS, ADMISSION_SLOT_TTL_SECONDS, ADMISSION_WAIT_CHECK_SECONDS, ADMISSION_LIMITS_CACHE_SECONDS)
@@ -0,0 +1,138 @@
+# services/artifact_cache.py
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+from functools import lru_cache
+from pathlib import Path
+
+from config.configuration import ARTIFACT_CACHE_EVICT_INTERVAL_SECONDS, ARTIFACT_CACHE_MAX_ENTRIES, ARTIFACT_CACHE_PATH, ARTIFACT_CACHE_TTL_SECONDS, BLOB_STORE_BACKEND
+from .blob_store import remove_expired
+
+
+class ArtifactCache:
+    """
+    Cache kết quả sinh mã theo từng model, khóa bởi `(artifact_kind, xml_digest, generator_version)`.
+    - Workflow tra cache trước khi lập lịch các activity `generate_*` và chỉ sinh những loại còn thiếu.
+    - Activity sinh mã ghi kết quả vào cache ngay sau khi sinh, nên lần chạy sau với cùng XML sẽ hit.
+    - Đổi mã nguồn generator làm đổi `generator_version`, các entry cũ không bao giờ được đọc lại và bị dọn dần.
+    """
+
+    def get(self, kind: str, digest: str, version: str):
+        raise NotImplementedError
+
+    def put(self, kind: str, digest: str, version: str, content):
+        raise NotImplementedError
+
+    def evict(self) -> int:
+        raise NotImplementedError
+
+
+class LocalArtifactCache(ArtifactCache):
+    """
+    Cài đặt `ArtifactCache` trên filesystem, mỗi entry là một file JSON `<root>/<key[:2]>/<key>`.
+    - LRU: mỗi lần hit cập nhật mtime của file; khi vượt `max_entries` thì xóa các entry lâu không dùng nhất.
+    - TTL trượt: entry không được ghi/đọc trong `ttl_seconds` (tính theo mtime, như LRU) bị coi là miss và xóa khi đọc,
+      hoặc bị dọn trong lần `evict()` kế tiếp; `get` và `evict` dùng cùng một quy tắc.
+    - Ghi qua file tạm + `os.replace` nên nhiều process worker có thể đọc/ghi song song; file tạm bỏ dở (worker chết giữa
+      chừng) cũ hơn `evict_interval_seconds` bị xóa trong `evict()`.
+    """
+
+    def __init__(self, root: str, max_entries: int, ttl_seconds: int, evict_interval_seconds: int):
+        self.root = Path(root).expanduser().resolve()
+        self.tmp_path = self.root / "tmp"
+        self.tmp_path.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.evict_interval_seconds = evict_interval_seconds
+        self._evict_marker = self.root / ".last_evict"
+
+    def path_for(self, kind: str, digest: str, version: str) -> Path:
+        key = hashlib.sha256(f"{kind}\0{digest}\0{version}".encode("utf-8")).hexdigest()
+        return self.root / key[:2] / key
+
+    def get(self, kind: str, digest: str, version: str):
+        """
+        Trả về nội dung đã cache, hoặc `None` nếu miss/hết hạn.
+        """
+        path = self.path_for(kind, digest, version)
+        try:
+            if time.time() - path.stat().st_mtime > self.ttl_seconds:
+                path.unlink(missing_ok=True)
+                return None
+            with path.open("r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return entry["content"]
+
+    def put(self, kind: str, digest: str, version: str, content):
+        path = self.path_for(kind, digest, version)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_path, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"created_at": time.time(), "kind": kind, "content": content}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        self.maybe_evict()
+
+    def maybe_evict(self):
+        """
+        Chạy `evict()` tối đa một lần mỗi `evict_interval_seconds` trên toàn bộ các process dùng chung thư mục cache.
+        """
+        try:
+            last_evict = self._evict_marker.stat().st_mtime
+        except FileNotFoundError:
+            last_evict = 0
+        if time.time() - last_evict < self.evict_interval_seconds:
+            return
+        self._evict_marker.touch()
+        self.evict()
+
+    def evict(self) -> int:
+        """
+        Xóa các entry không được dùng trong `ttl_seconds`, sau đó xóa các entry ít dùng gần đây nhất
+        cho tới khi còn tối đa `max_entries`, và các file tạm bỏ dở cũ hơn `evict_interval_seconds`. Trả về số file đã xóa.
+        """
+        now = time.time()
+        entries = []
+        removed = remove_expired(self.tmp_path.glob("*.tmp"), self.evict_interval_seconds)
+        for bucket in self.root.iterdir():
+            if not bucket.is_dir() or bucket == self.tmp_path:
+                continue
+            for path in bucket.iterdir():
+                try:
+                    mtime = path.stat().st_mtime
+                except FileNotFoundError:
+                    continue
+                if now - mtime > self.ttl_seconds:
+                    path.unlink(missing_ok=True)
+                    removed += 1
+                else:
+                    entries.append((mtime, path))
+
+        overflow = len(entries) - self.max_entries
+        if overflow > 0:
+            entries.sort()
+            for _, path in entries[:overflow]:
+                path.unlink(missing_ok=True)
+            removed += overflow
+        return removed
+
+
+@lru_cache(maxsize=1)
+def get_artifact_cache() -> ArtifactCache:
+    if BLOB_STORE_BACKEND == "local":
+        return LocalArtifactCache(ARTIFACT_CACHE_PATH, ARTIFACT_CACHE_MAX_ENTRIES, ARTIFACT_CACHE_TTL_SECONDS, ARTIFACT_CACHE_EVICT_INTERVAL_SECONDS)
+    raise ValueError(f"Unsupported artifact cache backend: {BLOB_STORE_BACKEND}")
@@ -0,0 +1,112 @@
+# services/artifact_store.py
+
+import hashlib
+import os
+import re
+import tempfile
+import zipfile
+from functools import lru_cache
+from pathlib import Path
+from typing import BinaryIO
+
+from config.configuration import ARTIFACT_STORE_PATH, ARTIFACT_STORE_TTL_SECONDS, BLOB_STORE_BACKEND, STORE_SWEEP_INTERVAL_SECONDS
+from .blob_store import CHUNK_SIZE, remove_expired, sweep_due
+
+_ARTIFACT_ID_PATTERN = re.compile(r"[A-Za-z0-9][A-Za-z0-9._-]*")
+
+
+class ArtifactStore:
+    """
+    Kho lưu file ZIP kết quả của các workflow sinh mã.
+    - Activity ghi ZIP thẳng vào kho, workflow chỉ trả về tham chiếu `{artifact_id, size, sha256}`.
+    - API đọc file theo chunk để stream cho client, không cần decode base64 hay giữ cả archive trong bộ nhớ.
+    """
+
+    def write_zip(self, artifact_id: str, entries: list[dict]) -> dict:
+        raise NotImplementedError
+
+    def open(self, artifact_id: str) -> BinaryIO:
+        raise NotImplementedError
+
+    def size(self, artifact_id: str) -> int:
+        raise NotImplementedError
+
+    def exists(self, artifact_id: str) -> bool:
+        raise NotImplementedError
+
+
+class LocalArtifactStore(ArtifactStore):
+    """
+    Cài đặt `ArtifactStore` trên filesystem cục bộ, mỗi artifact là file `<root>/<artifact_id>.zip`.
+    - ZIP được ghi vào file tạm rồi `os.replace` để client không bao giờ đọc phải file ghi dở.
+    - Ghi lại cùng một `artifact_id` (ví dụ activity retry) sẽ thay thế file cũ.
+    - TTL tính từ lúc ghi: artifact (và file tạm bỏ dở) cũ hơn `ttl_seconds` bị xóa bởi `sweep()`, chạy tối đa một lần
+      mỗi `sweep_interval_seconds` sau các lần ghi. Tải kết quả đã bị dọn trả về 410; yêu cầu trùng sẽ chạy lại workflow.
+      `ttl_seconds` = 0 để giữ vĩnh viễn.
+    """
+
+    def __init__(self, root: str, ttl_seconds: int = 0, sweep_interval_seconds: int = 3600):
+        self.root = Path(root).expanduser().resolve()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self._sweep_marker = self.root / ".last_sweep"
+
+    def path_for(self, artifact_id: str) -> Path:
+        if not _ARTIFACT_ID_PATTERN.fullmatch(artifact_id or ""):
+            raise ValueError(f"Invalid artifact id: {artifact_id}")
+        return self.root / f"{artifact_id}.zip"
+
+    def write_zip(self, artifact_id: str, entries: list[dict]) -> dict:
+        """
+        Ghi danh sách `entries` (`{"path", "content"}`) thành một file ZIP và trả về tham chiếu artifact.
+        """
+        final_path = self.path_for(artifact_id)
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as raw, zipfile.ZipFile(raw, "w", zipfile.ZIP_DEFLATED) as zip_file:
+                for entry in entries:
+                    zip_file.writestr(entry["path"], entry["content"])
+
+            digest = hashlib.sha256()
+            with open(tmp_path, "rb") as f:
+                while chunk := f.read(CHUNK_SIZE):
+                    digest.update(chunk)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, final_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+        self.maybe_sweep()
+        return {"artifact_id": artifact_id, "size": size, "sha256": digest.hexdigest()}
+
+    def open(self, artifact_id: str) -> BinaryIO:
+        path = self.path_for(artifact_id)
+        if not path.exists():
+            raise FileNotFoundError(f"Artifact not found: {artifact_id}")
+        return path.open("rb")
+
+    def size(self, artifact_id: str) -> int:
+        return self.path_for(artifact_id).stat().st_size
+
+    def exists(self, artifact_id: str) -> bool:
+        return self.path_for(artifact_id).exists()
+
+    def maybe_sweep(self):
+        if self.ttl_seconds > 0 and sweep_due(self._sweep_marker, self.sweep_interval_seconds):
+            self.sweep()
+
+    def sweep(self) -> int:
+        """
+        Xóa các artifact và file tạm cũ hơn `ttl_seconds`, trả về số file đã xóa.
+        """
+        return remove_expired((*self.root.glob("*.zip"), *self.root.glob("*.tmp")), self.ttl_seconds)
+
+
+@lru_cache(maxsize=1)
+def get_artifact_store() -> ArtifactStore:
+    if BLOB_STORE_BACKEND == "local":
+        return LocalArtifactStore(ARTIFACT_STORE_PATH, ARTIFACT_STORE_TTL_SECONDS, STORE_SWEEP_INTERVAL_SECONDS)
+    raise ValueError(f"Unsupported artifact store backend: {BLOB_STORE_BACKEND}")
@@ -0,0 +1,197 @@
+# services/blob_store.py
+
+import asyncio
+import hashlib
+import os
+import re
+import tempfile
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import BinaryIO, Iterable
+
+from config.configuration import BLOB_STORE_BACKEND, BLOB_STORE_PATH, BLOB_STORE_TTL_SECONDS, STORE_SWEEP_INTERVAL_SECONDS
+
+CHUNK_SIZE = 1024 * 1024
+_SHA256_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+
+def sweep_due(marker: Path, interval_seconds: int) -> bool:
+    """
+    Trả về `True` tối đa một lần mỗi `interval_seconds` trên toàn bộ các process dùng chung thư mục chứa `marker`.
+    """
+    try:
+        last_sweep = marker.stat().st_mtime
+    except FileNotFoundError:
+        last_sweep = 0
+    if time.time() - last_sweep < interval_seconds:
+        return False
+    marker.touch()
+    return True
+
+
+def remove_expired(paths: Iterable[Path], ttl_seconds: int) -> int:
+    """
+    Xóa các file có mtime cũ hơn `ttl_seconds`, trả về số file đã xóa.
+    """
+    cutoff = time.time() - ttl_seconds
+    removed = 0
+    for path in paths:
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            continue
+    return removed
+
+
+class PendingBlob:
+    """
+    Blob đang được ghi dở vào file tạm.
+    - Tính sha256 và kích thước song song với quá trình ghi, không cần giữ toàn bộ nội dung trong bộ nhớ.
+    - `commit(filename)` chuyển file tạm vào vị trí cuối cùng theo địa chỉ nội dung và trả về tham chiếu.
+    - `discard()` xóa file tạm khi việc ghi bị lỗi giữa chừng.
+    """
+
+    def __init__(self, store: "LocalBlobStore"):
+        self.store = store
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.file = tempfile.NamedTemporaryFile(dir=store.tmp_path, delete=False)
+
+    def write(self, chunk: bytes):
+        self.digest.update(chunk)
+        self.size += len(chunk)
+        self.file.write(chunk)
+
+    def commit(self, filename: str) -> dict:
+        self.file.close()
+        sha256 = self.digest.hexdigest()
+        final_path = self.store.path_for(sha256)
+        if final_path.exists():
+            os.unlink(self.file.name)
+            # Nội dung trùng: làm mới thời điểm dùng gần nhất để blob không bị dọn khi còn được tham chiếu
+            os.utime(final_path)
+        else:
+            final_path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(self.file.name, final_path)
+        self.store.maybe_sweep()
+        return {"filename": filename, "sha256": sha256, "size": self.size}
+
+    def discard(self):
+        self.file.close()
+        if os.path.exists(self.file.name):
+            os.unlink(self.file.name)
+
+
+class BlobStore:
+    """
+    Kho blob theo địa chỉ nội dung (content-addressed) dùng cho input của các workflow sinh mã.
+    - Workflow chỉ mang tham chiếu `{filename, sha256, size}` thay vì bytes thô, nên history Temporal
+      không phình theo kích thước file tải lên.
+    - Activity đọc nội dung blob khi thực sự cần (lazy) thông qua `read_bytes` hoặc `open`.
+    - Lớp con chỉ cần cài đặt `begin`, `open` và `exists`; các hàm ghi còn lại dùng chung.
+    - Blob không có bộ đếm tham chiếu: blob không được ghi lại hay đọc trong một khoảng TTL sẽ bị dọn (xem `LocalBlobStore`).
+    """
+
+    def begin(self) -> PendingBlob:
+        raise NotImplementedError
+
+    def open(self, sha256: str) -> BinaryIO:
+        raise NotImplementedError
+
+    def exists(self, sha256: str) -> bool:
+        raise NotImplementedError
+
+    def put_stream(self, chunks: Iterable[bytes], filename: str) -> dict:
+        pending = self.begin()
+        try:
+            for chunk in chunks:
+                pending.write(chunk)
+            return pending.commit(filename)
+        except BaseException:
+            pending.discard()
+            raise
+
+    def put_bytes(self, data: bytes, filename: str) -> dict:
+        return self.put_stream([data], filename)
+
+    async def put_upload(self, upload, filename: str = None) -> dict:
+        """
+        Ghi một `UploadFile` vào kho theo từng chunk `CHUNK_SIZE`, trả về tham chiếu blob.
+        Việc ghi file và tính sha256 chạy trong thread pool để không chặn event loop khi upload file lớn.
+        """
+        pending = await asyncio.to_thread(self.begin)
+        try:
+            while chunk := await upload.read(CHUNK_SIZE):
+                await asyncio.to_thread(pending.write, chunk)
+            return await asyncio.to_thread(pending.commit, filename or upload.filename)
+        except BaseException:
+            await asyncio.to_thread(pending.discard)
+            raise
+
+    def read_bytes(self, sha256: str) -> bytes:
+        with self.open(sha256) as f:
+            return f.read()
+
+    def maybe_sweep(self):
+        pass
+
+
+class LocalBlobStore(BlobStore):
+    """
+    Cài đặt `BlobStore` trên filesystem cục bộ.
+    - Blob được lưu tại `<root>/<2 ký tự đầu sha256>/<sha256>`.
+    - File tạm nằm trong `<root>/tmp` để `os.replace` luôn là thao tác atomic trên cùng filesystem.
+    - Nội dung trùng nhau chỉ được lưu một lần.
+    - TTL trượt: mỗi lần ghi lại (nội dung trùng) hoặc đọc blob đều cập nhật mtime; blob không được dùng trong
+      `ttl_seconds` (cùng file tạm bỏ dở) bị xóa bởi `sweep()`, chạy tối đa một lần mỗi `sweep_interval_seconds`
+      sau các lần ghi. Workflow đọc template qua activity khi chạy, nên TTL chỉ cần dài hơn thời gian
+      một workflow có thể nằm chờ trước khi đọc input của nó. `ttl_seconds` = 0 để giữ vĩnh viễn.
+    """
+
+    def __init__(self, root: str, ttl_seconds: int = 0, sweep_interval_seconds: int = 3600):
+        self.root = Path(root).expanduser().resolve()
+        self.tmp_path = self.root / "tmp"
+        self.tmp_path.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self._sweep_marker = self.root / ".last_sweep"
+
+    def path_for(self, sha256: str) -> Path:
+        if not _SHA256_PATTERN.fullmatch(sha256 or ""):
+            raise ValueError(f"Invalid blob sha256: {sha256}")
+        return self.root / sha256[:2] / sha256
+
+    def begin(self) -> PendingBlob:
+        return PendingBlob(self)
+
+    def open(self, sha256: str) -> BinaryIO:
+        path = self.path_for(sha256)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Blob not found: {sha256}") from None
+        return path.open("rb")
+
+    def exists(self, sha256: str) -> bool:
+        return self.path_for(sha256).exists()
+
+    def maybe_sweep(self):
+        if self.ttl_seconds > 0 and sweep_due(self._sweep_marker, self.sweep_interval_seconds):
+            self.sweep()
+
+    def sweep(self) -> int:
+        """
+        Xóa các blob và file tạm không được dùng trong `ttl_seconds`, trả về số file đã xóa.
+        """
+        buckets = [bucket for bucket in self.root.iterdir() if bucket.is_dir() and bucket != self.tmp_path]
+        return remove_expired((path for bucket in buckets for path in bucket.iterdir()), self.ttl_seconds) + remove_expired(self.tmp_path.iterdir(), self.ttl_seconds)
+
+
+@lru_cache(maxsize=1)
+def get_blob_store() -> BlobStore:
+    if BLOB_STORE_BACKEND == "local":
+        return LocalBlobStore(BLOB_STORE_PATH, BLOB_STORE_TTL_SECONDS, STORE_SWEEP_INTERVAL_SECONDS)
+    raise ValueError(f"Unsupported blob store backend: {BLOB_STORE_BACKEND}")
@@ -0,0 +1,69 @@
+import hashlib
+import json
+from datetime import datetime, timezone
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+
+from db.models import GenerationRequest
+from db.session import async_session
+from temporal.generator_version import get_generator_version
+
+
+def compute_request_hash(module: str, template_contents: list[dict], kw: dict) -> str:
+    """
+    Tính khóa dedupe của một yêu cầu sinh mã từ module, danh sách `(filename, sha256)` của các template theo đúng thứ tự upload,
+    `kw` (chuẩn hóa JSON) và phiên bản generator. Thứ tự được giữ vì kết quả phụ thuộc vào nó (FE nối `navigation.js`/`config.js`,
+    BE ghi ZIP và `__init__.py` theo thứ tự template), nên cùng bộ file nhưng khác thứ tự là hai yêu cầu khác nhau.
+    """
+    payload = {
+        "module": module,
+        "templates": [[template.get("filename"), template["sha256"]] for template in template_contents],
+        "kw": kw or {},
+        "generator_version": get_generator_version(),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+
+async def get_generation_request(request_hash: str) -> GenerationRequest | None:
+    async with async_session() as session:
+        result = await session.execute(select(GenerationRequest).where(GenerationRequest.request_hash == request_hash))
+        return result.scalar_one_or_none()
+
+
+async def reserve_generation_request(request_hash: str, module: str, workflow_id: str, stale_workflow_id: str | None = None) -> str:
+    """
+    Gắn `request_hash` với `workflow_id` mới và trả về workflow ID đang giữ hash đó.
+
+    - Chưa có bản ghi: tạo mới.
+    - Bản ghi đang trỏ tới `stale_workflow_id` (workflow cũ lỗi hoặc đã hết hạn): thay bằng `workflow_id`.
+    - Bản ghi đã bị request khác giành trước: trả về workflow ID của request đó để API gắn vào.
+    """
+    async with async_session() as session:
+        result = await session.execute(select(GenerationRequest).where(GenerationRequest.request_hash == request_hash))
+        generation = result.scalar_one_or_none()
+
+        if generation is not None and generation.workflow_id != stale_workflow_id:
+            return generation.workflow_id
+
+        if generation is not None:
+            # Compare-and-swap: chỉ thay khi bản ghi vẫn trỏ tới workflow cũ, tránh hai request cùng thay một lúc
+            swapped = await session.execute(update(GenerationRequest).where(GenerationRequest.request_hash == request_hash, GenerationRequest.workflow_id == stale_workflow_id).values(workflow_id=workflow_id, updated_at=datetime.now(timezone.utc)))
+            await session.commit()
+            if swapped.rowcount == 1:
+                return workflow_id
+            result = await session.execute(select(GenerationRequest.workflow_id).where(GenerationRequest.request_hash == request_hash))
+            return result.scalar_one()
+
+        session.add(GenerationRequest(request_hash=request_hash, module=module, workflow_id=workflow_id))
+        try:
+            await session.commit()
+        except IntegrityError:
+            await session.rollback()
+            result = await session.execute(select(GenerationRequest).where(GenerationRequest.request_hash == request_hash))
+            existing = result.scalar_one_or_none()
+            if existing is not None:
+                return existing.workflow_id
+            raise
+
+    return workflow_id
@@ -1,24 +1,40 @@
 import base64
 from io import BytesIO
-from fastapi import UploadFile, HTTPException
-from fastapi.responses import StreamingResponse
-from temporalio.client import Client
-from ..workflow_status import set_status, get_status
+from fastapi import UploadFile, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from temporalio.client import Client, WorkflowExecutionStatus, WorkflowQueryFailedError, WorkflowQueryRejectedError
+from temporalio.service import RPCError
+from ..workflow_status import set_status
+from .blob_store import CHUNK_SIZE, get_blob_store
+from .artifact_store import get_artifact_store
+from .status_hub import TERMINAL_STATUSES, describe_workflows, get_status_hub
+from .workflow_run_service import list_workflow_runs, record_workflow_started
+from .admission import AdmissionRejected, AdmissionTicket, get_admission_controller
+from .xml_file_selection import count_xml_file_selection, normalize_xml_file_selection
+from .generation_request_service import compute_request_hash, get_generation_request, reserve_generation_request
 from temporal.workflows.fe_workflow import FeCodeGenerationWorkflow
 from temporal.workflows.be_workflow import BeCodeGenerationWorkflow
 from temporal.workflows.xml_workflow import XMLGenerationWorkflow
 from temporal.workflows.unit_test_workflow import UnitTestGenerationWorkflow
 import uuid
 from typing import List, Dict
-from ..utils import sio
+from ..utils import emit_local, sio
 import asyncio
 from temporalio.client import WorkflowHandle
 from ..utils import get_client
 import json
 from temporal.constants import DEFAULT_TASK_QUEUE
-
+from temporal.lanes import BULK_PRIORITY, lane_task_queue, resolve_priority
+from config.configuration import ADMIN_API_TOKEN, PROGRESS_STREAM_HEARTBEAT_SECONDS, PROGRESS_STREAM_INTERVAL_SECONDS
+import secrets
+import time
+from contextlib import asynccontextmanager
+
+# `dedupe`: yêu cầu trùng nội dung được gắn vào workflow cũ thay vì sinh lại.
+# Chỉ bật cho FE, vì kết quả chỉ phụ thuộc template. XML (ghi DB + git sync), UT (dữ liệu DB hiện tại) và BE
+# (view đọc constraint hiện tại trong database, xem `BE_CACHEABLE_KINDS`) luôn chạy mới.
 CONFIGURATION = {
-    "FE": {"workflow": FeCodeGenerationWorkflow, "extension": "js"},
+    "FE": {"workflow": FeCodeGenerationWorkflow, "extension": "js", "dedupe": True},
     "BE": {"workflow": BeCodeGenerationWorkflow, "extension": "py"},
     "XML": {"workflow": XMLGenerationWorkflow, "extension": "xml"},
     "UT": {"workflow": UnitTestGenerationWorkflow, "extension": "zip"},
@@ -28,7 +44,7 @@ CONFIGURATION = {
 @sio.event
 async def workflow_status(sid, data):
     """
-    Lắng nghe sự kiện `workflow_status` từ client và gửi cập nhật trạng thái của các workflow theo thời gian thực.
+    Lắng nghe sự kiện `workflow_status` từ client và đăng ký socket vào hub theo dõi trạng thái workflow.
 
     - Các tham số:
         + `sid`: Session ID của client kết nối qua Socket.IO.
@@ -39,60 +55,62 @@ async def workflow_status(sid, data):
         }
     - Thực hiện:
         + Kiểm tra định dạng và nội dung của `workflow_ids`.
-        + Với mỗi workflow ID:
-            * Gọi `describe()` liên tục để lấy thông tin trạng thái của workflow.
-            * Gửi sự kiện `workflow_status_update` về cho client với các thông tin: trạng thái, thời gian bắt đầu, kết thúc, loại workflow...
-            * Dừng khi workflow kết thúc (COMPLETED, FAILED, TERMINATED, hoặc CANCELED).
-        + Tất cả workflows được theo dõi song song bằng `asyncio.gather`.
+        + Đưa socket vào room của từng workflow trong `WorkflowStatusHub`. Mỗi workflow chỉ có một poller dùng chung
+          cho mọi socket, nên số lần gọi `describe()` không tăng theo số dashboard đang mở.
+        + Poller dừng khi workflow kết thúc (COMPLETED, FAILED, TERMINATED, CANCELED, TIMED_OUT) hoặc không còn socket nào theo dõi.
 
     - Trả về:
-        + Gửi liên tục các sự kiện `workflow_status_update` cho client theo từng workflow.
+        + Sự kiện `workflow_status_update` (trạng thái, thời gian bắt đầu, kết thúc, loại workflow...) mỗi khi trạng thái thay đổi.
         + Nếu có lỗi xảy ra trong bất kỳ workflow nào, gửi sự kiện `workflow_status_error` kèm chi tiết lỗi.
     """
     workflow_ids = data.get("workflow_ids", [])
 
-    if not isinstance(workflow_ids, list) or not workflow_ids:
-        await sio.emit("workflow_status_error", {"error": "Danh sách workflow_ids không hợp lệ"}, to=sid)
+    if not _valid_workflow_ids(workflow_ids):
+        await emit_local("workflow_status_error", {"error": "Danh sách workflow_ids không hợp lệ"}, to=sid)
         return
 
     try:
-        client = await get_client()
+        await get_status_hub().subscribe(sid, workflow_ids)
+    except Exception as e:
+        await emit_local("workflow_status_error", {"error": str(e)}, to=sid)
 
-        async def track_workflow(workflow_id):
-            try:
-                handle = client.get_workflow_handle(workflow_id)
-
-                while True:
-                    info = await handle.describe()
-                    await sio.emit(
-                        "workflow_status_update",
-                        {
-                            "workflow_id": workflow_id,
-                            "status": info.status.name,
-                            "history_length": info.history_length,
-                            "close_time": info.close_time.isoformat() if info.close_time else None,
-                            "start_time": info.start_time.isoformat() if info.start_time else None,
-                            "workflow_type": info.workflow_type,
-                        },
-                        to=sid,
-                    )
-
-                    if info.status.name in ("COMPLETED", "FAILED", "TERMINATED", "CANCELED"):
-                        break
-
-                    await asyncio.sleep(2)
 
-            except Exception as e:
-                await sio.emit("workflow_status_error", {"workflow_id": workflow_id, "error": str(e)}, to=sid)
+@sio.event
+async def workflow_status_batch(sid, data):
+    """
+    Lấy trạng thái hiện tại của nhiều workflow một lần (không đăng ký theo dõi).
+
+    - `data` giống sự kiện `workflow_status`: `{"workflow_ids": [...]}`.
+    - Trả về sự kiện `workflow_status_batch_result` với `data` (danh sách payload cùng định dạng `workflow_status_update`)
+      và `missing` (các ID không tìm thấy); lỗi được gửi qua `workflow_status_error`.
+    """
+    workflow_ids = (data or {}).get("workflow_ids", [])
 
-        # Chạy tất cả workflows song song
-        await asyncio.gather(*(track_workflow(wid) for wid in workflow_ids))
+    if not _valid_workflow_ids(workflow_ids):
+        await emit_local("workflow_status_error", {"error": "Danh sách workflow_ids không hợp lệ"}, to=sid)
+        return
 
+    try:
+        await emit_local("workflow_status_batch_result", await _lookup_workflow_statuses(await get_client(), workflow_ids), to=sid)
     except Exception as e:
-        await sio.emit("workflow_status_error", {"error": str(e)}, to=sid)
+        await emit_local("workflow_status_error", {"error": str(e)}, to=sid)
+
+
+@sio.event
+async def workflow_status_unsubscribe(sid, data):
+    """
+    Ngừng theo dõi các workflow trong `data["workflow_ids"]` (bỏ trống để ngừng theo dõi tất cả).
+    """
+    workflow_ids = (data or {}).get("workflow_ids")
+    await get_status_hub().unsubscribe(sid, workflow_ids if isinstance(workflow_ids, list) else None)
+
+
+@sio.event
+async def disconnect(sid, *args):
+    await get_status_hub().unsubscribe(sid)
 
 
-async def start_raw_generate(template: List[dict], module: str = "FE", client: Client = None, kw={}):
+async def start_raw_generate(template: List[dict], module: str = "FE", client: Client = None, kw={}, client_key: str = None, priority: str = None):
     """
     Khởi động một workflow xử lý sinh dữ liệu XML từ danh sách template đầu vào.
 
@@ -101,10 +119,14 @@ async def start_raw_generate(template: List[dict], module: str = "FE", client: C
         + `module` (str): Tên module cần xử lý, mặc định là `"FE"`. Phải nằm trong `CONFIGURATION`.
         + `client` (Client): Đối tượng client kết nối tới Temporal để start workflow.
         + `kw` (dict): Tham số phụ (tùy chọn) sẽ được truyền vào workflow dưới dạng context.
+        + `client_key` (str): Định danh client dùng cho giới hạn in-flight theo client (xem `client_key_from_request`).
+        + `priority` (str): Làn `interactive` hoặc `bulk` (xem `temporal/lanes.py`); bỏ trống thì chọn theo số template.
 
     - Thực hiện:
         + Kiểm tra hợp lệ của `module` và `template`.
-        + Chuẩn hóa dữ liệu đầu vào (mã hóa content thành bytes).
+        + Xin slot từ admission controller (giới hạn workflow in-flight theo loại và theo client, chờ trong hàng đợi có giới hạn).
+        + Mã hóa content thành bytes và ghi vào blob store, workflow chỉ nhận tham chiếu `{filename, sha256, size}`.
+        + Với FE/BE: nếu đã có workflow cùng nội dung template, `kw` và phiên bản generator (đang chạy hoặc đã hoàn thành) thì trả về workflow đó kèm `deduplicated = True`.
         + Tạo `workflow_id` mới dựa trên module và UUID ngắn.
         + Đánh dấu trạng thái `processing` ban đầu.
         + Gọi `start_workflow` trên Temporal client để khởi động workflow với dữ liệu đã chuẩn hóa.
@@ -113,7 +135,8 @@ async def start_raw_generate(template: List[dict], module: str = "FE", client: C
         + Dictionary chứa mã thành công, thông điệp, và `workflow_id` nếu khởi tạo thành công.
 
     - Lỗi:
-        + Trả về mã lỗi 400 nếu thiếu dữ liệu hoặc module không hợp lệ.
+        + Trả về mã lỗi 400 nếu thiếu dữ liệu, module hoặc `priority` không hợp lệ.
+        + Trả về mã lỗi 429 kèm header `Retry-After` nếu hàng đợi admission đầy hoặc chờ quá lâu.
         + Trả về mã lỗi 500 nếu không thể khởi động workflow.
     """
     if kw is None:
@@ -125,37 +148,23 @@ async def start_raw_generate(template: List[dict], module: str = "FE", client: C
     if not template:
         raise HTTPException(status_code=400, detail="No list uploaded")
 
-    template_contents = []
-    for item in template:
-        filename = item.get("filename")
-        content = item.get("content")
-        if not filename or not content:
-            raise HTTPException(status_code=400, detail="Missing filename or content in item")
+    priority = _resolve_priority(priority, len(template))
+    async with _admit(module, client_key, priority) as ticket:
+        blob_store = get_blob_store()
+        template_contents = []
+        for item in template:
+            filename = item.get("filename")
+            content = item.get("content")
+            if not filename or not content:
+                raise HTTPException(status_code=400, detail="Missing filename or content in item")
 
-        template_contents.append({"filename": filename, "content": content.encode("utf-8")})
+            # Băm, ghi file và dọn store chạy trong threadpool, không chặn event loop
+            template_contents.append(await asyncio.to_thread(blob_store.put_bytes, content.encode("utf-8"), filename))
 
-    workflow_id = f"{module}-{uuid.uuid4().hex[:8]}"
-    set_status(workflow_id, "processing")
-
-    try:
-        handle: WorkflowHandle = await client.start_workflow(
-            CONFIGURATION[module]["workflow"].run,
-            args=[template_contents, kw],
-            id=workflow_id,
-            task_queue=DEFAULT_TASK_QUEUE,
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Workflow failed to start: {str(e)}")
-
-    return {
-        "code": 200,
-        "status": "success",
-        "message": "Tạo workflow thành công",
-        "data": {"workflow_id": workflow_id},
-    }
+        return await _start_generation_workflow(module, template_contents, kw, client, ticket, priority)
 
 
-async def start_generate(template: List[UploadFile], module: str = "FE", client: Client = None, kw={}):
+async def start_generate(template: List[UploadFile], module: str = "FE", client: Client = None, kw={}, client_key: str = None, priority: str = None):
     """
     Khởi động một workflow xử lý sinh dữ liệu XML từ danh sách file được tải lên.
 
@@ -164,10 +173,15 @@ async def start_generate(template: List[UploadFile], module: str = "FE", client:
         + `module` (str): Tên module cần xử lý, mặc định là `"FE"`. Phải nằm trong `CONFIGURATION`.
         + `client` (Client): Đối tượng Temporal client để khởi tạo workflow.
         + `kw` (dict): Tham số phụ truyền vào workflow dưới dạng context.
+        + `client_key` (str): Định danh client dùng cho giới hạn in-flight theo client (xem `client_key_from_request`).
+        + `priority` (str): Làn `interactive` hoặc `bulk` (xem `temporal/lanes.py`); bỏ trống thì chọn theo số template.
 
     - Thực hiện:
         + Kiểm tra hợp lệ của `module` và danh sách file `template`.
-        + Đọc toàn bộ nội dung các file và chuẩn hóa về danh sách dictionary gồm `filename` và `content` (dạng bytes).
+        + Xin slot từ admission controller trước khi ghi file (giới hạn workflow in-flight theo loại và theo client);
+          khi hết slot, request chờ trong hàng đợi có giới hạn, hàng đợi đầy thì trả 429 ngay.
+        + Ghi từng file vào blob store theo chunk (không đọc toàn bộ vào bộ nhớ) và chỉ truyền tham chiếu `{filename, sha256, size}` vào workflow.
+        + Với FE/BE: nếu đã có workflow cùng nội dung template, `kw` và phiên bản generator (đang chạy hoặc đã hoàn thành) thì trả về workflow đó kèm `deduplicated = True`.
         + Tạo một `workflow_id` mới dựa trên module và UUID.
         + Ghi trạng thái `processing` cho workflow.
         + Gọi `start_workflow` (không đồng bộ kết quả) để khởi tạo workflow trên Temporal.
@@ -176,7 +190,8 @@ async def start_generate(template: List[UploadFile], module: str = "FE", client:
         + Dictionary phản hồi thành công, bao gồm mã, trạng thái, thông điệp và `workflow_id`.
 
     - Lỗi:
-        + Trả về mã lỗi 400 nếu thiếu file hoặc module không hợp lệ.
+        + Trả về mã lỗi 400 nếu thiếu file, module hoặc `priority` không hợp lệ.
+        + Trả về mã lỗi 429 kèm header `Retry-After` nếu hàng đợi admission đầy hoặc chờ quá lâu.
         + Trả về mã lỗi 500 nếu khởi động workflow thất bại.
     """
     if module not in CONFIGURATION:
@@ -185,13 +200,188 @@ async def start_generate(template: List[UploadFile], module: str = "FE", client:
     if not template:
         raise HTTPException(status_code=400, detail="No files uploaded")
 
-    template_contents = []
-    for file in template:
-        content = await file.read()
-        template_contents.append({"filename": file.filename, "content": content})
+    priority = _resolve_priority(priority, len(template))
+    async with _admit(module, client_key, priority) as ticket:
+        blob_store = get_blob_store()
+        template_contents = []
+        for file in template:
+            template_contents.append(await blob_store.put_upload(file))
+
+        return await _start_generation_workflow(module, template_contents, kw or {}, client, ticket, priority)
+
 
+async def start_stored_generate(selection: dict, module: str = "FE", client: Client = None, kw: dict = None, client_key: str = None, priority: str = None):
+    """
+    Khởi động workflow sinh mã từ các XML đã lưu trong bảng `xml_files`, không cần tải lại nội dung.
+
+    - Các tham số:
+        + `selection` (dict): `{"xml_file_ids": [...]}` hoặc `{"filters": {"system", "sub_system", "module", "category"}}`.
+        + `module` (str): `"FE"`, `"BE"` hoặc `"UT"`.
+        + `client` (Client): Đối tượng Temporal client.
+        + `kw` (dict): Tham số phụ truyền vào workflow.
+        + `client_key` (str): Định danh client dùng cho giới hạn in-flight theo client.
+        + `priority` (str): Làn `interactive` hoặc `bulk`; bỏ trống thì chọn theo số file khớp selection.
+
+    - Thực hiện:
+        + Chuẩn hóa selection và kiểm tra các ID tồn tại (chỉ truy vấn cột `id`, không đọc nội dung).
+        + Workflow chỉ nhận selection (vài trăm byte); nội dung được activity `load_xml_file_templates` đọc bằng
+          một truy vấn `IN` và ghi vào blob store.
+        + Không dedupe theo nội dung như upload (nội dung chưa được đọc ở API); cache artifact theo digest XML
+          vẫn giúp các model không đổi không phải sinh lại.
+
+    - Lỗi:
+        + 400 nếu module, selection hoặc `priority` không hợp lệ.
+        + 404 nếu có ID không tồn tại hoặc bộ lọc không khớp file nào.
+        + 429 kèm header `Retry-After` nếu hàng đợi admission đầy hoặc chờ quá lâu.
+    """
+    if module not in ("FE", "BE", "UT"):
+        raise HTTPException(status_code=400, detail="Invalid module")
+
+    try:
+        selection = normalize_xml_file_selection(selection or {})
+        template_count = await count_xml_file_selection(selection)
+        if template_count == 0:
+            raise LookupError("No XmlFile matches the given filters")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    priority = _resolve_priority(priority, template_count)
+    async with _admit(module, client_key, priority) as ticket:
+        return await _start_generation_workflow(module, selection, kw or {}, client, ticket, priority)
+
+
+def client_key_from_request(request: Request) -> str:
+    """
+    Định danh client cho admission control: header `X-Client-Id` nếu có, ngược lại IP gốc
+    (phần tử đầu của `X-Forwarded-For` khi chạy sau proxy) hoặc IP kết nối.
+    """
+    if request is None:
+        return "anonymous"
+    client_id = request.headers.get("x-client-id")
+    if client_id:
+        return client_id
+    forwarded_for = request.headers.get("x-forwarded-for")
+    if forwarded_for:
+        return forwarded_for.split(",")[0].strip()
+    return request.client.host if request.client else "anonymous"
+
+
+def _resolve_priority(priority: str, template_count: int) -> str:
+    try:
+        return resolve_priority(priority, template_count)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@asynccontextmanager
+async def _admit(module: str, client_key: str, priority: str = None):
+    """
+    Giữ một slot admission trong suốt quá trình chuẩn bị và start workflow. Slot chỉ được giữ tiếp
+    (tới khi workflow kết thúc) nếu `_start_generation_workflow` đã `bind` ticket vào workflow mới.
+    Job làn bulk được tính theo loại riêng (vd. `BE_BULK`) để không chiếm slot admission của làn interactive.
+    """
+    controller = get_admission_controller()
+    workflow_type = f"{module}_BULK" if priority == BULK_PRIORITY else module
+    try:
+        ticket = await controller.acquire(workflow_type, client_key or "anonymous")
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    try:
+        yield ticket
+    finally:
+        if ticket.workflow_id is None:
+            await controller.release(ticket)
+
+
+async def get_admission_status():
+    return {"code": 200, "status": "success", "data": await get_admission_controller().snapshot()}
+
+
+def _require_admin(admin_token: str = None):
+    """
+    Kiểm tra header `X-Admin-Token` của các endpoint quản trị: 403 nếu `ADMIN_API_TOKEN` chưa cấu hình (endpoint bị tắt)
+    hoặc token không khớp.
+    """
+    if not ADMIN_API_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ADMIN_API_TOKEN is not set)")
+    if not admin_token or not secrets.compare_digest(admin_token, ADMIN_API_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+async def update_admission_limits(limits: dict, admin_token: str = None):
+    """
+    Đổi giới hạn admission lúc runtime cho mọi process API (lưu trong backend dùng chung của admission).
+    Chỉ dành cho quản trị: yêu cầu `admin_token` khớp `ADMIN_API_TOKEN` (xem `_require_admin`).
+    Nhận các khóa `max_in_flight_per_type`, `max_in_flight_per_client`, `queue_size`, `max_wait_seconds`,
+    `retry_after_seconds` (số không âm) và `type_limits` (dict loại workflow -> giới hạn không âm, `null` để bỏ ghi đè).
+    """
+    _require_admin(admin_token)
+    numeric = {"max_in_flight_per_type": int, "max_in_flight_per_client": int, "queue_size": int, "max_wait_seconds": float, "retry_after_seconds": int}
+    updates = {}
+    try:
+        for key, value in limits.items():
+            if key in numeric:
+                updates[key] = numeric[key](value)
+                if updates[key] < 0:
+                    raise ValueError(f"{key} must not be negative")
+            elif key == "type_limits":
+                updates[key] = {workflow_type.upper(): None if limit is None else int(limit) for workflow_type, limit in (value or {}).items()}
+                if any(limit is not None and limit < 0 for limit in updates[key].values()):
+                    raise ValueError("type_limits must not be negative")
+            else:
+                raise ValueError(f"Unknown admission setting: {key}")
+    except (TypeError, ValueError, AttributeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    await get_admission_controller().update_limits(**updates)
+    return await get_admission_status()
+
+
+async def _find_reusable_workflow(client: Client, workflow_id: str) -> bool:
+    """
+    Kiểm tra workflow của một yêu cầu trùng trước đó còn dùng lại được không:
+    đang chạy (gắn vào), hoặc đã hoàn thành và artifact vẫn còn trong artifact store.
+    Workflow lỗi/bị hủy hoặc đã hết hạn lưu trữ trên Temporal thì không dùng lại.
+    """
+    try:
+        handle = client.get_workflow_handle(workflow_id)
+        info = await handle.describe()
+        if info.status == WorkflowExecutionStatus.RUNNING:
+            return True
+        if info.status != WorkflowExecutionStatus.COMPLETED:
+            return False
+        artifact = (await handle.result()).get("artifact")
+        return artifact is None or get_artifact_store().exists(artifact["artifact_id"])
+    except RPCError:
+        return False
+
+
+async def _start_generation_workflow(module: str, template_contents: List[dict], kw: dict, client: Client, ticket: AdmissionTicket = None, priority: str = None):
+    """
+    Khởi động workflow sinh mã cho `template_contents` đã ghi vào blob store (hoặc selection trên bảng `xml_files`).
+
+    - Với module bật `dedupe` trong `CONFIGURATION`, yêu cầu được băm theo nội dung template, `kw` và phiên bản generator
+      (`compute_request_hash`). Nếu đã có workflow cùng hash đang chạy hoặc đã hoàn thành thì trả về workflow đó
+      (`deduplicated = True`) thay vì sinh lại.
+    - Ngược lại tạo `workflow_id` mới, ghi trạng thái `processing`, gọi `start_workflow` và ghi bản ghi `workflow_runs`.
+    - `ticket` (nếu có) được gắn vào workflow mới để slot admission được giữ tới khi workflow kết thúc.
+    - Workflow được khởi động trên task queue `default` của làn `priority`; các activity của nó đi theo cùng làn.
+    """
     workflow_id = f"{module}-{uuid.uuid4().hex[:8]}"
-    set_status(workflow_id, "processing")
+    request_hash = None
+    if CONFIGURATION[module].get("dedupe") and isinstance(template_contents, list):
+        request_hash = compute_request_hash(module, template_contents, kw)
+        existing = await get_generation_request(request_hash)
+        if existing is not None and await _find_reusable_workflow(client, existing.workflow_id):
+            return _generation_response(existing.workflow_id, deduplicated=True)
+
+        reserved_workflow_id = await reserve_generation_request(request_hash, module, workflow_id, stale_workflow_id=existing.workflow_id if existing else None)
+        if reserved_workflow_id != workflow_id:
+            return _generation_response(reserved_workflow_id, deduplicated=True)
+
+    await set_status(workflow_id, "processing")
 
     try:
         # KHÁC Ở ĐÂY — dùng start_workflow thay vì execute_workflow
@@ -199,50 +389,129 @@ async def start_generate(template: List[UploadFile], module: str = "FE", client:
             CONFIGURATION[module]["workflow"].run,
             args=[template_contents, kw],
             id=workflow_id,
-            task_queue=DEFAULT_TASK_QUEUE,
+            task_queue=lane_task_queue(DEFAULT_TASK_QUEUE, priority),
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Workflow failed to start: {str(e)}")
 
+    if ticket is not None:
+        ticket.bind(workflow_id)
+    await record_workflow_started(workflow_id, CONFIGURATION[module]["workflow"].__name__, handle.result_run_id)
+    return _generation_response(workflow_id)
+
+
+def _generation_response(workflow_id: str, deduplicated: bool = False):
     return {
         "code": 200,
         "status": "success",
         "message": "Tạo workflow thành công",
-        "data": {"workflow_id": workflow_id},
+        "data": {"workflow_id": workflow_id, "deduplicated": deduplicated},
     }
 
 
-async def download_result(workflow_id: str, client: Client):
+def _parse_range(range_header: str, size: int):
+    """
+    Phân tích header `Range` dạng một khoảng (`bytes=start-end`, `bytes=start-`, `bytes=-suffix`).
+
+    - Trả về `None` nếu không có header hoặc header có nhiều khoảng (khi đó trả toàn bộ file).
+    - Trả về tuple `(start, end)` (bao gồm cả `end`) nếu hợp lệ.
+    - Raise `HTTPException(416)` nếu khoảng nằm ngoài kích thước file.
+    """
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+
+    start_text, _, end_text = range_header[len("bytes=") :].strip().partition("-")
+    try:
+        if start_text:
+            start = int(start_text)
+            end = int(end_text) if end_text else size - 1
+        else:
+            start = max(size - int(end_text), 0)
+            end = size - 1
+    except ValueError:
+        return None
+
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, detail="Requested range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    return start, min(end, size - 1)
+
+
+def _iter_artifact(artifact_id: str, start: int, end: int):
+    with get_artifact_store().open(artifact_id) as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+async def download_result(workflow_id: str, client: Client, request: Request = None):
     """
     Tải xuống kết quả đầu ra từ một workflow đã hoàn thành dưới dạng file ZIP.
 
     - Các tham số:
         + `workflow_id` (str): ID của workflow cần truy xuất kết quả.
         + `client` (Client): Đối tượng Temporal client để lấy handle workflow.
+        + `request` (Request): Request gốc, dùng để đọc các header `Range`, `If-None-Match`, `If-Range`.
 
     - Thực hiện:
         + Lấy handle của workflow thông qua `client.get_workflow_handle`.
-        + Chờ workflow hoàn tất bằng `handle.result()`.
-        + Kiểm tra xem kết quả có trường `zip_content` (dưới dạng base64) không.
-        + Giải mã nội dung base64 thành bytes và trả về dưới dạng `StreamingResponse` với định dạng ZIP.
+        + Chờ workflow hoàn tất bằng `handle.result()` (kết quả chỉ là tham chiếu `artifact` nhỏ gọn).
+        + Stream file ZIP từ artifact store theo từng chunk, dùng `sha256` của artifact làm `ETag`.
+        + Hỗ trợ `Range` một khoảng (trả về 206) và `If-None-Match` (trả về 304).
+        + Workflow cũ trả về `zip_content` (base64) vẫn được giải mã như trước.
 
     - Trả về:
         + File ZIP chứa kết quả, gửi dưới dạng response tải xuống (`Content-Disposition: attachment`).
 
     - Lỗi:
-        + Trả về mã lỗi 500 nếu không lấy được kết quả hoặc `zip_content` không tồn tại.
+        + Trả về mã lỗi 416 nếu `Range` không hợp lệ với kích thước file.
+        + Trả về mã lỗi 410 nếu artifact đã bị dọn theo `ARTIFACT_STORE_TTL_SECONDS`.
+        + Trả về mã lỗi 500 nếu không lấy được kết quả hoặc workflow không trả về artifact.
     """
     try:
         handle = client.get_workflow_handle(workflow_id)
         result = await handle.result()  # Chờ workflow hoàn thành và lấy kết quả
-
-        zip_b64 = result.get("zip_content")
-        if not zip_b64:
-            raise HTTPException(status_code=500, detail="Workflow completed but no zip_content returned")
-
-        zip_bytes = base64.b64decode(zip_b64)
-        return StreamingResponse(content=BytesIO(zip_bytes), media_type="application/zip", headers={"Content-Disposition": 'attachment; filename="result.zip"'})
-
+        disposition = {"Content-Disposition": 'attachment; filename="result.zip"'}
+
+        artifact = result.get("artifact")
+        if not artifact:
+            zip_b64 = result.get("zip_content")
+            if not zip_b64:
+                raise HTTPException(status_code=500, detail="Workflow completed but no artifact returned")
+            zip_bytes = base64.b64decode(zip_b64)
+            return StreamingResponse(content=BytesIO(zip_bytes), media_type="application/zip", headers=disposition)
+
+        artifact_id = artifact["artifact_id"]
+        if not get_artifact_store().exists(artifact_id):
+            raise HTTPException(status_code=410, detail="Artifact has expired, please run the generation again")
+        size = get_artifact_store().size(artifact_id)
+        etag = f'"{artifact["sha256"]}"'
+        headers = {**disposition, "ETag": etag, "Accept-Ranges": "bytes"}
+        request_headers = request.headers if request is not None else {}
+
+        if request_headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
+
+        byte_range = None
+        if_range = request_headers.get("if-range")
+        if not if_range or if_range == etag:
+            byte_range = _parse_range(request_headers.get("range"), size)
+
+        if byte_range is None:
+            headers["Content-Length"] = str(size)
+            return StreamingResponse(content=_iter_artifact(artifact_id, 0, size - 1), media_type="application/zip", headers=headers)
+
+        start, end = byte_range
+        headers["Content-Length"] = str(end - start + 1)
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        return StreamingResponse(content=_iter_artifact(artifact_id, start, end), status_code=206, media_type="application/zip", headers=headers)
+
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -258,93 +527,204 @@ async def get_workflow_result(workflow_id: str, client: Client):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-async def get_workflows_by_page(client: Client, page_size: int = 50, next_page_token: str = None, status: str = None):
+async def _query_progress(handle: WorkflowHandle) -> dict | None:
+    try:
+        return await handle.query("progress")
+    except (WorkflowQueryFailedError, WorkflowQueryRejectedError, RPCError):
+        # Workflow không có query `progress` (chạy trước khi có handler) hoặc không còn worker để trả lời
+        return None
+
+
+def _sse_event(event: str, data: dict, event_id: int = None) -> str:
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def stream_workflow_progress(workflow_id: str, client: Client, request: Request):
     """
-    Lấy danh sách workflow từ Temporal theo phân trang, với tùy chọn lọc theo trạng thái.
+    Stream tiến độ của một workflow sinh mã qua Server-Sent Events.
 
     - Các tham số:
-        + `client` (Client): Đối tượng Temporal client để truy vấn workflow.
+        + `workflow_id` (str): ID workflow cần theo dõi.
+        + `client` (Client): Đối tượng Temporal client.
+        + `request` (Request): Request hiện tại, dùng để dừng stream khi client ngắt kết nối.
+
+    - Thực hiện:
+        + Mỗi `PROGRESS_STREAM_INTERVAL_SECONDS` giây lấy trạng thái workflow (qua batcher của status hub, gộp chung
+          truy vấn visibility với các poller khác) và, khi workflow đang chạy, gọi query `progress`.
+        + Chỉ gửi sự kiện `progress` khi snapshot thay đổi so với lần gửi trước (phát hiện thay đổi ở server),
+          giữa các lần đó gửi comment `: keep-alive` mỗi `PROGRESS_STREAM_HEARTBEAT_SECONDS` giây.
+        + Khi workflow kết thúc, gửi sự kiện `done` với snapshot cuối rồi đóng stream.
+
+    - Dữ liệu mỗi sự kiện: `{"workflow_id", "status", "progress"}`, trong đó `progress` gồm số model đã xử lý/tổng,
+      model đang sinh và thời gian theo từng loại artifact (`None` nếu workflow không hỗ trợ query `progress`).
+
+    - Lỗi:
+        + 404 nếu workflow không tồn tại.
+    """
+    handle = client.get_workflow_handle(workflow_id)
+    try:
+        await handle.describe()
+    except RPCError:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+
+    batcher = get_status_hub().batcher
+
+    async def events():
+        last_snapshot = None
+        last_sent = time.monotonic()
+        event_id = 0
+        while not await request.is_disconnected():
+            try:
+                status = await batcher.lookup(workflow_id)
+            except Exception as e:
+                yield _sse_event("error", {"workflow_id": workflow_id, "error": str(e)})
+                return
+            if status is None:
+                yield _sse_event("error", {"workflow_id": workflow_id, "error": "Workflow not found"})
+                return
+
+            snapshot = {"workflow_id": workflow_id, "status": status["status"], "progress": await _query_progress(handle)}
+            if snapshot["progress"] is None and last_snapshot is not None:
+                snapshot["progress"] = last_snapshot["progress"]
+
+            if status["status"] in TERMINAL_STATUSES:
+                event_id += 1
+                yield _sse_event("done", snapshot, event_id)
+                return
+
+            if snapshot != last_snapshot:
+                event_id += 1
+                yield _sse_event("progress", snapshot, event_id)
+                last_snapshot = snapshot
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= PROGRESS_STREAM_HEARTBEAT_SECONDS:
+                yield ": keep-alive\n\n"
+                last_sent = time.monotonic()
+
+            await asyncio.sleep(PROGRESS_STREAM_INTERVAL_SECONDS)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+def _valid_workflow_ids(workflow_ids) -> bool:
+    return isinstance(workflow_ids, list) and bool(workflow_ids) and all(isinstance(workflow_id, str) and workflow_id for workflow_id in workflow_ids)
+
+
+async def _lookup_workflow_statuses(client: Client, workflow_ids: List[str]) -> dict:
+    statuses = await describe_workflows(client, workflow_ids)
+    workflow_ids = list(dict.fromkeys(workflow_ids))
+    return {
+        "data": [statuses[workflow_id] for workflow_id in workflow_ids if workflow_id in statuses],
+        "missing": [workflow_id for workflow_id in workflow_ids if workflow_id not in statuses],
+    }
+
+
+async def get_workflow_statuses(workflow_ids: List[str], client: Client):
+    """
+    Lấy trạng thái của nhiều workflow bằng một truy vấn visibility `WorkflowId IN (...)` (chia nhóm nếu danh sách lớn).
+
+    - Các tham số:
+        + `workflow_ids` (List[str]): Danh sách workflow ID cần tra.
+        + `client` (Client): Đối tượng Temporal client.
+
+    - Trả về:
+        + `data`: Danh sách trạng thái theo thứ tự `workflow_ids` (bỏ trùng), cùng các trường với sự kiện `workflow_status_update`.
+        + `missing`: Các workflow ID không tồn tại.
+
+    - Lỗi:
+        + 400 nếu `workflow_ids` rỗng hoặc không phải danh sách chuỗi.
+        + 500 nếu truy vấn Temporal thất bại.
+    """
+    if not _valid_workflow_ids(workflow_ids):
+        raise HTTPException(status_code=400, detail="Danh sách workflow_ids không hợp lệ")
+
+    try:
+        result = await _lookup_workflow_statuses(client, workflow_ids)
+    except RPCError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"code": 200, "status": "success", **result}
+
+
+async def get_workflows_by_page(client: Client, page_size: int = 50, next_page_token: str = None, status: str = None, workflow_type: str = None):
+    """
+    Lấy danh sách workflow theo phân trang từ bảng `workflow_runs`, với tùy chọn lọc theo trạng thái và loại workflow.
+
+    - Các tham số:
+        + `client` (Client): Giữ để tương thích chữ ký; dữ liệu được đọc từ DB, không truy vấn Temporal.
         + `page_size` (int): Số lượng workflow mỗi trang. Mặc định là 50.
-        + `next_page_token` (str): Token phân trang dùng để lấy trang tiếp theo. Mặc định là None.
-        + `status` (str): Trạng thái của workflow để lọc (chấp nhận: "running", "completed", "failed", "terminated", "cancelled"). Mặc định là None.
+        + `next_page_token` (str): Cursor keyset trả về ở trang trước. Mặc định là None (trang đầu).
+        + `status` (str): Trạng thái để lọc (chấp nhận: "running", "completed", "failed", "terminated", "cancelled", "timed_out"). Mặc định là None.
+        + `workflow_type` (str): Tên loại workflow để lọc (vd. "BeCodeGenerationWorkflow"). Mặc định là None.
 
     - Thực hiện:
-        + Xây dựng câu truy vấn dựa trên trạng thái nếu có.
-        + Sử dụng `client.list_workflows` để duyệt từng workflow theo trang.
-        + Lấy các trường thông tin cơ bản: `workflow_id`, `run_id`, `status`, `start_time`, `close_time`, `history_length`, `workflow_type`.
+        + Bảng `workflow_runs` được ghi khi API khởi động workflow và được tiến trình nền đồng bộ với Temporal
+          (`reconcile_workflow_runs`), nên có thể trễ tối đa `WORKFLOW_RUN_RECONCILE_INTERVAL_SECONDS` so với Temporal.
+        + Phân trang keyset theo `(start_time, workflow_id)` giảm dần: chi phí mỗi trang không tăng theo số workflow đã chạy.
+        + Các trường trả về: `workflow_id`, `run_id`, `status`, `start_time`, `close_time`, `history_length`, `workflow_type`.
 
     - Trả về:
         + Dictionary chứa:
             * `data`: Danh sách các workflow phù hợp.
-            * `next_page_token`: Token để truy vấn trang tiếp theo (nếu còn).
+            * `next_page_token`: Cursor để truy vấn trang tiếp theo (None nếu là trang cuối).
             * `status`: Trạng thái phản hồi (luôn `"success"` nếu không lỗi).
             * `code`: Mã phản hồi (luôn `200` nếu thành công).
 
     - Lỗi:
-        + Trường hợp không truy vấn được workflow sẽ raise exception từ `Temporal client` (cần được bắt tại nơi gọi nếu cần xử lý).
-    """
-    status_enum = {"running": "Running", "completed": "Completed", "failed": "Failed", "terminated": "Terminated", "cancelled": "Cancelled"}.get(status.lower()) if status else None
-
-    query_parts = []
-    if status_enum:
-        query_parts.append(f"ExecutionStatus = '{status_enum}'")
-    query = " and ".join(query_parts) or "WorkflowType != ''"
-
-    iterator = client.list_workflows(query=query, page_size=page_size, next_page_token=next_page_token)
-
-    workflows = []
-    async for wf in iterator:
-        workflows.append(
-            {
-                "workflow_id": wf.id,
-                "run_id": wf.run_id,
-                "status": wf.status.name if wf.status else None,
-                "start_time": wf.start_time.isoformat() if wf.start_time else None,
-                "close_time": wf.close_time.isoformat() if wf.close_time else None,
-                "history_length": wf.history_length,
-                "workflow_type": wf.workflow_type,
-            }
-        )
+        + 400 nếu `status` hoặc `next_page_token` không hợp lệ.
+    """
+    try:
+        workflows, next_token = await list_workflow_runs(page_size=page_size, cursor=next_page_token, status=status, workflow_type=workflow_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    return {"data": workflows, "next_page_token": iterator.next_page_token, "status": "success", "code": 200}
+    return {"data": workflows, "next_page_token": next_token, "status": "success", "code": 200}
 
 
-async def get_all_workflows(client: Client, status: str = None, page_size: int = 100):
+async def get_all_workflows(client: Client, status: str = None, page_size: int = 100, workflow_type: str = None):
     """
-    Truy vấn toàn bộ danh sách workflow từ Temporal, với tùy chọn lọc theo trạng thái.
+    Truy vấn toàn bộ danh sách workflow từ bảng `workflow_runs`, với tùy chọn lọc theo trạng thái và loại workflow.
 
     - Các tham số:
-        + `client` (Client): Đối tượng Temporal client dùng để truy xuất workflow.
-        + `status` (str): Trạng thái để lọc workflow (ví dụ: "running", "completed", "failed", "terminated", "cancelled"). Mặc định là None (lấy tất cả).
+        + `client` (Client): Giữ để tương thích chữ ký; dữ liệu được đọc từ DB.
+        + `status` (str): Trạng thái để lọc workflow (ví dụ: "running", "completed", "failed", "terminated", "cancelled", "not_found"). Mặc định là None (lấy tất cả).
         + `page_size` (int): Số lượng workflow mỗi lần truy vấn (theo trang). Mặc định là 100.
+        + `workflow_type` (str): Tên loại workflow để lọc. Mặc định là None.
 
     - Thực hiện:
-        + Gọi `get_workflows_by_page` nhiều lần để lấy toàn bộ workflow theo từng trang.
-        + Lặp cho đến khi không còn `next_page_token`.
-        + Tích lũy kết quả vào danh sách `all_workflows`.
+        + Lấy trang đầu ngay để trả lỗi 400 khi `status` không hợp lệ.
+        + Stream phần còn lại theo từng trang keyset của `list_workflow_runs`: mỗi lần chỉ giữ một trang trong bộ nhớ,
+          thay vì tích lũy toàn bộ bảng vào một danh sách.
 
     - Trả về:
-        + Dictionary chứa:
+        + `StreamingResponse` JSON có cùng cấu trúc như trước:
             * `message`: Mô tả kết quả.
             * `data`: Danh sách tất cả workflow được lấy.
             * `status`: Chuỗi `"success"`.
             * `code`: Mã phản hồi (200 nếu thành công).
 
     - Ghi chú:
-        + Hàm này sẽ lấy toàn bộ kết quả nên có thể mất thời gian nếu workflow nhiều.
-        + Nên giới hạn hoặc phân trang lại ở phía frontend nếu dữ liệu trả về quá lớn.
+        + Frontend vẫn nên dùng `/workflows/page` khi dữ liệu lớn.
     """
-
-    all_workflows = []
-    next_token = None
-
-    while True:
-        result = await get_workflows_by_page(client, page_size=page_size, next_page_token=next_token, status=status)
-        all_workflows.extend(result["data"])
-
-        if not result["next_page_token"]:
-            break
-
-        next_token = result["next_page_token"]
-
-    return {"message": "Danh sách tất cả workflow", "data": all_workflows, "status": "success", "code": 200}
+    try:
+        workflows, next_token = await list_workflow_runs(page_size=page_size, status=status, workflow_type=workflow_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def body():
+        nonlocal workflows, next_token
+        yield '{"message": "Danh sách tất cả workflow", "data": ['
+        first = True
+        while True:
+            for workflow in workflows:
+                yield ("" if first else ", ") + json.dumps(workflow, ensure_ascii=False)
+                first = False
+            if not next_token:
+                break
+            workflows, next_token = await list_workflow_runs(page_size=page_size, cursor=next_token, status=status, workflow_type=workflow_type)
+        yield '], "status": "success", "code": 200}'
+
+    return StreamingResponse(body(), media_type="application/json")
@@ -2,7 +2,7 @@ import uuid
 
 from temporalio.client import Client
 
-from config.configuration import TEMPORAL_ADDRESS
+from temporal.codec import connect_client
 from temporal.constants import GIT_TASK_QUEUE
 from .git_job_service import mark_git_job_failed, reserve_git_job
 
@@ -17,7 +17,7 @@ async def enqueue_git_sync(direction: str, client: Client | None = None) -> str:
 
     owns_client = client is None
     if client is None:
-        client = await Client.connect(TEMPORAL_ADDRESS)
+        client = await connect_client()
 
     try:
         await client.start_workflow(
@@ -0,0 +1,50 @@
+# services/service_lease.py
+
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, or_, update
+from sqlalchemy.exc import IntegrityError
+
+from db.models import ServiceLease
+from db.session import async_session
+
+
+def lease_owner() -> str:
+    """
+    Định danh duy nhất của process hiện tại khi giữ lease (host, pid và hậu tố ngẫu nhiên để tránh trùng pid giữa các container).
+    """
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+async def acquire_lease(name: str, owner: str, ttl_seconds: float) -> bool:
+    """
+    Nhận hoặc gia hạn lease `name` cho `owner` thêm `ttl_seconds`. Trả về `True` nếu `owner` đang giữ lease.
+
+    - Lease đang thuộc `owner` hoặc đã hết hạn được cập nhật trong một câu `UPDATE` có điều kiện, nên hai process
+      không thể cùng nhận một lease đã hết hạn.
+    - Chưa có bản ghi thì insert; process thua khi cùng insert nhận `IntegrityError` và trả về `False`.
+    """
+    now = datetime.now(timezone.utc)
+    expires_at = now + timedelta(seconds=ttl_seconds)
+    async with async_session() as session:
+        result = await session.execute(update(ServiceLease).where(ServiceLease.name == name, or_(ServiceLease.owner == owner, ServiceLease.expires_at < now)).values(owner=owner, expires_at=expires_at))
+        if result.rowcount:
+            await session.commit()
+            return True
+
+        session.add(ServiceLease(name=name, owner=owner, expires_at=expires_at))
+        try:
+            await session.commit()
+            return True
+        except IntegrityError:
+            await session.rollback()
+            return False
+
+
+async def release_lease(name: str, owner: str):
+    async with async_session() as session:
+        await session.execute(delete(ServiceLease).where(ServiceLease.name == name, ServiceLease.owner == owner))
+        await session.commit()
@@ -0,0 +1,225 @@
+# services/status_hub.py
+
+import asyncio
+from collections import OrderedDict
+from functools import lru_cache
+
+from temporalio.client import Client
+from temporalio.service import RPCError, RPCStatusCode
+
+from config.configuration import STATUS_BATCH_CHUNK_SIZE, STATUS_BATCH_WINDOW_SECONDS, STATUS_POLL_BACKOFF, STATUS_POLL_MAX_INTERVAL_SECONDS, STATUS_POLL_MIN_INTERVAL_SECONDS
+from ..utils import emit_local, get_client, sio
+
+TERMINAL_STATUSES = ("COMPLETED", "FAILED", "TERMINATED", "CANCELED", "TIMED_OUT")
+# Số trạng thái cuối (workflow đã kết thúc) được giữ lại để trả ngay cho subscriber mới
+TERMINAL_CACHE_SIZE = 1024
+
+
+def workflow_status_room(workflow_id: str) -> str:
+    return f"workflow-status:{workflow_id}"
+
+
+def workflow_status_payload(workflow_id: str, info) -> dict:
+    """
+    Chuẩn hóa thông tin workflow (kết quả `describe()` hoặc một phần tử của `list_workflows`)
+    thành payload của sự kiện `workflow_status_update`.
+    """
+    return {
+        "workflow_id": workflow_id,
+        "run_id": info.run_id,
+        "status": info.status.name if info.status else None,
+        "history_length": info.history_length,
+        "close_time": info.close_time.isoformat() if info.close_time else None,
+        "start_time": info.start_time.isoformat() if info.start_time else None,
+        "workflow_type": info.workflow_type,
+    }
+
+
+def _quote(value: str) -> str:
+    return "'" + value.replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+
+async def _describe_one(client: Client, workflow_id: str) -> dict | None:
+    try:
+        return workflow_status_payload(workflow_id, await client.get_workflow_handle(workflow_id).describe())
+    except RPCError as e:
+        if e.status == RPCStatusCode.NOT_FOUND:
+            return None
+        raise
+
+
+async def _list_chunk(client: Client, workflow_ids: list[str]) -> dict[str, dict]:
+    query = f"WorkflowId IN ({', '.join(_quote(workflow_id) for workflow_id in workflow_ids)})"
+    latest = {}
+    async for execution in client.list_workflows(query=query, page_size=len(workflow_ids)):
+        # Cùng một workflow ID có thể có nhiều run (chạy lại với ID cũ), chỉ giữ run mới nhất
+        current = latest.get(execution.id)
+        if current is None or (execution.start_time and current.start_time and execution.start_time > current.start_time):
+            latest[execution.id] = execution
+    return {workflow_id: workflow_status_payload(workflow_id, execution) for workflow_id, execution in latest.items()}
+
+
+async def describe_workflows(client: Client, workflow_ids: list[str], chunk_size: int = STATUS_BATCH_CHUNK_SIZE) -> dict[str, dict]:
+    """
+    Lấy trạng thái của nhiều workflow bằng truy vấn visibility `WorkflowId IN (...)` thay vì gọi `describe()` từng cái.
+
+    - Danh sách ID được chia thành các nhóm `chunk_size` (giới hạn độ dài câu truy vấn), các nhóm chạy song song:
+      N workflow chỉ tốn khoảng N/chunk_size RPC.
+    - Visibility là eventually consistent, nên workflow vừa start có thể chưa xuất hiện; các ID còn thiếu
+      được bổ sung bằng `describe()`.
+    - Trả về dict `workflow_id -> payload` cùng định dạng sự kiện `workflow_status_update`;
+      workflow không tồn tại không có trong kết quả.
+    """
+    workflow_ids = list(dict.fromkeys(workflow_ids))
+    chunks = [workflow_ids[i : i + chunk_size] for i in range(0, len(workflow_ids), chunk_size)]
+    results = {}
+    for found in await asyncio.gather(*(_list_chunk(client, chunk) for chunk in chunks)):
+        results.update(found)
+
+    missing = [workflow_id for workflow_id in workflow_ids if workflow_id not in results]
+    for workflow_id, payload in zip(missing, await asyncio.gather(*(_describe_one(client, workflow_id) for workflow_id in missing))):
+        if payload is not None:
+            results[workflow_id] = payload
+    return results
+
+
+class WorkflowStatusBatcher:
+    """
+    Gom các yêu cầu tra trạng thái phát sinh gần nhau (trong `window` giây) thành một lần `describe_workflows`,
+    để các poller của hub không gọi `describe()` riêng lẻ cho từng workflow.
+    """
+
+    def __init__(self, window: float, chunk_size: int):
+        self.window = window
+        self.chunk_size = chunk_size
+        self.pending: dict[str, list[asyncio.Future]] = {}
+        self.flush_task: asyncio.Task = None
+
+    async def lookup(self, workflow_id: str) -> dict | None:
+        future = asyncio.get_running_loop().create_future()
+        self.pending.setdefault(workflow_id, []).append(future)
+        if self.flush_task is None:
+            self.flush_task = asyncio.create_task(self._flush())
+        return await future
+
+    async def _flush(self):
+        await asyncio.sleep(self.window)
+        pending, self.pending, self.flush_task = self.pending, {}, None
+        try:
+            results = await describe_workflows(await get_client(), list(pending), self.chunk_size)
+        except Exception as e:
+            for futures in pending.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+        for workflow_id, futures in pending.items():
+            for future in futures:
+                if not future.done():
+                    future.set_result(results.get(workflow_id))
+
+
+class WorkflowStatusHub:
+    """
+    Hub theo dõi trạng thái workflow dùng chung cho toàn bộ process API.
+
+    - Mỗi workflow ID chỉ có **một** poller, bất kể bao nhiêu socket đang theo dõi; cập nhật được phát
+      vào Socket.IO room `workflow-status:<workflow_id>` thay vì gửi riêng cho từng socket.
+    - Socket mới subscribe nhận ngay trạng thái gần nhất đã biết, không phải chờ vòng poll kế tiếp.
+    - Poller dừng khi subscriber cuối cùng rời đi hoặc workflow kết thúc.
+    - Backoff thích ứng: khởi đầu `min_interval`, mỗi lần trạng thái không đổi thì nhân `backoff`
+      (tối đa `max_interval`), có thay đổi thì quay về `min_interval`.
+    - Các poller tra trạng thái qua `WorkflowStatusBatcher`, nên các lượt poll trùng thời điểm được gộp thành một truy vấn visibility.
+    - Mỗi process API có hub riêng và chỉ phục vụ socket kết nối vào process đó, nên cập nhật được emit cục bộ
+      (`emit_local`), không đi qua message queue Socket.IO.
+    """
+
+    def __init__(self, min_interval: float, max_interval: float, backoff: float, batcher: WorkflowStatusBatcher):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.batcher = batcher
+        self.subscribers: dict[str, set[str]] = {}
+        self.pollers: dict[str, asyncio.Task] = {}
+        self.latest: dict[str, dict] = {}
+        self.terminal: OrderedDict[str, dict] = OrderedDict()
+
+    async def subscribe(self, sid: str, workflow_ids: list[str]):
+        for workflow_id in workflow_ids:
+            await sio.enter_room(sid, workflow_status_room(workflow_id))
+            self.subscribers.setdefault(workflow_id, set()).add(sid)
+
+            terminal = self.terminal.get(workflow_id)
+            if terminal is not None:
+                await emit_local("workflow_status_update", terminal, to=sid)
+                await self._leave(sid, workflow_id)
+                continue
+
+            latest = self.latest.get(workflow_id)
+            if latest is not None:
+                await emit_local("workflow_status_update", latest, to=sid)
+
+            poller = self.pollers.get(workflow_id)
+            if poller is None or poller.done():
+                self.pollers[workflow_id] = asyncio.create_task(self._poll(workflow_id))
+
+    async def unsubscribe(self, sid: str, workflow_ids: list[str] = None):
+        """
+        Hủy theo dõi `workflow_ids` của socket `sid` (mặc định là tất cả, dùng khi socket ngắt kết nối).
+        """
+        if workflow_ids is None:
+            workflow_ids = [workflow_id for workflow_id, sids in self.subscribers.items() if sid in sids]
+        for workflow_id in workflow_ids:
+            await self._leave(sid, workflow_id)
+
+    async def _leave(self, sid: str, workflow_id: str):
+        await sio.leave_room(sid, workflow_status_room(workflow_id))
+        sids = self.subscribers.get(workflow_id)
+        if sids is None:
+            return
+        sids.discard(sid)
+        if not sids:
+            del self.subscribers[workflow_id]
+            poller = self.pollers.pop(workflow_id, None)
+            if poller is not None and poller is not asyncio.current_task():
+                poller.cancel()
+
+    async def _poll(self, workflow_id: str):
+        room = workflow_status_room(workflow_id)
+        interval = self.min_interval
+        try:
+            while self.subscribers.get(workflow_id):
+                payload = await self.batcher.lookup(workflow_id)
+                if payload is None:
+                    raise LookupError(f"Workflow not found: {workflow_id}")
+                if payload != self.latest.get(workflow_id):
+                    self.latest[workflow_id] = payload
+                    await emit_local("workflow_status_update", payload, room=room)
+                    interval = self.min_interval
+                else:
+                    interval = min(interval * self.backoff, self.max_interval)
+
+                if payload["status"] in TERMINAL_STATUSES:
+                    break
+                await asyncio.sleep(interval)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await emit_local("workflow_status_error", {"workflow_id": workflow_id, "error": str(e)}, room=room)
+        finally:
+            if self.pollers.get(workflow_id) is asyncio.current_task():
+                del self.pollers[workflow_id]
+            latest = self.latest.pop(workflow_id, None)
+
+        # Workflow đã kết thúc hoặc lỗi: giải phóng room, các socket subscribe sau sẽ nhận ngay trạng thái cuối
+        if latest is not None and latest["status"] in TERMINAL_STATUSES:
+            self.terminal[workflow_id] = latest
+            while len(self.terminal) > TERMINAL_CACHE_SIZE:
+                self.terminal.popitem(last=False)
+        for sid in list(self.subscribers.get(workflow_id, ())):
+            await self._leave(sid, workflow_id)
+
+
+@lru_cache(maxsize=1)
+def get_status_hub() -> WorkflowStatusHub:
+    return WorkflowStatusHub(STATUS_POLL_MIN_INTERVAL_SECONDS, STATUS_POLL_MAX_INTERVAL_SECONDS, STATUS_POLL_BACKOFF, WorkflowStatusBatcher(STATUS_BATCH_WINDOW_SECONDS, STATUS_BATCH_CHUNK_SIZE))
@@ -0,0 +1,252 @@
+import asyncio
+import base64
+import json
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, select, tuple_, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from temporalio.client import Client
+
+from config.configuration import WORKFLOW_RUN_RECONCILE_BATCH_SIZE, WORKFLOW_RUN_RECONCILE_INTERVAL_SECONDS, WORKFLOW_RUN_RECONCILE_LEASE_SECONDS, WORKFLOW_RUN_RECONCILE_OVERLAP_SECONDS
+from db.models import WorkflowRun
+from db.session import async_session
+from .service_lease import acquire_lease, lease_owner, release_lease
+from .status_hub import TERMINAL_STATUSES, describe_workflows, workflow_status_payload
+
+# Trạng thái của bản ghi mà Temporal không còn tìm thấy (hết retention hoặc ID không tồn tại); không được làm mới nữa
+NOT_FOUND_STATUS = "NOT_FOUND"
+# Tên lease bảo đảm chỉ một process API chạy reconciler
+RECONCILER_LEASE = "workflow-run-reconciler"
+
+# Giá trị `status` chấp nhận ở API -> tên `WorkflowExecutionStatus` lưu trong bảng
+STATUS_FILTERS = {
+    "running": "RUNNING",
+    "completed": "COMPLETED",
+    "failed": "FAILED",
+    "terminated": "TERMINATED",
+    "cancelled": "CANCELED",
+    "canceled": "CANCELED",
+    "timed_out": "TIMED_OUT",
+    "not_found": NOT_FOUND_STATUS,
+}
+
+
+def _parse_time(value: str | None) -> datetime | None:
+    return datetime.fromisoformat(value) if value else None
+
+
+def _isoformat(value: datetime | None) -> str | None:
+    if value is None:
+        return None
+    if value.tzinfo is None:  # SQLite không lưu timezone, giá trị luôn là UTC
+        value = value.replace(tzinfo=timezone.utc)
+    return value.isoformat()
+
+
+def encode_cursor(run: WorkflowRun) -> str:
+    return base64.urlsafe_b64encode(json.dumps([_isoformat(run.start_time), run.workflow_id]).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    """
+    Giải mã cursor `(start_time, workflow_id)` của bản ghi cuối trang trước. Raise `ValueError` nếu cursor không hợp lệ.
+    """
+    try:
+        start_time, workflow_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(start_time), workflow_id
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def workflow_run_to_dict(run: WorkflowRun) -> dict:
+    return {
+        "workflow_id": run.workflow_id,
+        "run_id": run.run_id,
+        "status": run.status,
+        "start_time": _isoformat(run.start_time),
+        "close_time": _isoformat(run.close_time),
+        "history_length": run.history_length,
+        "workflow_type": run.workflow_type,
+    }
+
+
+async def record_workflow_started(workflow_id: str, workflow_type: str, run_id: str | None = None):
+    """
+    Ghi nhận workflow vừa được API khởi động. Lỗi DB chỉ được bỏ qua vì reconciler sẽ bổ sung bản ghi từ visibility.
+    """
+    payload = {
+        "workflow_id": workflow_id,
+        "run_id": run_id,
+        "status": "RUNNING",
+        "start_time": datetime.now(timezone.utc).isoformat(),
+        "close_time": None,
+        "history_length": None,
+        "workflow_type": workflow_type,
+    }
+    try:
+        await upsert_workflow_runs([payload])
+    except SQLAlchemyError as e:
+        print(f"⚠️ Không ghi được workflow_runs cho {workflow_id}: {e}")
+
+
+def _is_stale(run: WorkflowRun, payload: dict, start_time: datetime) -> bool:
+    """
+    Bỏ qua payload cũ hơn bản ghi: run trước của cùng workflow ID, hoặc visibility còn báo RUNNING
+    trong khi bản ghi đã ở trạng thái cuối.
+    """
+    current_start = run.start_time.replace(tzinfo=timezone.utc) if run.start_time.tzinfo is None else run.start_time
+    if payload.get("run_id") and run.run_id and payload["run_id"] != run.run_id:
+        return start_time < current_start
+    return run.status in TERMINAL_STATUSES and payload["status"] not in TERMINAL_STATUSES
+
+
+async def upsert_workflow_runs(payloads: list[dict]) -> int:
+    """
+    Thêm/cập nhật các bản ghi `workflow_runs` từ payload dạng `workflow_status_payload`. Trả về số bản ghi đã ghi.
+
+    - Chạy được trên mọi dialect (select rồi insert/update); nếu hai tiến trình cùng insert một workflow ID,
+      lần commit thất bại được thử lại một lần và đi theo nhánh update.
+    """
+    payloads = [payload for payload in payloads if payload.get("status") and payload.get("start_time")]
+    if not payloads:
+        return 0
+
+    for attempt in range(2):
+        async with async_session() as session:
+            result = await session.execute(select(WorkflowRun).where(WorkflowRun.workflow_id.in_([payload["workflow_id"] for payload in payloads])))
+            existing = {run.workflow_id: run for run in result.scalars()}
+            written = 0
+            for payload in payloads:
+                start_time = _parse_time(payload["start_time"])
+                run = existing.get(payload["workflow_id"])
+                if run is None:
+                    run = WorkflowRun(workflow_id=payload["workflow_id"])
+                    session.add(run)
+                    existing[run.workflow_id] = run
+                elif _is_stale(run, payload, start_time):
+                    continue
+
+                run.run_id = payload.get("run_id") or run.run_id
+                run.workflow_type = payload.get("workflow_type") or run.workflow_type
+                run.status = payload["status"]
+                run.start_time = start_time
+                run.close_time = _parse_time(payload.get("close_time"))
+                run.history_length = payload.get("history_length")
+                written += 1
+            try:
+                await session.commit()
+                return written
+            except IntegrityError:
+                await session.rollback()
+                if attempt:
+                    raise
+    return 0
+
+
+async def list_workflow_runs(page_size: int = 50, cursor: str = None, status: str = None, workflow_type: str = None) -> tuple[list[dict], str | None]:
+    """
+    Lấy một trang workflow từ bảng `workflow_runs`, mới nhất trước, phân trang keyset theo `(start_time, workflow_id)`.
+
+    - `cursor`: giá trị `next_page_token` của trang trước; chi phí mỗi trang không phụ thuộc vào vị trí trang.
+    - `status`: một khóa của `STATUS_FILTERS`; `workflow_type`: tên workflow (vd. `BeCodeGenerationWorkflow`).
+    - Trả về `(workflows, next_page_token)`, `next_page_token` là `None` ở trang cuối.
+    """
+    query = select(WorkflowRun)
+    if status:
+        status_name = STATUS_FILTERS.get(status.lower())
+        if status_name is None:
+            raise ValueError(f"Invalid status: {status}")
+        query = query.where(WorkflowRun.status == status_name)
+    if workflow_type:
+        query = query.where(WorkflowRun.workflow_type == workflow_type)
+    if cursor:
+        start_time, workflow_id = decode_cursor(cursor)
+        query = query.where(tuple_(WorkflowRun.start_time, WorkflowRun.workflow_id) < tuple_(start_time, workflow_id))
+    query = query.order_by(WorkflowRun.start_time.desc(), WorkflowRun.workflow_id.desc()).limit(page_size + 1)
+
+    async with async_session() as session:
+        runs = list((await session.execute(query)).scalars())
+
+    next_page_token = encode_cursor(runs[page_size - 1]) if len(runs) > page_size else None
+    return [workflow_run_to_dict(run) for run in runs[:page_size]], next_page_token
+
+
+async def reconcile_workflow_runs(client: Client, full_sweep: bool = False) -> int:
+    """
+    Đồng bộ `workflow_runs` với Temporal, trả về số bản ghi đã ghi.
+
+    - Quét visibility các workflow bắt đầu từ `max(start_time)` trong bảng (lùi lại `WORKFLOW_RUN_RECONCILE_OVERLAP_SECONDS`
+      để bù độ trễ index), bổ sung cả workflow không đi qua API (git sync...).
+    - `full_sweep=True` (hoặc bảng rỗng) quét toàn bộ visibility store theo từng lô, dùng để backfill.
+    - Cập nhật trạng thái các bản ghi chưa kết thúc bằng `describe_workflows` (một truy vấn visibility cho mỗi nhóm ID,
+      `describe()` cho các ID còn thiếu). Bản ghi mà cả hai đều không tìm thấy được đánh dấu `NOT_FOUND` và không được
+      làm mới nữa, để các bản ghi đó không chiếm mãi lô `WORKFLOW_RUN_RECONCILE_BATCH_SIZE` bản ghi cũ nhất.
+    """
+    async with async_session() as session:
+        watermark = (await session.execute(select(func.max(WorkflowRun.start_time)))).scalar()
+        pending_ids = list((await session.execute(select(WorkflowRun.workflow_id).where(WorkflowRun.status.not_in((*TERMINAL_STATUSES, NOT_FOUND_STATUS))).order_by(WorkflowRun.start_time).limit(WORKFLOW_RUN_RECONCILE_BATCH_SIZE))).scalars())
+
+    query = "WorkflowType != ''"
+    if watermark is not None and not full_sweep:
+        since = watermark.replace(tzinfo=timezone.utc) if watermark.tzinfo is None else watermark
+        since -= timedelta(seconds=WORKFLOW_RUN_RECONCILE_OVERLAP_SECONDS)
+        query = f"StartTime >= '{since.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')}'"
+
+    written = 0
+    batch = []
+    async for execution in client.list_workflows(query=query, page_size=WORKFLOW_RUN_RECONCILE_BATCH_SIZE):
+        batch.append(workflow_status_payload(execution.id, execution))
+        if len(batch) >= WORKFLOW_RUN_RECONCILE_BATCH_SIZE:
+            written += await upsert_workflow_runs(batch)
+            batch = []
+    written += await upsert_workflow_runs(batch)
+
+    if pending_ids:
+        found = await describe_workflows(client, pending_ids)
+        written += await upsert_workflow_runs(list(found.values()))
+        written += await mark_workflow_runs_not_found([workflow_id for workflow_id in pending_ids if workflow_id not in found])
+    return written
+
+
+async def mark_workflow_runs_not_found(workflow_ids: list[str]) -> int:
+    """
+    Đánh dấu `NOT_FOUND` các bản ghi chưa kết thúc mà Temporal không còn tìm thấy, trả về số bản ghi đã ghi.
+    """
+    if not workflow_ids:
+        return 0
+    async with async_session() as session:
+        result = await session.execute(update(WorkflowRun).where(WorkflowRun.workflow_id.in_(workflow_ids), WorkflowRun.status.not_in(TERMINAL_STATUSES)).values(status=NOT_FOUND_STATUS))
+        await session.commit()
+        return result.rowcount
+
+
+async def run_workflow_run_reconciler(client: Client, interval: float = WORKFLOW_RUN_RECONCILE_INTERVAL_SECONDS, lease_seconds: float = WORKFLOW_RUN_RECONCILE_LEASE_SECONDS):
+    """
+    Vòng lặp nền chạy `reconcile_workflow_runs` mỗi `interval` giây trong suốt vòng đời API; lỗi của một lượt không dừng vòng lặp.
+
+    - Mọi process API đều chạy vòng lặp, nhưng chỉ process đang giữ lease `RECONCILER_LEASE` (bảng `service_leases`, gia hạn
+      mỗi lượt, hết hạn sau `lease_seconds`) mới quét Temporal và ghi bảng; các process khác chỉ thử nhận lease, nên khi
+      process giữ lease dừng thì một process khác tiếp quản sau tối đa `lease_seconds`.
+    - Lượt đầu tiên thành công sau khi nhận lease là một lần quét toàn bộ, để backfill các workflow chạy trước khi có bảng
+      hoặc trong lúc không có reconciler nào chạy; các lượt sau chỉ quét phần mới.
+    """
+    owner = lease_owner()
+    full_sweep = True
+    try:
+        while True:
+            try:
+                if await acquire_lease(RECONCILER_LEASE, owner, lease_seconds):
+                    await reconcile_workflow_runs(client, full_sweep=full_sweep)
+                    full_sweep = False
+                else:
+                    full_sweep = True
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Reconcile workflow_runs thất bại: {e}")
+            await asyncio.sleep(interval)
+    finally:
+        try:
+            await asyncio.shield(release_lease(RECONCILER_LEASE, owner))
+        except Exception as e:
+            print(f"⚠️ Không trả được lease {RECONCILER_LEASE}: {e}")
@@ -0,0 +1,61 @@
+from sqlalchemy import func, select
+
+from db.models import XmlFile
+from db.session import async_session
+
+# Các cột của `xml_files` được phép dùng làm bộ lọc khi chọn template
+XML_FILE_FILTERS = ("system", "sub_system", "module", "category")
+
+
+def normalize_xml_file_selection(selection: dict) -> dict:
+    """
+    Chuẩn hóa yêu cầu chọn template từ bảng `xml_files`, dạng:
+        {"xml_file_ids": [1, 2, 3]}
+    hoặc:
+        {"filters": {"system": "FIN", "module": "SA_BANK"}}
+
+    - `xml_file_ids` được ép kiểu số nguyên và bỏ trùng, giữ nguyên thứ tự (quyết định thứ tự file trong ZIP).
+    - `filters` chỉ nhận các khóa trong `XML_FILE_FILTERS`, giá trị rỗng bị bỏ qua.
+    - Raise `ValueError` nếu không có ID hoặc bộ lọc hợp lệ nào.
+    """
+    ids = selection.get("xml_file_ids")
+    if ids:
+        try:
+            return {"xml_file_ids": list(dict.fromkeys(int(xml_file_id) for xml_file_id in ids))}
+        except (TypeError, ValueError):
+            raise ValueError("xml_file_ids must be a list of integers")
+
+    filters = selection.get("filters") or {}
+    unknown = set(filters) - set(XML_FILE_FILTERS)
+    if unknown:
+        raise ValueError(f"Unsupported filters: {', '.join(sorted(unknown))}")
+    filters = {key: value for key, value in filters.items() if value not in (None, "")}
+    if not filters:
+        raise ValueError("Either xml_file_ids or at least one filter is required")
+    return {"filters": filters}
+
+
+def xml_file_conditions(selection: dict) -> list:
+    """
+    Điều kiện WHERE cho một selection đã chuẩn hóa: một truy vấn `id IN (...)` hoặc so khớp các cột lọc.
+    """
+    if "xml_file_ids" in selection:
+        return [XmlFile.id.in_(selection["xml_file_ids"])]
+    return [getattr(XmlFile, key) == value for key, value in selection["filters"].items()]
+
+
+async def count_xml_file_selection(selection: dict) -> int:
+    """
+    Kiểm tra selection trước khi khởi động workflow mà không đọc nội dung XML.
+    Trả về số file khớp; raise `LookupError` nếu có ID không tồn tại.
+    """
+    async with async_session() as session:
+        if "xml_file_ids" in selection:
+            result = await session.execute(select(XmlFile.id).where(*xml_file_conditions(selection)))
+            found = set(result.scalars())
+            missing = [xml_file_id for xml_file_id in selection["xml_file_ids"] if xml_file_id not in found]
+            if missing:
+                raise LookupError(f"XmlFile not found: {missing}")
+            return len(found)
+        result = await session.execute(select(func.count(XmlFile.id)).where(*xml_file_conditions(selection)))
+        return result.scalar_one()
@@ -4,6 +4,7 @@ from sqlalchemy import case, not_, func, delete
 from fastapi import UploadFile, File
 from temporalio.client import Client
 from db.models import XmlFile
+from db.xml_files import upsert_xml_files, xml_file_row
 import xml.etree.ElementTree as ET
 import xmltodict
 import os
@@ -88,16 +89,18 @@ class XmlService:
         - Trả về phản hồi thành công với danh sách các file đã tải lên.
         - Nếu có lỗi xảy ra, trả về phản hồi lỗi với thông điệp chi tiết.
         - Tự động trích xuất thông tin hệ thống từ nội dung XML và lưu vào cơ sở dữ liệu.
+        - File trùng `(module, filename)` với bản ghi đã có được ghi đè (`upsert_xml_files`), không tạo bản ghi mới.
         """
         try:
             results = []
+            rows = []
             for file in files:
                 content = await file.read()
                 content_decoded = content.decode()
                 system, sub_system, module_code, category = await self.extract_system_info(content_decoded)
-                xml_file = XmlFile(filename=file.filename, system=system, sub_system=sub_system, content=content_decoded, module=module_code, category=category)
-                session.add(xml_file)
+                rows.append(xml_file_row(filename=file.filename, content=content_decoded, system=system, sub_system=sub_system, module=module_code, category=category))
                 results.append(file.filename)
+            await upsert_xml_files(session, rows)
             await session.commit()
             workflow_id = await self._enqueue_db_to_git_sync(client)
 
@@ -268,7 +271,7 @@ class XmlService:
             + `session` (AsyncSession): Phiên làm việc với cơ sở dữ liệu.
 
         - Thực hiện:
-            + Tạo đối tượng `XmlFile` từ dữ liệu đầu vào và lưu vào cơ sở dữ liệu.
+            + Lưu bản ghi vào cơ sở dữ liệu theo khóa `(module, filename)`: nếu đã có bản ghi cùng khóa thì ghi đè (`upsert_xml_files`).
             + Sau khi lưu thành công, ghi nội dung XML ra file vật lý và lưu vào Git repository.
             + Commit thay đổi vào Git, có thể đính kèm tag nếu cần.
 
@@ -277,13 +280,13 @@ class XmlService:
             + Trả về lỗi chi tiết nếu có lỗi xảy ra trong quá trình xử lý.
         """
         try:
-            xml_file = XmlFile(**request)
-            session.add(xml_file)
+            ids = await upsert_xml_files(session, [xml_file_row(**request)])
             await session.commit()
             workflow_id = await self._enqueue_db_to_git_sync(client)
 
-            return self.success_response("Tạo bản ghi thành công", {**request, "workflow_id": workflow_id})
+            return self.success_response("Tạo bản ghi thành công", {**request, "id": next(iter(ids.values())), "workflow_id": workflow_id})
         except Exception as e:
+            await session.rollback()
             return self.error_response(f"Tạo bản ghi thất bại: {str(e)}")
 
     async def update_xml_file(self, id: int, request: dict = {}, session: AsyncSession = None, client: Client = None):
@@ -312,7 +315,8 @@ class XmlService:
 
         for key, value in request.items():
             if hasattr(obj, key):
-                setattr(obj, key, value)
+                # `module` không NULL, cùng quy ước với `xml_file_row`
+                setattr(obj, key, (value or "") if key == "module" else value)
 
         await session.commit()
         workflow_id = await self._enqueue_db_to_git_sync(client)
@@ -349,7 +353,7 @@ class XmlService:
         - Thực hiện:
             + Bỏ qua các file không phải định dạng XML.
             + Đọc nội dung XML và trích xuất metadata từ các trường `system_code`, `sub_system_code`, `module_code`, `module`.
-            + Kiểm tra xem file đã tồn tại (dựa trên `filename`) trong cơ sở dữ liệu:
+            + Kiểm tra xem file đã tồn tại (dựa trên `(module, filename)`) trong cơ sở dữ liệu, rồi ghi bằng `upsert_xml_files`:
                 * Nếu đã tồn tại → cập nhật nội dung và metadata tương ứng.
                 * Nếu chưa có → tạo mới bản ghi.
             + Ghi nội dung XML vào Git repository cho cả bản ghi mới và cập nhật.
@@ -371,36 +375,17 @@ class XmlService:
                 xml_dict = xmltodict.parse(content_str)
                 metadata = self.extract_metadata(xml_dict)
 
-                stmt = select(XmlFile).where(XmlFile.filename == file.filename).limit(1)
-                result = await session.execute(stmt)
-                existing = result.scalars().first()
-
-                if existing:
-                    existing.content = content_str
-                    existing.system = metadata.get("system")
-                    existing.sub_system = metadata.get("sub_system")
-                    existing.module = metadata.get("module")
-                    existing.category = metadata.get("category")
-                    await session.commit()
-                    await session.refresh(existing)
-
-                    results.append({"filename": file.filename, "status": "updated", "id": existing.id})
-                else:
-                    new_file = XmlFile(
-                        filename=file.filename,
-                        content=content_str,
-                        system=metadata.get("system"),
-                        sub_system=metadata.get("sub_system"),
-                        module=metadata.get("module"),
-                        category=metadata.get("category"),
-                    )
-                    session.add(new_file)
-                    await session.commit()
-                    await session.refresh(new_file)
-
-                    results.append({"filename": file.filename, "status": "imported", "id": new_file.id})
+                row = xml_file_row(filename=file.filename, content=content_str, **metadata)
+                stmt = select(XmlFile.id).where(XmlFile.module == row["module"], XmlFile.filename == row["filename"]).limit(1)
+                existing = (await session.execute(stmt)).scalar_one_or_none()
+
+                ids = await upsert_xml_files(session, [row])
+                await session.commit()
+
+                results.append({"filename": file.filename, "status": "updated" if existing else "imported", "id": ids[(row["module"], row["filename"])]})
 
             except Exception as e:
+                await session.rollback()
                 results.append({"filename": file.filename, "status": "error", "reason": str(e)})
 
         workflow_id = await self._enqueue_db_to_git_sync(client)
@@ -416,15 +401,16 @@ class XmlService:
         - Thực hiện:
             + Duyệt qua toàn bộ file `.xml` trong thư mục Git repository.
             + Với mỗi file:
-                * Nếu chưa tồn tại trong DB (dựa trên `filename`) → tạo mới bản ghi và trích xuất metadata.
-                * Nếu đã tồn tại nhưng nội dung khác → cập nhật nội dung bản ghi tương ứng.
-            + Sau khi xử lý, commit thay đổi vào cơ sở dữ liệu.
+                * Nếu chưa tồn tại trong DB (dựa trên `(module, filename)`, module lấy từ `module_code` trong XML) → tạo mới bản ghi.
+                * Nếu đã tồn tại nhưng nội dung khác → cập nhật nội dung và metadata của bản ghi tương ứng.
+            + Ghi các file mới/thay đổi bằng `upsert_xml_files` rồi commit.
 
         - Trả về:
             + Phản hồi thành công với danh sách các file đã được thêm mới (`[+]`) hoặc cập nhật (`[~]`) trong DB.
         """
         repo_path = get_git_service().repo_path
         synced = []
+        rows = []
         for module in MODULE_CONFIGURATION_LIST:
             for fname in os.listdir(repo_path + "/" + module):
                 if not fname.endswith(".xml"):
@@ -434,26 +420,19 @@ class XmlService:
                 with open(file_path, "r", encoding="utf-8") as f:
                     content = f.read()
 
-                stmt = select(XmlFile).where(XmlFile.filename == fname).limit(1)
-                result = await session.execute(stmt)
-                existing = result.scalars().first()
+                system, sub_system, module_code, category = await self.extract_system_info(content)
+                row = xml_file_row(filename=fname, content=content, system=system, sub_system=sub_system, module=module_code, category=category)
+                stmt = select(XmlFile.content).where(XmlFile.module == row["module"], XmlFile.filename == fname).limit(1)
+                existing = (await session.execute(stmt)).first()
 
                 if not existing:
-                    system, sub_system, module_code, category = await self.extract_system_info(content)
-                    new_file = XmlFile(
-                        filename=fname,
-                        content=content,
-                        system=system,
-                        sub_system=sub_system,
-                        module=module_code,
-                        category=category,
-                    )
-                    session.add(new_file)
+                    rows.append(row)
                     synced.append(f"[+] {fname} added to DB")
-                elif existing.content.strip() != content.strip():
-                    existing.content = content
+                elif (existing.content or "").strip() != content.strip():
+                    rows.append(row)
                     synced.append(f"[~] {fname} updated in DB")
 
+        await upsert_xml_files(session, rows)
         await session.commit()
         return self.success_response("Đã sync Git → DB", {"synced": synced})
 
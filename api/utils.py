@@ -1,17 +1,61 @@
+import asyncio
+import os
+
 from temporalio.client import Client
 import socketio
 
-sio = socketio.AsyncServer(async_mode="asgi", cors_allowed_origins="*")
+from config.configuration import SOCKETIO_MESSAGE_QUEUE
+from temporal.codec import connect_client
+
+
+def create_client_manager() -> socketio.AsyncManager | None:
+    """
+    Khi chạy nhiều process API (`uvicorn --workers N` hoặc nhiều container sau load balancer), các server Socket.IO
+    phải dùng chung message queue để emit tới room/broadcast tới được socket nằm ở process khác.
+    `SOCKETIO_MESSAGE_QUEUE` (vd. `redis://redis:6379/0`, chạy được với Valkey/KeyDB) bật `AsyncRedisManager`;
+    để trống thì dùng manager trong process như trước.
+    """
+    if not SOCKETIO_MESSAGE_QUEUE:
+        return None
+    return socketio.AsyncRedisManager(SOCKETIO_MESSAGE_QUEUE)
+
+
+sio = socketio.AsyncServer(async_mode="asgi", cors_allowed_origins="*", client_manager=create_client_manager())
+
+
+async def emit_local(event: str, data, **kwargs):
+    """
+    Emit chỉ tới các socket kết nối vào process hiện tại, không đi qua message queue.
+    Dùng cho phản hồi gửi tới `sid` của chính event handler và cho status hub (mỗi process có hub riêng,
+    chỉ theo dõi socket của mình), tránh một vòng Redis và tránh các process khác phát trùng.
+    """
+    await sio.emit(event, data, ignore_queue=True, **kwargs)
+
 
 client_instance: Client = None
+# PID của process đã tạo `client_instance`: client (kết nối gRPC) không dùng lại được sau khi fork
+client_pid: int = None
+_connect_lock: asyncio.Lock = None
 
 
-def set_client(client: Client):
-    global client_instance
+def set_client(client: Client | None):
+    global client_instance, client_pid
     client_instance = client
+    client_pid = os.getpid() if client is not None else None
 
 
 async def get_client() -> Client:
+    """
+    Trả về Temporal client của process hiện tại. Nếu client được tạo ở process cha (fork sau khi `lifespan` đã chạy,
+    vd. gunicorn `--preload`), kết nối lại một lần trong process con.
+    """
+    global _connect_lock
     if not client_instance:
         raise RuntimeError("Temporal client not initialized")
+    if client_pid != os.getpid():
+        if _connect_lock is None:
+            _connect_lock = asyncio.Lock()
+        async with _connect_lock:
+            if client_pid != os.getpid():
+                set_client(await connect_client())
     return client_instance
@@ -1,13 +1,183 @@
 # workflow_status.py
-from typing import Dict
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 
-# Bộ nhớ tạm tracking trạng thái các workflow
-WORKFLOW_STATUS: Dict[str, str] = {}
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
 
+from config.configuration import (
+    REDIS_URL,
+    WORKFLOW_STATUS_BACKEND,
+    WORKFLOW_STATUS_LOCAL_CACHE_SECONDS,
+    WORKFLOW_STATUS_MAX_ENTRIES,
+    WORKFLOW_STATUS_PURGE_INTERVAL_SECONDS,
+    WORKFLOW_STATUS_TTL_SECONDS,
+)
+from db.models import WorkflowStatusEntry
+from db.session import async_session
 
-def set_status(workflow_id: str, status: str):
-    WORKFLOW_STATUS[workflow_id] = status
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:  # Redis là tùy chọn, mặc định dùng bảng SQL
+    redis_asyncio = None
 
+UNKNOWN_STATUS = "unknown"
 
-def get_status(workflow_id: str) -> str:
-    return WORKFLOW_STATUS.get(workflow_id, "unknown")
+
+class WorkflowStatusStore:
+    """
+    Lưu trạng thái nội bộ của API cho từng workflow (vd. `processing` ngay sau khi start).
+    - Mọi entry có TTL; backend dùng chung (SQL/Redis) để mọi process API (uvicorn nhiều worker) thấy cùng trạng thái.
+    - Mặc định là `memory` (giới hạn `WORKFLOW_STATUS_MAX_ENTRIES`): API hiện chỉ ghi trạng thái, trạng thái trả cho client
+      lấy từ Temporal (`status_hub`), nên không tốn thêm một lần ghi DB cho mỗi workflow; chọn `sql`/`redis` khi có chỗ đọc
+      trạng thái này từ process khác.
+    """
+
+    async def set(self, workflow_id: str, status: str):
+        raise NotImplementedError
+
+    async def get(self, workflow_id: str) -> str | None:
+        raise NotImplementedError
+
+
+class MemoryWorkflowStatusStore(WorkflowStatusStore):
+    """
+    Cache trong process, giới hạn `max_entries` (LRU) và `ttl_seconds`. Dùng riêng khi chỉ chạy một process,
+    hoặc làm cache đọc ngắn hạn phía trước backend dùng chung.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+
+    async def set(self, workflow_id: str, status: str):
+        self.entries[workflow_id] = (status, time.monotonic() + self.ttl_seconds)
+        self.entries.move_to_end(workflow_id)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    async def get(self, workflow_id: str) -> str | None:
+        entry = self.entries.get(workflow_id)
+        if entry is None:
+            return None
+        status, expires_at = entry
+        if time.monotonic() > expires_at:
+            del self.entries[workflow_id]
+            return None
+        self.entries.move_to_end(workflow_id)
+        return status
+
+
+class SqlWorkflowStatusStore(WorkflowStatusStore):
+    """
+    Lưu trạng thái trong bảng `workflow_statuses`, dùng chung cho mọi process API.
+    - Entry hết hạn bị coi là không tồn tại khi đọc, và được xóa định kỳ (tối đa một lần mỗi `purge_interval_seconds` mỗi process).
+    - `local` (tùy chọn) là cache đọc ngắn hạn trong process để giảm truy vấn; ghi luôn đi thẳng xuống DB.
+    """
+
+    def __init__(self, ttl_seconds: int, purge_interval_seconds: int, local: MemoryWorkflowStatusStore | None = None):
+        self.ttl_seconds = ttl_seconds
+        self.purge_interval_seconds = purge_interval_seconds
+        self.local = local
+        self._last_purge = 0.0
+
+    async def set(self, workflow_id: str, status: str):
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.ttl_seconds)
+        async with async_session() as session:
+            updated = await session.execute(update(WorkflowStatusEntry).where(WorkflowStatusEntry.workflow_id == workflow_id).values(status=status, expires_at=expires_at))
+            if updated.rowcount == 0:
+                session.add(WorkflowStatusEntry(workflow_id=workflow_id, status=status, expires_at=expires_at))
+            try:
+                await session.commit()
+            except IntegrityError:
+                # Process khác vừa insert cùng workflow ID: ghi đè bằng update
+                await session.rollback()
+                await session.execute(update(WorkflowStatusEntry).where(WorkflowStatusEntry.workflow_id == workflow_id).values(status=status, expires_at=expires_at))
+                await session.commit()
+
+        if self.local is not None:
+            await self.local.set(workflow_id, status)
+        await self.maybe_purge()
+
+    async def get(self, workflow_id: str) -> str | None:
+        if self.local is not None:
+            status = await self.local.get(workflow_id)
+            if status is not None:
+                return status
+
+        async with async_session() as session:
+            result = await session.execute(select(WorkflowStatusEntry.status).where(WorkflowStatusEntry.workflow_id == workflow_id, WorkflowStatusEntry.expires_at > datetime.now(timezone.utc)))
+            status = result.scalar_one_or_none()
+
+        if status is not None and self.local is not None:
+            await self.local.set(workflow_id, status)
+        return status
+
+    async def maybe_purge(self):
+        if time.monotonic() - self._last_purge < self.purge_interval_seconds:
+            return
+        self._last_purge = time.monotonic()
+        await self.purge()
+
+    async def purge(self) -> int:
+        """
+        Xóa các entry đã hết hạn, trả về số entry đã xóa.
+        """
+        async with async_session() as session:
+            result = await session.execute(delete(WorkflowStatusEntry).where(WorkflowStatusEntry.expires_at <= datetime.now(timezone.utc)))
+            await session.commit()
+            return result.rowcount
+
+
+class RedisWorkflowStatusStore(WorkflowStatusStore):
+    """
+    Lưu trạng thái trong Redis (hoặc server tương thích giao thức Redis như Valkey, KeyDB) bằng `SET ... EX`,
+    Redis tự xóa entry hết hạn. Cần cài package `redis`.
+    """
+
+    KEY_PREFIX = "workflow-status:"
+
+    def __init__(self, url: str, ttl_seconds: int, local: MemoryWorkflowStatusStore | None = None):
+        if redis_asyncio is None:
+            raise ValueError("WORKFLOW_STATUS_BACKEND=redis requires the `redis` package")
+        self.redis = redis_asyncio.from_url(url, decode_responses=True)
+        self.ttl_seconds = ttl_seconds
+        self.local = local
+
+    async def set(self, workflow_id: str, status: str):
+        await self.redis.set(self.KEY_PREFIX + workflow_id, status, ex=self.ttl_seconds)
+        if self.local is not None:
+            await self.local.set(workflow_id, status)
+
+    async def get(self, workflow_id: str) -> str | None:
+        if self.local is not None:
+            status = await self.local.get(workflow_id)
+            if status is not None:
+                return status
+        status = await self.redis.get(self.KEY_PREFIX + workflow_id)
+        if status is not None and self.local is not None:
+            await self.local.set(workflow_id, status)
+        return status
+
+
+@lru_cache(maxsize=1)
+def get_workflow_status_store() -> WorkflowStatusStore:
+    local = MemoryWorkflowStatusStore(WORKFLOW_STATUS_MAX_ENTRIES, WORKFLOW_STATUS_LOCAL_CACHE_SECONDS) if WORKFLOW_STATUS_LOCAL_CACHE_SECONDS > 0 else None
+    if WORKFLOW_STATUS_BACKEND == "memory":
+        return MemoryWorkflowStatusStore(WORKFLOW_STATUS_MAX_ENTRIES, WORKFLOW_STATUS_TTL_SECONDS)
+    if WORKFLOW_STATUS_BACKEND == "sql":
+        return SqlWorkflowStatusStore(WORKFLOW_STATUS_TTL_SECONDS, WORKFLOW_STATUS_PURGE_INTERVAL_SECONDS, local)
+    if WORKFLOW_STATUS_BACKEND == "redis":
+        return RedisWorkflowStatusStore(REDIS_URL, WORKFLOW_STATUS_TTL_SECONDS, local)
+    raise ValueError(f"Unsupported workflow status backend: {WORKFLOW_STATUS_BACKEND}")
+
+
+async def set_status(workflow_id: str, status: str):
+    await get_workflow_status_store().set(workflow_id, status)
+
+
+async def get_status(workflow_id: str) -> str:
+    return await get_workflow_status_store().get(workflow_id) or UNKNOWN_STATUS
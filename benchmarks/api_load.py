@@ -0,0 +1,175 @@
+"""
+Load test throughput của API khi chạy với số process uvicorn khác nhau.
+
+Với mỗi giá trị trong `--workers` (mặc định 1,2,4), khởi động `uvicorn <app> --workers N` trên một cổng riêng,
+chờ API sẵn sàng, rồi bắn request GET `--path` từ `--client-processes` process client, mỗi process giữ
+`--concurrency` kết nối keep-alive trong `--duration` giây. Kết quả in ra request/giây, độ trễ p50/p99,
+hệ số tăng tốc và hiệu suất so với 1 process (1.0 = tăng tuyến tính).
+
+API cần kết nối được Temporal và database như khi chạy thật (biến môi trường được truyền nguyên cho uvicorn).
+Dùng `--url` để đo một deployment có sẵn thay vì tự khởi động uvicorn.
+
+Chạy:
+    PYTHONPATH=. python benchmarks/api_load.py --workers 1,2,4 --duration 20
+    PYTHONPATH=. python benchmarks/api_load.py --url http://localhost:8000 --path "/api/generator/workflows/page?page_size=20"
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from urllib.parse import urlsplit
+
+
+async def _read_response(reader: asyncio.StreamReader) -> int:
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Connection closed by server")
+    status = int(status_line.split()[1])
+    length, chunked = 0, False
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        name = name.strip().lower()
+        if name == "content-length":
+            length = int(value)
+        elif name == "transfer-encoding" and "chunked" in value.lower():
+            chunked = True
+
+    if not chunked:
+        await reader.readexactly(length)
+        return status
+    while True:
+        size = int((await reader.readline()).split(b";")[0], 16)
+        await reader.readexactly(size + 2)
+        if size == 0:
+            return status
+
+
+async def _client(host: str, port: int, path: str, deadline: float, latencies: list, errors: list):
+    request = f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\nConnection: keep-alive\r\n\r\n".encode("latin-1")
+    writer = None
+    while time.perf_counter() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            started = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            status = await _read_response(reader)
+            if status >= 400:
+                errors.append(status)
+            else:
+                latencies.append(time.perf_counter() - started)
+        except (OSError, ValueError, IndexError, asyncio.IncompleteReadError) as e:
+            errors.append(type(e).__name__)
+            if writer is not None:
+                writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+def _client_process(host: str, port: int, path: str, concurrency: int, duration: float) -> tuple[list, list]:
+    latencies, errors = [], []
+
+    async def main():
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(_client(host, port, path, deadline, latencies, errors) for _ in range(concurrency)))
+
+    asyncio.run(main())
+    return latencies, errors
+
+
+def run_load(host: str, port: int, path: str, concurrency: int, duration: float, processes: int) -> dict:
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(processes) as pool:
+        results = pool.starmap(_client_process, [(host, port, path, concurrency, duration)] * processes)
+
+    latencies = sorted(latency for process_latencies, _ in results for latency in process_latencies)
+    errors = [error for _, process_errors in results for error in process_errors]
+    if not latencies:
+        raise RuntimeError(f"No successful requests ({len(errors)} errors, e.g. {errors[:3]})")
+    return {
+        "rps": len(latencies) / duration,
+        "p50": latencies[len(latencies) // 2] * 1000,
+        "p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        "errors": len(errors),
+    }
+
+
+def wait_ready(url: str, timeout: float, server: subprocess.Popen = None):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server is not None and server.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with code {server.returncode}")
+        try:
+            with urllib.request.urlopen(url, timeout=2):
+                return
+        except urllib.error.HTTPError:
+            return
+        except OSError:
+            time.sleep(0.5)
+    raise TimeoutError(f"API not ready after {timeout}s: {url}")
+
+
+def start_server(app: str, workers: int, host: str, port: int) -> subprocess.Popen:
+    env = dict(os.environ, PYTHONPATH=os.environ.get("PYTHONPATH", "."))
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--host", host, "--port", str(port), "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        env=env,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", default="api.main:app")
+    parser.add_argument("--workers", default="1,2,4", help="Danh sách số process uvicorn cần đo, phân tách bằng dấu phẩy")
+    parser.add_argument("--url", default=None, help="Đo deployment có sẵn (vd. http://localhost:8000), bỏ qua --app/--workers")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--path", default="/api/generator/workflows/page?page_size=20")
+    parser.add_argument("--concurrency", type=int, default=32, help="Số kết nối keep-alive mỗi process client")
+    parser.add_argument("--client-processes", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--warmup", type=float, default=2)
+    parser.add_argument("--ready-timeout", type=float, default=60)
+    args = parser.parse_args()
+
+    def measure(host: str, port: int) -> dict:
+        if args.warmup > 0:
+            run_load(host, port, args.path, args.concurrency, args.warmup, args.client_processes)
+        return run_load(host, port, args.path, args.concurrency, args.duration, args.client_processes)
+
+    print(f"path={args.path} concurrency={args.concurrency}x{args.client_processes} duration={args.duration}s")
+    if args.url:
+        target = urlsplit(args.url)
+        wait_ready(args.url.rstrip("/") + args.path, args.ready_timeout)
+        result = measure(target.hostname, target.port or 80)
+        print(f"{result['rps']:.1f} req/s, p50 {result['p50']:.1f} ms, p99 {result['p99']:.1f} ms, errors {result['errors']}")
+        return
+
+    baseline = None
+    print(f"{'workers':>8} {'req/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7} {'speedup':>8} {'efficiency':>10}")
+    for workers in [int(value) for value in args.workers.split(",") if value.strip()]:
+        server = start_server(args.app, workers, args.host, args.port)
+        try:
+            wait_ready(f"http://{args.host}:{args.port}{args.path}", args.ready_timeout, server)
+            result = measure(args.host, args.port)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+        baseline = baseline or result["rps"]
+        speedup = result["rps"] / baseline
+        print(f"{workers:>8} {result['rps']:>10.1f} {result['p50']:>8.1f} {result['p99']:>8.1f} {result['errors']:>7} {speedup:>8.2f} {speedup / workers:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
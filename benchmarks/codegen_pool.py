@@ -0,0 +1,98 @@
+"""
+Benchmark throughput của các activity sinh mã khi chạy trên process pool với số process khác nhau.
+
+Sinh `--models` template XML giả lập (mỗi template `--fields` trường), rồi chạy
+`generate_be_artifacts` (model/controller/route, bỏ view vì cần database) và `generate_fe_artifacts`
+cho từng model trên `ProcessPoolExecutor` giống cấu hình của worker, lần lượt với 1, 2, 4, ... process
+cho tới `--max-workers` (mặc định bằng số core). Kết quả in ra số model/giây và hệ số tăng tốc so với 1 process.
+
+Chạy:
+    PYTHONPATH=. python benchmarks/codegen_pool.py --models 200 --fields 40
+"""
+
+import argparse
+import os
+import time
+
+import xmltodict
+
+from temporal.activities.be_generator import generate_be_artifacts
+from temporal.activities.fe_generator import generate_fe_artifacts
+from temporal.executors import create_codegen_executor
+
+BE_KINDS = ["model", "controller", "route"]
+
+
+def make_template(index: int, field_count: int) -> dict:
+    fields = []
+    for j in range(field_count):
+        field = {
+            "name": "id" if j == 0 else f"field_{j}",
+            "alias": "id" if j == 0 else f"alias_{j}",
+            "type": "integer" if j == 0 else "varchar",
+            "not_null": "1" if j < 2 else "0",
+            "max_length": "50",
+            "label": f"Trường {j}",
+            "en_label": f"Field {j}",
+            "description": f"Field {j}",
+        }
+        if j == 3:
+            field["foreign_key"] = "bench_other,id,code,name"
+            field["reference"] = "bench_other"
+        fields.append(field)
+    root = {
+        "system_code": "FIN",
+        "sub_system_code": "SA",
+        "module": "categories",
+        "module_code": "SA_BENCH",
+        "model": f"bench_model_{index}",
+        "default_order": "id",
+        "fields": {"field": fields},
+        "searchable_list": "field_1,field_2",
+    }
+    # Đi qua một vòng unparse/parse để template có đúng cấu trúc như khi đọc từ blob store
+    return xmltodict.parse(xmltodict.unparse({"root": root}))
+
+
+def generate_one(template: dict) -> int:
+    generate_be_artifacts([template], BE_KINDS)
+    generate_fe_artifacts([template])
+    return 1
+
+
+def run(templates: list[dict], workers: int) -> float:
+    with create_codegen_executor(workers) as executor:
+        # Khởi động trước các process để không tính thời gian spawn/import vào kết quả
+        list(executor.map(generate_one, templates[:workers]))
+        started = time.perf_counter()
+        done = sum(executor.map(generate_one, templates))
+        elapsed = time.perf_counter() - started
+    return done / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", type=int, default=200)
+    parser.add_argument("--fields", type=int, default=40)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    templates = [make_template(i, args.fields) for i in range(args.models)]
+    worker_counts = []
+    workers = 1
+    while workers < args.max_workers:
+        worker_counts.append(workers)
+        workers *= 2
+    worker_counts.append(args.max_workers)
+
+    print(f"{args.models} models x {args.fields} fields, {os.cpu_count()} cores")
+    print(f"{'processes':>10} {'models/s':>10} {'speedup':>8}")
+    baseline = None
+    for workers in worker_counts:
+        throughput = run(templates, workers)
+        baseline = baseline or throughput
+        print(f"{workers:>10} {throughput:>10.1f} {throughput / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+Benchmark chuyển Excel sang XML template (`XmlGenerator._dataframe_to_xml`).
+
+So sánh cài đặt hiện tại (xử lý theo cột, ghi XML trực tiếp) với cài đặt cũ (`iterrows` + `minidom` parse lại
+để pretty-print, giữ nguyên trong file này làm mốc) trên các sheet giả lập:
+
+- `wide`: ít dòng, nhiều cột (`--wide-rows` x `--wide-columns`)
+- `long`: nhiều dòng, số cột thông thường (`--long-rows` x 12)
+- `dictionary`: `--sheets` sheet cỡ data dictionary thật (40 trường x 12 cột), tương đương một workbook nhiều sheet
+
+Mỗi trường hợp kiểm tra hai cài đặt cho ra XML giống hệt nhau, rồi in thời gian tốt nhất sau `--repeat` lần và hệ số tăng tốc.
+Dùng `--excel` để đo thêm toàn bộ `generate_xml` trên một workbook thật (gồm cả thời gian đọc Excel).
+
+Chạy:
+    PYTHONPATH=. python benchmarks/xml_generator.py
+    PYTHONPATH=. python benchmarks/xml_generator.py --sheets 300 --excel data/dictionary.xlsx
+"""
+
+import argparse
+import random
+import time
+import xml.dom.minidom as minidom
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
+
+import pandas as pd
+
+from scripts.xml.xml_generator import NOT_NULL_CONFIG, SKIP_FIELDS, TYPE_CONFIG, XmlGenerator
+
+TYPES = ["Ký tự", "Số nguyên", "Số nguyên lớn", "Số thực", "Text", "Datetime", "Date", "Logic", "Đa hình", "File", "JSON"]
+
+
+def legacy_dataframe_to_xml(df: pd.DataFrame, model: str, kw: dict) -> str:
+    """
+    Cài đặt cũ của `XmlGenerator._dataframe_to_xml`, giữ lại làm mốc so sánh kết quả và thời gian.
+    """
+    root = ET.Element("root")
+    system_code = kw.get("system_code", "SYS")
+    sub_system_code = kw.get("sub_system_code", "SUB")
+    module_code = XmlGenerator(None)._get_module_code(model.lower().replace(f"{system_code.lower()}_", ""))
+    module = kw.get("module", "categories")
+
+    ET.SubElement(root, "system_code").text = system_code
+    ET.SubElement(root, "sub_system_code").text = sub_system_code
+    ET.SubElement(root, "module").text = module.lower()
+    ET.SubElement(root, "module_code").text = module_code
+    ET.SubElement(root, "model").text = model.lower()
+    ET.SubElement(root, "default_order").text = "id"
+
+    fields_elem = ET.SubElement(root, "fields")
+    searchable_list = []
+    auto_searchable_list = []
+
+    for _, row in df.iterrows():
+        row = {str(k).strip().lower(): v for k, v in row.items()}
+
+        name = row.get("name")
+        if not name or pd.isna(name) or str(name).strip() == "" or name in SKIP_FIELDS:
+            continue
+
+        name = str(name).strip()
+
+        searchable_val = str(row.get("searchable", "")).lower().strip()
+        if searchable_val in {"1", "c", "t", "d"}:
+            searchable_list.append(name)
+
+        raw_type = row.get("type", "")
+        mapped_type = TYPE_CONFIG.get(str(raw_type).strip().lower(), "varchar")
+        if mapped_type in {"varchar", "text"}:
+            auto_searchable_list.append(name)
+
+        field_elem = ET.SubElement(fields_elem, "field")
+
+        if name == "id":
+            ET.SubElement(field_elem, "primary_key").text = "1"
+
+        for tag, value in row.items():
+            if tag == "index" or pd.isna(value):
+                continue
+
+            val = str(value).strip()
+
+            match tag:
+                case "type":
+                    val = TYPE_CONFIG.get(val.lower(), "varchar")
+                case "not_null":
+                    val = NOT_NULL_CONFIG.get(val.lower(), "0")
+                case _:
+                    val = val
+
+            elem = ET.SubElement(field_elem, tag)
+            elem.text = escape(val)
+
+            if tag == "reference" and val.lower() != "khóa chính" and "," not in val:
+                serialized_val = row.get("serialized_field", "id,code,name")
+                serialized_val = str(serialized_val).strip() if serialized_val and not pd.isna(serialized_val) else "id,code,name"
+                fk = ET.SubElement(field_elem, "foreign_key")
+                fk.text = f"{val},{serialized_val}"
+
+    if not searchable_list:
+        searchable_list = auto_searchable_list
+    ET.SubElement(root, "searchable_list").text = ",".join(searchable_list)
+
+    xml_bytes = ET.tostring(root, encoding="UTF-8")
+    return minidom.parseString(xml_bytes).toprettyxml(indent="    ")
+
+
+def make_sheet(rows: int, extra_columns: int, rnd: random.Random) -> pd.DataFrame:
+    """
+    Sheet giả lập theo cấu trúc data dictionary: các cột chuẩn và `extra_columns` cột mô tả phụ.
+    """
+    data = {
+        "Index": list(range(1, rows + 1)),
+        "Name": ["id"] + [rnd.choice([f"field_{i}", f"field_{i}", "active", "write_date"]) if i % 9 == 0 else f"field_{i}" for i in range(1, rows)],
+        "Type": ["Số nguyên"] + [rnd.choice(TYPES) for _ in range(1, rows)],
+        "Not_Null": [rnd.choice(["C", "K", None]) for _ in range(rows)],
+        "Searchable": [rnd.choice(["1", None, None, None]) for _ in range(rows)],
+        "Label": [f"Trường {i} & <mô tả>" for i in range(rows)],
+        "En_Label": [f"Field {i}" for i in range(rows)],
+        "Max_Length": [rnd.choice([50, 255, None]) for _ in range(rows)],
+        "Reference": [rnd.choice([None, None, None, "fin_partner", "Khóa chính"]) for _ in range(rows)],
+        "Serialized_Field": [rnd.choice([None, "id,code"]) for _ in range(rows)],
+        "Description": [rnd.choice([None, f'Mô tả "{i}"']) for i in range(rows)],
+        "Default": [rnd.choice([None, 0, 1.5, "now"]) for _ in range(rows)],
+    }
+    for index in range(extra_columns):
+        data[f"Extra_{index}"] = [rnd.choice([None, f"v{index}_{row}"]) for row in range(rows)]
+    return pd.DataFrame(data)
+
+
+def best_time(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def bench_sheets(label: str, sheets: list[pd.DataFrame], repeat: int):
+    kw = {"system_code": "FIN", "sub_system_code": "SA", "module": "categories"}
+    generator = XmlGenerator(None)
+    for index, df in enumerate(sheets):
+        expected = legacy_dataframe_to_xml(df, f"fin_model_{index}", kw)
+        actual = generator._dataframe_to_xml(df, f"fin_model_{index}", kw)
+        if actual != expected:
+            raise AssertionError(f"{label}: output differs from the legacy implementation on sheet {index}")
+
+    legacy = best_time(lambda: [legacy_dataframe_to_xml(df, f"fin_model_{index}", kw) for index, df in enumerate(sheets)], repeat)
+    current = best_time(lambda: [generator._dataframe_to_xml(df, f"fin_model_{index}", kw) for index, df in enumerate(sheets)], repeat)
+    cells = sum(df.size for df in sheets)
+    print(f"{label:>12} {len(sheets):>7} {cells:>10} {legacy * 1000:>12.1f} {current * 1000:>12.1f} {legacy / current:>8.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--wide-rows", type=int, default=60)
+    parser.add_argument("--wide-columns", type=int, default=200)
+    parser.add_argument("--long-rows", type=int, default=20000)
+    parser.add_argument("--sheets", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--excel", default=None, help="Đo thêm `generate_xml` trên workbook này (gồm cả đọc Excel)")
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    print(f"{'case':>12} {'sheets':>7} {'cells':>10} {'legacy ms':>12} {'current ms':>12} {'speedup':>9}")
+    bench_sheets("wide", [make_sheet(args.wide_rows, args.wide_columns, rnd)], args.repeat)
+    bench_sheets("long", [make_sheet(args.long_rows, 0, rnd)], args.repeat)
+    bench_sheets("dictionary", [make_sheet(40, 0, rnd) for _ in range(args.sheets)], args.repeat)
+
+    if args.excel:
+        kw = {"system_code": "FIN"}
+        with pd.ExcelFile(args.excel) as excel:
+            started = time.perf_counter()
+            result = XmlGenerator(excel).generate_xml(kw)
+            print(f"generate_xml({args.excel}): {len(result)} sheets in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark bộ nhớ khi sinh XML từ một workbook nhiều sheet (`XmlGenerator.generate_xml` / `iter_xml`).
+
+Tạo một workbook giả lập `--sheets` sheet x `--rows` dòng (cấu trúc như `benchmarks/xml_generator.py`), rồi đo
+peak bộ nhớ Python (`tracemalloc`) và thời gian của:
+
+- `legacy`: cài đặt cũ (`iterrows` + `minidom` trên từng sheet), giữ XML của mọi sheet trong dict kết quả
+- `generate_xml`: cài đặt hiện tại, vẫn trả về dict chứa XML của mọi sheet (như activity `generate_xml`)
+- `iter_xml`: cài đặt hiện tại, xử lý xong sheet nào bỏ XML sheet đó (phần bộ nhớ dành cho việc chuyển đổi)
+
+Kèm theo là kích thước DataFrame và XML của sheet lớn nhất cùng tổng XML của workbook, để so peak với một sheet.
+`tracemalloc` làm chậm đáng kể, nên thời gian ở đây chỉ để tham khảo; dùng `benchmarks/xml_generator.py` để đo tốc độ.
+
+Chạy:
+    PYTHONPATH=. python benchmarks/xml_memory.py
+    PYTHONPATH=. python benchmarks/xml_memory.py --sheets 20 --rows 20000 --excel data/dictionary.xlsx
+"""
+
+import argparse
+import gc
+import io
+import random
+import time
+import tracemalloc
+
+from openpyxl import Workbook
+
+from benchmarks.xml_generator import legacy_dataframe_to_xml, make_sheet
+from scripts.xml.xml_generator import XmlGenerator, excel_engine, open_workbook
+
+
+class LegacyXmlGenerator(XmlGenerator):
+    def _dataframe_to_xml(self, df, model, kw):
+        return legacy_dataframe_to_xml(df, model, kw)
+
+
+def make_workbook(sheets: int, rows: int, seed: int) -> bytes:
+    rnd = random.Random(seed)
+    workbook = Workbook(write_only=True)
+    for index in range(sheets):
+        sheet = workbook.create_sheet(f"{index + 1}. fin_model_{index}")
+        df = make_sheet(rows, 0, rnd)
+        sheet.append(list(df.columns))
+        for row in df.astype(object).where(df.notna(), None).itertuples(index=False, name=None):
+            sheet.append(row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def measure(label: str, run):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        output = run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    print(f"{label:>14} {peak / 1e6:>10.1f} {time.perf_counter() - started:>10.1f} {output / 1e6:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sheets", type=int, default=6)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--engine", default="openpyxl", help="Engine đọc Excel: openpyxl, calamine hoặc auto")
+    parser.add_argument("--excel", default=None, help="Đo trên workbook này thay vì workbook giả lập")
+    args = parser.parse_args()
+
+    if args.excel:
+        with open(args.excel, "rb") as file:
+            data = file.read()
+    else:
+        data = make_workbook(args.sheets, args.rows, args.seed)
+    engine = excel_engine(args.engine)
+    kw = {"system_code": "FIN"}
+
+    with open_workbook(data, engine) as excel:
+        largest = max((excel.parse(sheet_name) for sheet_name in excel.sheet_names), key=len)
+    sheet_xml = XmlGenerator(None)._dataframe_to_xml(largest, "fin_largest", kw)
+    print(f"workbook: {len(data) / 1e6:.1f} MB, engine {engine}")
+    print(f"largest sheet: {len(largest)} rows, DataFrame {largest.memory_usage(deep=True).sum() / 1e6:.1f} MB, XML {len(sheet_xml) / 1e6:.1f} MB")
+    del largest, sheet_xml
+
+    def run_dict(generator_class):
+        with open_workbook(data, engine) as excel:
+            return sum(len(xml_string) for xml_string in generator_class(excel).generate_xml(kw).values())
+
+    def run_iter():
+        with open_workbook(data, engine) as excel:
+            return sum(len(xml_string) for _, xml_string in XmlGenerator(excel).iter_xml(kw))
+
+    print(f"{'case':>14} {'peak MB':>10} {'seconds':>10} {'output MB':>12}")
+    measure("legacy", lambda: run_dict(LegacyXmlGenerator))
+    measure("generate_xml", lambda: run_dict(XmlGenerator))
+    measure("iter_xml", run_iter)
+
+
+if __name__ == "__main__":
+    main()
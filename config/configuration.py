@@ -13,6 +13,72 @@ Các biến `BACKEND_ADDONS_ROOT` và `BACKEND_ADDON_*` được đọc từ env
 để tương thích cả môi trường host lẫn container Docker. Bên trong container,
 `BACKEND_ADDONS_ROOT` nên trỏ tới path đã được mount volume, ví dụ
 `/workspace/backend-addons`.
+
+`BLOB_STORE_*` cấu hình kho blob lưu template đầu vào của các workflow sinh mã
+theo địa chỉ nội dung (sha256). API và worker phải cùng nhìn thấy thư mục này
+(trong Docker cả hai đều mount chung `/app`).
+`ARTIFACT_STORE_PATH` là nơi activity ghi file ZIP kết quả để API stream về cho client.
+Hai kho này được dọn theo TTL (0 = giữ vĩnh viễn), kiểm tra tối đa một lần mỗi `STORE_SWEEP_INTERVAL_SECONDS`:
+blob không được ghi lại hoặc đọc trong `BLOB_STORE_TTL_SECONDS` (TTL trượt, nên phải dài hơn thời gian một workflow
+có thể chờ trước khi đọc input), artifact cũ hơn `ARTIFACT_STORE_TTL_SECONDS` kể từ lúc ghi.
+`MAX_PARALLEL_MODELS` là số model tối đa một workflow sinh mã xử lý đồng thời
+(có thể ghi đè theo từng request qua `kw["max_parallel_models"]`).
+`GENERATION_CHUNK_SIZE` > 0 cho phép workflow gom mỗi nhóm N model vào một activity batch
+duy nhất thay vì một activity cho từng loại file (`0` = từng activity riêng, ghi đè qua `kw["chunk_size"]`).
+Batch FE/BE có nhiều hơn `GENERATION_SHARD_THRESHOLD` template (0 = tắt) được chia thành các child workflow
+`GENERATION_SHARD_SIZE` model mỗi shard, tối đa `GENERATION_MAX_PARALLEL_SHARDS` shard chạy cùng lúc; workflow cha
+continue-as-new sau mỗi `GENERATION_SHARDS_PER_RUN` shard để history không phình theo kích thước batch
+(ghi đè qua `kw["shard_threshold"]`, `kw["shard_size"]`, `kw["max_parallel_shards"]`, `kw["shards_per_run"]`).
+`CODEGEN_PROCESS_POOL_SIZE` là số process chạy các activity sinh mã đồng bộ (tốn CPU) trong worker,
+mặc định bằng số core. `IO_THREAD_POOL_SIZE` là số thread cho các activity blocking I/O
+(psycopg2, ghi ZIP, deploy).
+
+Mỗi loại tải chạy trên task queue riêng (`codegen-cpu`, `excel-parse`, `deploy-io`, `db-context`)
+với giới hạn đồng thời riêng: `CODEGEN_PROCESS_POOL_SIZE`, `EXCEL_PROCESS_POOL_SIZE`,
+`DEPLOY_MAX_CONCURRENT_ACTIVITIES`, `DB_CONTEXT_MAX_CONCURRENT_ACTIVITIES`.
+`EXCEL_READER_ENGINE` là engine đọc workbook khi sinh XML: `openpyxl` (mặc định, read-only, đọc tuần tự từng sheet),
+`calamine` (nhanh hơn, cần cài `python-calamine`) hoặc `auto` (`calamine` nếu đã cài, ngược lại `openpyxl`).
+`XML_MAX_PARALLEL_WORKBOOKS` là số workbook tối đa một workflow sinh XML xử lý đồng thời (ghi đè qua `kw["max_parallel_workbooks"]`).
+`WORKER_EMBEDDED_QUEUES` là danh sách queue (phân tách bằng dấu phẩy) mà worker chính poll kèm;
+đặt rỗng khi đã chạy worker riêng cho từng queue trên các node khác nhau.
+
+Workflow sinh mã chạy ở một trong hai làn ưu tiên (xem `temporal/lanes.py`): `interactive` dùng các queue trên,
+`bulk` dùng bản sao có hậu tố `-bulk` với slot riêng `BULK_CODEGEN_PROCESS_POOL_SIZE`, `BULK_EXCEL_PROCESS_POOL_SIZE`,
+`BULK_DEPLOY_MAX_CONCURRENT_ACTIVITIES`, `BULK_DB_CONTEXT_MAX_CONCURRENT_ACTIVITIES`; process sinh mã của làn bulk
+chạy với mức `nice` `BULK_PROCESS_NICENESS` để nhường CPU cho làn interactive. `WORKER_LANES` là các làn mà mỗi process
+worker phục vụ (mặc định cả hai). Request không chỉ định `priority` sẽ vào làn bulk khi có từ
+`GENERATION_BULK_THRESHOLD` template trở lên (0 = luôn interactive).
+
+`PAYLOAD_CODEC` chọn thuật toán nén payload Temporal (`auto` = zstd nếu đã cài `zstandard`, ngược lại zlib;
+`zlib`, `zstd` hoặc `none`). Chỉ payload từ `PAYLOAD_COMPRESSION_THRESHOLD` byte trở lên mới được nén.
+
+`GENERATOR_VERSION` là phiên bản generator dùng trong khóa dedupe/cache kết quả sinh mã; để trống thì
+tự tính từ hash mã nguồn generator (xem `temporal/generator_version.py`).
+`ARTIFACT_CACHE_*` cấu hình cache kết quả sinh mã theo từng model (khóa theo loại artifact, digest XML
+và phiên bản generator): bật/tắt, thư mục lưu, số entry tối đa (LRU), TTL và chu kỳ dọn cache.
+`STATUS_POLL_*` cấu hình hub theo dõi trạng thái workflow qua Socket.IO: chu kỳ poll ban đầu,
+chu kỳ tối đa và hệ số backoff khi trạng thái không đổi.
+`STATUS_BATCH_CHUNK_SIZE` là số workflow ID tối đa trong một truy vấn visibility `WorkflowId IN (...)`,
+`STATUS_BATCH_WINDOW_SECONDS` là khoảng thời gian hub gom các lượt poll thành một truy vấn.
+`WORKFLOW_RUN_RECONCILE_*` cấu hình tiến trình nền đồng bộ bảng `workflow_runs` với Temporal: chu kỳ (0 để tắt),
+khoảng lùi khi quét visibility theo `StartTime`, số bản ghi mỗi lô và thời hạn lease (`service_leases`) bảo đảm chỉ
+một process API chạy reconciler; process khác tiếp quản khi lease hết hạn.
+`WORKFLOW_STATUS_*` cấu hình kho trạng thái nội bộ của API (`api/workflow_status.py`): backend (`memory` mặc định, giới hạn
+số entry; `sql` hoặc `redis` qua `REDIS_URL` khi cần dùng chung giữa các process), TTL của mỗi entry, số entry tối đa của cache
+trong process, thời gian cache đọc trong process (0 để tắt) và chu kỳ xóa entry hết hạn trong bảng SQL.
+`SOCKETIO_MESSAGE_QUEUE` là URL Redis (hoặc server tương thích như Valkey) dùng làm message queue cho Socket.IO
+khi chạy nhiều process API; để trống khi chỉ chạy một process. `API_WORKERS` (đọc trong Dockerfile) là số process uvicorn.
+`PROGRESS_STREAM_*` cấu hình endpoint SSE `/api/generator/progress/{workflow_id}`: chu kỳ lấy tiến độ
+và khoảng thời gian tối đa giữa hai lần gửi (gửi comment keep-alive khi tiến độ không đổi).
+`ADMISSION_*` cấu hình kiểm soát tải của các endpoint sinh mã (`api/services/admission.py`): số workflow in-flight tối đa
+mỗi loại (`ADMISSION_TYPE_LIMITS` ghi đè theo loại, dạng `XML=2,BE=8`) và mỗi client (0 = không giới hạn), số request
+được chờ mỗi loại, thời gian chờ tối đa, `Retry-After` mặc định và chu kỳ kiểm tra workflow đã kết thúc.
+Slot nằm trong backend dùng chung `ADMISSION_BACKEND` (`sql` mặc định, `redis` qua `REDIS_URL`, `memory` khi chỉ chạy
+một process) nên giới hạn áp dụng cho cả deployment: `ADMISSION_SLOT_TTL_SECONDS`
+là hạn của slot khi process giữ nó dừng đột ngột (phải lớn hơn chu kỳ kiểm tra), `ADMISSION_WAIT_CHECK_SECONDS` là chu kỳ request
+đang chờ kiểm tra lại slot trống. Có thể đổi giới hạn lúc runtime qua `PUT /api/generator/admission`; các process khác
+áp dụng sau tối đa `ADMISSION_LIMITS_CACHE_SECONDS`. Endpoint này yêu cầu header `X-Admin-Token` bằng `ADMIN_API_TOKEN`;
+để trống `ADMIN_API_TOKEN` (mặc định) thì endpoint bị tắt và chỉ đổi được giới hạn qua biến môi trường.
 """
 
 CURRENT_PREFIX_LIST = ["nagaco", "hrm", "fin", "man"]
@@ -29,3 +95,68 @@ BACKEND_ADDON_MAP = {
     "RE": os.getenv("BACKEND_ADDON_RE", "odoo_addon_repository"),
     "MES": os.getenv("BACKEND_ADDON_MES", "odoo_addon_mes"),
 }
+BLOB_STORE_BACKEND = os.getenv("BLOB_STORE_BACKEND", "local").lower()
+BLOB_STORE_PATH = os.path.expanduser(os.getenv("BLOB_STORE_PATH", "./data/blobs"))
+ARTIFACT_STORE_PATH = os.path.expanduser(os.getenv("ARTIFACT_STORE_PATH", "./data/artifacts"))
+BLOB_STORE_TTL_SECONDS = int(os.getenv("BLOB_STORE_TTL_SECONDS", str(14 * 24 * 3600)))
+ARTIFACT_STORE_TTL_SECONDS = int(os.getenv("ARTIFACT_STORE_TTL_SECONDS", str(7 * 24 * 3600)))
+STORE_SWEEP_INTERVAL_SECONDS = int(os.getenv("STORE_SWEEP_INTERVAL_SECONDS", "3600"))
+MAX_PARALLEL_MODELS = int(os.getenv("MAX_PARALLEL_MODELS", "16"))
+GENERATION_CHUNK_SIZE = int(os.getenv("GENERATION_CHUNK_SIZE", "0"))
+GENERATION_SHARD_THRESHOLD = int(os.getenv("GENERATION_SHARD_THRESHOLD", "500"))
+GENERATION_SHARD_SIZE = int(os.getenv("GENERATION_SHARD_SIZE", "200"))
+GENERATION_MAX_PARALLEL_SHARDS = int(os.getenv("GENERATION_MAX_PARALLEL_SHARDS", "4"))
+GENERATION_SHARDS_PER_RUN = int(os.getenv("GENERATION_SHARDS_PER_RUN", "8"))
+CODEGEN_PROCESS_POOL_SIZE = int(os.getenv("CODEGEN_PROCESS_POOL_SIZE", str(os.cpu_count() or 1)))
+IO_THREAD_POOL_SIZE = int(os.getenv("IO_THREAD_POOL_SIZE", "8"))
+EXCEL_PROCESS_POOL_SIZE = int(os.getenv("EXCEL_PROCESS_POOL_SIZE", "2"))
+EXCEL_READER_ENGINE = os.getenv("EXCEL_READER_ENGINE", "openpyxl").lower()
+XML_MAX_PARALLEL_WORKBOOKS = int(os.getenv("XML_MAX_PARALLEL_WORKBOOKS", "4"))
+DEPLOY_MAX_CONCURRENT_ACTIVITIES = int(os.getenv("DEPLOY_MAX_CONCURRENT_ACTIVITIES", "2"))
+DB_CONTEXT_MAX_CONCURRENT_ACTIVITIES = int(os.getenv("DB_CONTEXT_MAX_CONCURRENT_ACTIVITIES", "8"))
+BULK_CODEGEN_PROCESS_POOL_SIZE = int(os.getenv("BULK_CODEGEN_PROCESS_POOL_SIZE", str(max(1, (os.cpu_count() or 1) // 2))))
+BULK_EXCEL_PROCESS_POOL_SIZE = int(os.getenv("BULK_EXCEL_PROCESS_POOL_SIZE", "1"))
+BULK_DEPLOY_MAX_CONCURRENT_ACTIVITIES = int(os.getenv("BULK_DEPLOY_MAX_CONCURRENT_ACTIVITIES", "1"))
+BULK_DB_CONTEXT_MAX_CONCURRENT_ACTIVITIES = int(os.getenv("BULK_DB_CONTEXT_MAX_CONCURRENT_ACTIVITIES", "4"))
+BULK_PROCESS_NICENESS = int(os.getenv("BULK_PROCESS_NICENESS", "10"))
+WORKER_LANES = [lane.strip() for lane in os.getenv("WORKER_LANES", "interactive,bulk").split(",") if lane.strip()]
+GENERATION_BULK_THRESHOLD = int(os.getenv("GENERATION_BULK_THRESHOLD", "50"))
+WORKER_EMBEDDED_QUEUES = [queue.strip() for queue in os.getenv("WORKER_EMBEDDED_QUEUES", "codegen-cpu,excel-parse,deploy-io,db-context").split(",") if queue.strip()]
+PAYLOAD_CODEC = os.getenv("PAYLOAD_CODEC", "auto").lower()
+PAYLOAD_COMPRESSION_THRESHOLD = int(os.getenv("PAYLOAD_COMPRESSION_THRESHOLD", "4096"))
+GENERATOR_VERSION = os.getenv("GENERATOR_VERSION", "")
+ARTIFACT_CACHE_ENABLED = os.getenv("ARTIFACT_CACHE_ENABLED", "true").lower() == "true"
+ARTIFACT_CACHE_PATH = os.path.expanduser(os.getenv("ARTIFACT_CACHE_PATH", "./data/artifact_cache"))
+ARTIFACT_CACHE_MAX_ENTRIES = int(os.getenv("ARTIFACT_CACHE_MAX_ENTRIES", "50000"))
+ARTIFACT_CACHE_TTL_SECONDS = int(os.getenv("ARTIFACT_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+ARTIFACT_CACHE_EVICT_INTERVAL_SECONDS = int(os.getenv("ARTIFACT_CACHE_EVICT_INTERVAL_SECONDS", "600"))
+STATUS_POLL_MIN_INTERVAL_SECONDS = float(os.getenv("STATUS_POLL_MIN_INTERVAL_SECONDS", "2"))
+STATUS_POLL_MAX_INTERVAL_SECONDS = float(os.getenv("STATUS_POLL_MAX_INTERVAL_SECONDS", "30"))
+STATUS_POLL_BACKOFF = float(os.getenv("STATUS_POLL_BACKOFF", "1.5"))
+STATUS_BATCH_CHUNK_SIZE = int(os.getenv("STATUS_BATCH_CHUNK_SIZE", "100"))
+STATUS_BATCH_WINDOW_SECONDS = float(os.getenv("STATUS_BATCH_WINDOW_SECONDS", "0.05"))
+WORKFLOW_RUN_RECONCILE_INTERVAL_SECONDS = float(os.getenv("WORKFLOW_RUN_RECONCILE_INTERVAL_SECONDS", "30"))
+WORKFLOW_RUN_RECONCILE_OVERLAP_SECONDS = int(os.getenv("WORKFLOW_RUN_RECONCILE_OVERLAP_SECONDS", "300"))
+WORKFLOW_RUN_RECONCILE_BATCH_SIZE = int(os.getenv("WORKFLOW_RUN_RECONCILE_BATCH_SIZE", "500"))
+WORKFLOW_RUN_RECONCILE_LEASE_SECONDS = float(os.getenv("WORKFLOW_RUN_RECONCILE_LEASE_SECONDS", "120"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+WORKFLOW_STATUS_BACKEND = os.getenv("WORKFLOW_STATUS_BACKEND", "memory").lower()
+WORKFLOW_STATUS_TTL_SECONDS = int(os.getenv("WORKFLOW_STATUS_TTL_SECONDS", str(7 * 24 * 3600)))
+WORKFLOW_STATUS_MAX_ENTRIES = int(os.getenv("WORKFLOW_STATUS_MAX_ENTRIES", "10000"))
+WORKFLOW_STATUS_LOCAL_CACHE_SECONDS = float(os.getenv("WORKFLOW_STATUS_LOCAL_CACHE_SECONDS", "2"))
+WORKFLOW_STATUS_PURGE_INTERVAL_SECONDS = int(os.getenv("WORKFLOW_STATUS_PURGE_INTERVAL_SECONDS", "3600"))
+SOCKETIO_MESSAGE_QUEUE = os.getenv("SOCKETIO_MESSAGE_QUEUE", "")
+PROGRESS_STREAM_INTERVAL_SECONDS = float(os.getenv("PROGRESS_STREAM_INTERVAL_SECONDS", "1"))
+PROGRESS_STREAM_HEARTBEAT_SECONDS = float(os.getenv("PROGRESS_STREAM_HEARTBEAT_SECONDS", "15"))
+ADMISSION_MAX_IN_FLIGHT_PER_TYPE = int(os.getenv("ADMISSION_MAX_IN_FLIGHT_PER_TYPE", "8"))
+ADMISSION_MAX_IN_FLIGHT_PER_CLIENT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT_PER_CLIENT", "4"))
+ADMISSION_TYPE_LIMITS = {key.strip().upper(): int(value) for key, _, value in (item.partition("=") for item in os.getenv("ADMISSION_TYPE_LIMITS", "").split(",")) if key.strip() and value.strip()}
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "16"))
+ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "10"))
+ADMISSION_RETRY_AFTER_SECONDS = int(os.getenv("ADMISSION_RETRY_AFTER_SECONDS", "5"))
+ADMISSION_POLL_INTERVAL_SECONDS = float(os.getenv("ADMISSION_POLL_INTERVAL_SECONDS", "2"))
+ADMISSION_BACKEND = os.getenv("ADMISSION_BACKEND", "sql").lower()
+ADMISSION_SLOT_TTL_SECONDS = float(os.getenv("ADMISSION_SLOT_TTL_SECONDS", "60"))
+ADMISSION_WAIT_CHECK_SECONDS = float(os.getenv("ADMISSION_WAIT_CHECK_SECONDS", "0.5"))
+ADMISSION_LIMITS_CACHE_SECONDS = float(os.getenv("ADMISSION_LIMITS_CACHE_SECONDS", "5"))
+ADMIN_API_TOKEN = os.getenv("ADMIN_API_TOKEN", "")
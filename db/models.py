@@ -1,5 +1,5 @@
 # models.py
-from sqlalchemy import Column, Integer, String, DateTime, Text
+from sqlalchemy import Column, Index, Integer, String, DateTime, Text
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.sql import func
 
@@ -7,13 +7,19 @@ Base = declarative_base()
 
 
 class XmlFile(Base):
+    """
+    File XML template. Mỗi `(module, filename)` chỉ có một bản ghi (unique index, là khóa upsert của `db/xml_files.py`).
+    `module` không NULL (XML thiếu `module_code` lưu `""`) để mọi bản ghi đều tham gia ràng buộc unique.
+    """
+
     __tablename__ = "xml_files"
+    __table_args__ = (Index("uq_xml_files_module_filename", "module", "filename", unique=True),)
 
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String, nullable=False)
     system = Column(String, nullable=True)
     sub_system = Column(String, nullable=True)
-    module = Column(String, nullable=True)
+    module = Column(String, nullable=False, default="", server_default="")
     category = Column(String, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     content = Column(Text)
@@ -31,3 +37,94 @@ class GitJob(Base):
     started_at = Column(DateTime(timezone=True), nullable=True)
     completed_at = Column(DateTime(timezone=True), nullable=True)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+
+class GenerationRequest(Base):
+    __tablename__ = "generation_requests"
+
+    id = Column(Integer, primary_key=True, index=True)
+    request_hash = Column(String, nullable=False, unique=True, index=True)
+    module = Column(String, nullable=False)
+    workflow_id = Column(String, nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+
+class WorkflowStatusEntry(Base):
+    __tablename__ = "workflow_statuses"
+
+    id = Column(Integer, primary_key=True, index=True)
+    workflow_id = Column(String, nullable=False, unique=True, index=True)
+    status = Column(String, nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+
+class AdmissionSlotEntry(Base):
+    """
+    Slot admission đang được giữ (`kind` = `run`) hoặc request đang chờ slot (`kind` = `wait`), dùng chung cho mọi process API.
+    Process giữ slot gia hạn `expires_at` định kỳ; slot của process đã dừng tự hết hạn.
+    """
+
+    __tablename__ = "admission_slots"
+    __table_args__ = (Index("ix_admission_slots_kind_type", "kind", "workflow_type", "expires_at"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    slot_id = Column(String, nullable=False, unique=True, index=True)
+    kind = Column(String, nullable=False)
+    workflow_type = Column(String, nullable=False)
+    client_key = Column(String, nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+
+class AdmissionSetting(Base):
+    """
+    Giới hạn admission đổi lúc runtime (`PUT /api/generator/admission`), lưu dạng JSON trong bản ghi `name` = `limits`.
+    Bản ghi này cũng được khóa (`SELECT ... FOR UPDATE`) để các process cấp slot tuần tự.
+    """
+
+    __tablename__ = "admission_settings"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, nullable=False, unique=True, index=True)
+    value = Column(Text, nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+
+class WorkflowRun(Base):
+    """
+    Bản sao cục bộ của danh sách workflow trên Temporal, dùng cho `/api/generator/workflows` thay vì duyệt visibility store.
+    Các index kết thúc bằng `(start_time, workflow_id)` để phân trang keyset theo thứ tự mới nhất trước.
+    """
+
+    __tablename__ = "workflow_runs"
+    __table_args__ = (
+        Index("ix_workflow_runs_start", "start_time", "workflow_id"),
+        Index("ix_workflow_runs_status_start", "status", "start_time", "workflow_id"),
+        Index("ix_workflow_runs_type_start", "workflow_type", "start_time", "workflow_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    workflow_id = Column(String, nullable=False, unique=True, index=True)
+    run_id = Column(String, nullable=True)
+    workflow_type = Column(String, nullable=True)
+    status = Column(String, nullable=False)
+    start_time = Column(DateTime(timezone=True), nullable=False)
+    close_time = Column(DateTime(timezone=True), nullable=True)
+    history_length = Column(Integer, nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+
+class ServiceLease(Base):
+    """
+    Lease của các tác vụ nền chỉ được chạy ở một process trong toàn bộ deployment (vd. reconciler `workflow_runs`).
+    Process giữ lease gia hạn `expires_at` định kỳ; lease hết hạn thì process khác được nhận.
+    """
+
+    __tablename__ = "service_leases"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, nullable=False, unique=True, index=True)
+    owner = Column(String, nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
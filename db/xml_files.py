@@ -0,0 +1,43 @@
+# xml_files.py
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.models import XmlFile
+
+# Số bản ghi mỗi câu lệnh `INSERT ... ON CONFLICT` (6 tham số mỗi bản ghi, dưới giới hạn tham số của asyncpg)
+UPSERT_BATCH_SIZE = 500
+
+# Các dialect hỗ trợ `INSERT ... ON CONFLICT DO UPDATE` (SQLite dùng khi chạy cục bộ)
+UPSERT_DIALECTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+# Cột được ghi đè khi `(module, filename)` đã có bản ghi; `id` và `created_at` giữ nguyên
+XML_FILE_UPDATE_COLUMNS = ("system", "sub_system", "category", "content")
+
+
+def xml_file_row(filename: str, content: str, system: str = None, sub_system: str = None, module: str = None, category: str = None) -> dict:
+    """
+    Bản ghi `xml_files` cho `upsert_xml_files`. `module` rỗng (XML thiếu `module_code`) được lưu là `""` để vẫn trùng khóa.
+    """
+    return {"filename": filename, "system": system, "sub_system": sub_system, "module": module or "", "category": category, "content": content}
+
+
+async def upsert_xml_files(session: AsyncSession, rows: list[dict]) -> dict[tuple[str, str], int]:
+    """
+    Ghi các bản ghi `xml_file_row` theo khóa `(module, filename)` bằng `INSERT ... ON CONFLICT DO UPDATE`
+    (unique index `uq_xml_files_module_filename`), theo lô `UPSERT_BATCH_SIZE` bản ghi. Không commit.
+
+    - Bản ghi đã có được cập nhật `XML_FILE_UPDATE_COLUMNS`; hai bản ghi cùng khóa thì bản ghi sau thắng.
+    - Trả về `id` của từng khóa đã ghi.
+    """
+    rows = list({(row["module"], row["filename"]): row for row in rows}.values())
+    insert = UPSERT_DIALECTS[session.bind.dialect.name]
+    ids = {}
+    for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+        stmt = insert(XmlFile).values(rows[start : start + UPSERT_BATCH_SIZE])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[XmlFile.module, XmlFile.filename],
+            set_={column: stmt.excluded[column] for column in XML_FILE_UPDATE_COLUMNS},
+        ).returning(XmlFile.id, XmlFile.module, XmlFile.filename)
+        for xml_file_id, module, filename in await session.execute(stmt):
+            ids[(module, filename)] = xml_file_id
+    return ids
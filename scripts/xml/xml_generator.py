@@ -1,7 +1,6 @@
+import numpy as np
 import pandas as pd
-import xml.etree.ElementTree as ET
-from xml.sax.saxutils import escape
-import xml.dom.minidom as minidom
+import io
 import re
 import os
 
@@ -35,6 +34,88 @@ SKIP_FIELDS = [
     "active",
 ]
 
+INDENT = "    "
+
+TEXT_ESCAPES = [("&", "&amp;"), ("<", "&lt;"), (">", "&gt;"), ("\r\n", "\n"), ("\r", "\n")]
+QUOTE_ESCAPES = [('"', "&quot;")]
+# Ký tự phân cách khi nối cả cột để escape một lần (không hợp lệ trong XML nên không xuất hiện trong dữ liệu hợp lệ)
+COLUMN_SEPARATOR = "\x00"
+
+SEARCHABLE_VALUES = {"1", "c", "t", "d"}
+
+# Số dòng mỗi đoạn khi dựng thẻ `<field>` của một sheet
+ROWS_PER_CHUNK = 2000
+
+# Engine đọc Excel: `openpyxl` (read-only, đọc từng dòng) hoặc `calamine` (nhanh hơn, cần cài `python-calamine`)
+EXCEL_ENGINES = ("openpyxl", "calamine")
+
+# Tên thẻ XML hợp lệ (tên cột Excel được dùng trực tiếp làm tên thẻ)
+XML_TAG_PATTERN = re.compile(r"^[^\W\d][\w.\-]*$")
+
+
+def _escape_text(text: str, quote: bool = True) -> str:
+    """
+    Escape nội dung thẻ như `minidom` (`&`, `<`, `>`, và `"` nếu `quote`), chuẩn hóa xuống dòng `\r\n`/`\r` thành `\n`.
+    """
+    for old, new in TEXT_ESCAPES + QUOTE_ESCAPES if quote else TEXT_ESCAPES:
+        text = text.replace(old, new)
+    return text
+
+
+def _escape_column(texts: list[str], quote: bool = True) -> list[str]:
+    """
+    `_escape_text` cho cả cột: nối cột thành một chuỗi để mỗi phép thay thế chỉ chạy một lần trên toàn bộ cột.
+    """
+    joined = COLUMN_SEPARATOR.join(texts)
+    if joined.count(COLUMN_SEPARATOR) != max(len(texts) - 1, 0):
+        return [_escape_text(text, quote) for text in texts]
+    return _escape_text(joined, quote).split(COLUMN_SEPARATOR) if texts else []
+
+
+def _text_element(indent: str, tag: str, text: str) -> str:
+    return f"{indent}<{tag}>{text}</{tag}>" if text else f"{indent}<{tag}/>"
+
+
+def _text_elements(indent: str, tag: str, texts: list[str], missing) -> list:
+    """
+    Thẻ của cả cột; `None` ở các ô trống (`missing`) để bỏ qua khi ghép dòng.
+    """
+    start, end, empty = f"{indent}<{tag}>", f"</{tag}>", f"{indent}<{tag}/>"
+    return [None if is_missing else f"{start}{text}{end}" if text else empty for text, is_missing in zip(texts, missing)]
+
+
+def _check_tag(tag: str):
+    if not XML_TAG_PATTERN.match(tag):
+        raise ValueError(f"Invalid column name for XML tag: {tag!r}")
+
+
+def excel_engine(engine: str = "openpyxl") -> str:
+    """
+    Chuẩn hóa tên engine đọc Excel; `auto` chọn `calamine` nếu đã cài `python-calamine`, ngược lại `openpyxl`.
+    """
+    engine = (engine or "openpyxl").strip().lower()
+    if engine == "auto":
+        try:
+            import python_calamine  # noqa: F401
+        except ImportError:
+            return "openpyxl"
+        return "calamine"
+    if engine not in EXCEL_ENGINES:
+        raise ValueError(f"Invalid Excel engine: {engine} (expected one of auto, {', '.join(EXCEL_ENGINES)})")
+    return engine
+
+
+def open_workbook(source, engine: str = "openpyxl") -> pd.ExcelFile:
+    """
+    Mở workbook (đường dẫn, file-like hoặc bytes) để đọc lần lượt từng sheet.
+
+    Với `openpyxl`, workbook được mở ở chế độ read-only: các dòng được đọc tuần tự từ file nén khi parse từng sheet,
+    không nạp toàn bộ workbook vào bộ nhớ.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    return pd.ExcelFile(source, engine=excel_engine(engine))
+
 
 class XmlGenerator:
     def __init__(self, excel_file):
@@ -46,110 +127,163 @@ class XmlGenerator:
         return "_".join(shortened_parts)
 
     def _dataframe_to_xml(self, df: pd.DataFrame, model: str, kw: dict) -> str:
-        root = ET.Element("root")
+        """
+        Chuyển một sheet thành XML template (định dạng giống `minidom.toprettyxml(indent="    ")`).
+
+        Chuẩn hóa tên cột, ánh xạ `TYPE_CONFIG`/`NOT_NULL_CONFIG`, lọc dòng bỏ qua, xác định trường tìm kiếm
+        và escape nội dung đều làm theo cả cột; sau đó mỗi dòng chỉ còn nối các thẻ đã dựng sẵn.
+        XML được ghi trực tiếp thành chuỗi, không dựng cây rồi parse lại để pretty-print.
+        """
         system_code = kw.get("system_code", "SYS")
         sub_system_code = kw.get("sub_system_code", "SUB")
         module_code = self._get_module_code(model.lower().replace(f"{system_code.lower()}_", ""))
         module = kw.get("module", "categories")
 
-        ET.SubElement(root, "system_code").text = system_code
-        ET.SubElement(root, "sub_system_code").text = sub_system_code
-        ET.SubElement(root, "module").text = module.lower()
-        ET.SubElement(root, "module_code").text = module_code
-        ET.SubElement(root, "model").text = model.lower()
-        ET.SubElement(root, "default_order").text = "id"
+        lines = ['<?xml version="1.0" ?>', "<root>"]
+        for tag, text in (
+            ("system_code", system_code),
+            ("sub_system_code", sub_system_code),
+            ("module", module.lower()),
+            ("module_code", module_code),
+            ("model", model.lower()),
+            ("default_order", "id"),
+        ):
+            lines.append(_text_element(INDENT, tag, _escape_text(str(text))))
 
-        fields_elem = ET.SubElement(root, "fields")
-        searchable_list = []
-        auto_searchable_list = []
+        # Dựng thẻ `<field>` theo từng đoạn `ROWS_PER_CHUNK` dòng để bộ nhớ tạm chỉ tỉ lệ với một đoạn,
+        # mỗi đoạn được nối thành chuỗi ngay; `searchable_list` tự động chỉ dùng khi cả sheet không đánh dấu trường nào
+        chunks, searchable_list, auto_searchable_list = [], [], []
+        for start in range(0, len(df), ROWS_PER_CHUNK):
+            field_lines, searchable, auto_searchable = self._fields_to_xml(df.iloc[start : start + ROWS_PER_CHUNK])
+            if field_lines:
+                chunks.append("\n".join(field_lines))
+            searchable_list.extend(searchable)
+            auto_searchable_list.extend(auto_searchable)
+        searchable_list = searchable_list or auto_searchable_list
 
-        for _, row in df.iterrows():
-            # Chuẩn hóa tất cả key về lowercase
-            row = {str(k).strip().lower(): v for k, v in row.items()}
+        if chunks:
+            lines.append(f"{INDENT}<fields>")
+            lines.extend(chunks)
+            lines.append(f"{INDENT}</fields>")
+        else:
+            lines.append(f"{INDENT}<fields/>")
 
-            name = row.get("name")
-            if not name or pd.isna(name) or str(name).strip() == "" or name in SKIP_FIELDS:
-                continue
+        lines.append(_text_element(INDENT, "searchable_list", _escape_text(",".join(searchable_list))))
+        lines.append("</root>")
+        return "\n".join(lines) + "\n"
 
-            name = str(name).strip()
+    def _fields_to_xml(self, df: pd.DataFrame) -> tuple[list[str], list[str], list[str]]:
+        """
+        Dựng các thẻ `<field>` của một đoạn sheet, trả về `(các dòng XML, trường đánh dấu searchable, trường varchar/text)`.
+        """
+        # Cùng kiểu dữ liệu từng ô như khi duyệt `iterrows` (mảng giá trị chung của cả DataFrame)
+        values = df.to_numpy()
+        # Tên cột chuẩn hóa -> vị trí cột; cột trùng tên sau chuẩn hóa lấy giá trị cột cuối, giữ vị trí xuất hiện đầu
+        columns = {}
+        for position, column in enumerate(df.columns):
+            columns[str(column).strip().lower()] = position
+        if "name" not in columns or not len(df):
+            return [], [], []
 
-            # Check if field is searchable
-            searchable_val = str(row.get("searchable", "")).lower().strip()
-            if searchable_val in {"1", "c", "t", "d"}:
-                searchable_list.append(name)
+        # Lọc các dòng không có tên hoặc thuộc `SKIP_FIELDS` trên cả cột `name` trước khi xử lý các cột khác
+        names = values[:, columns["name"]]
+        name_text = [str(name).strip() for name in names]
+        keep = np.flatnonzero([not (missing or not name or name in SKIP_FIELDS or not text) for name, missing, text in zip(names, pd.isna(names), name_text)])
+        if not len(keep):
+            return [], [], []
 
-            # Prepare fallback searchable list based on mapped type
-            raw_type = row.get("type", "")
-            mapped_type = TYPE_CONFIG.get(str(raw_type).strip().lower(), "varchar")
-            if mapped_type in {"varchar", "text"}:
-                auto_searchable_list.append(name)
+        raw = {key: values[keep, position] for key, position in columns.items()}
+        missing = {key: pd.isna(column) for key, column in raw.items()}
+        name_text = [name_text[index] for index in keep]
 
-            field_elem = ET.SubElement(fields_elem, "field")
+        mapped_type = [TYPE_CONFIG.get(str(value).strip().lower(), "varchar") for value in raw["type"]] if "type" in raw else ["varchar"] * len(keep)
+        if "searchable" in raw:
+            searchable_list = [name for name, value in zip(name_text, raw["searchable"]) if str(value).lower().strip() in SEARCHABLE_VALUES]
+        else:
+            searchable_list = []
+        auto_searchable_list = [name for name, field_type in zip(name_text, mapped_type) if field_type in ("varchar", "text")]
 
-            if name == "id":
-                ET.SubElement(field_elem, "primary_key").text = "1"
-
-            for tag, value in row.items():
-                if tag == "index" or pd.isna(value):
-                    continue
-
-                val = str(value).strip()
+        # Mỗi cột thành một cột thẻ XML đã escape (None ở ô trống); thẻ `foreign_key` đi ngay sau `reference`
+        depth = INDENT * 3
+        elements = []
+        for key, column in raw.items():
+            if key == "index":
+                continue
+            _check_tag(key)
+            if key == "type":
+                text = mapped_type
+            elif key == "not_null":
+                text = [NOT_NULL_CONFIG.get(str(value).strip().lower(), "0") for value in column]
+            else:
+                text = [str(value).strip() for value in column]
+            # Giá trị được escape hai lần như trước đây (`saxutils.escape` rồi khi ghi XML)
+            elements.append(_text_elements(depth, key, _escape_column(_escape_column(text, quote=False)), missing[key]))
 
-                match tag:
-                    case "type":
-                        val = TYPE_CONFIG.get(val.lower(), "varchar")
-                    case "not_null":
-                        val = NOT_NULL_CONFIG.get(val.lower(), "0")
-                    case _:
-                        val = val
+            if key == "reference":
+                if "serialized_field" in raw:
+                    serialized = [str(value).strip() if not is_missing and value else "id,code,name" for value, is_missing in zip(raw["serialized_field"], missing["serialized_field"])]
+                else:
+                    serialized = ["id,code,name"] * len(keep)
+                foreign_keys = [f"{value},{fields}" for value, fields in zip(text, serialized)]
+                no_foreign_key = [is_missing or value.lower() == "khóa chính" or "," in value for value, is_missing in zip(text, missing[key])]
+                elements.append(_text_elements(depth, "foreign_key", _escape_column(foreign_keys), no_foreign_key))
 
-                elem = ET.SubElement(field_elem, tag)
-                elem.text = escape(val)
+        primary_key = f"{depth}<primary_key>1</primary_key>"
+        field_open, field_close = f"{INDENT * 2}<field>", f"{INDENT * 2}</field>"
+        field_lines = []
+        for name, *row in zip(name_text, *elements):
+            field_lines.append(field_open)
+            if name == "id":
+                field_lines.append(primary_key)
+            field_lines.extend(element for element in row if element is not None)
+            field_lines.append(field_close)
+        return field_lines, searchable_list, auto_searchable_list
 
-                if tag == "reference" and val.lower() != "khóa chính" and "," not in val:
-                    serialized_val = row.get("serialized_field", "id,code,name")
-                    serialized_val = str(serialized_val).strip() if serialized_val and not pd.isna(serialized_val) else "id,code,name"
-                    fk = ET.SubElement(field_elem, "foreign_key")
-                    fk.text = f"{val},{serialized_val}"
+    def generate_xml(self, kw: dict) -> dict:
+        return dict(self.iter_xml(kw))
 
-        if not searchable_list:
-            searchable_list = auto_searchable_list
-        ET.SubElement(root, "searchable_list").text = ",".join(searchable_list)
+    def sheet_names(self) -> list[str]:
+        """
+        Các sheet được chuyển thành model (bỏ qua các sheet mặc định `Sheet...`), theo thứ tự trong workbook.
+        """
+        return [sheet_name for sheet_name in self.excel.sheet_names if "Sheet" not in sheet_name]
 
-        xml_bytes = ET.tostring(root, encoding="UTF-8")
-        return minidom.parseString(xml_bytes).toprettyxml(indent="    ")
+    def iter_xml(self, kw: dict):
+        """
+        Sinh XML lần lượt từng sheet, yield `(model_name, xml_string)`.
 
-    def generate_xml(self, kw: dict) -> dict:
-        result = {}
-        for sheet_name in self.excel.sheet_names:
-            if "Sheet" in sheet_name:
-                continue
+        Mỗi sheet được đọc, chuyển thành XML rồi giải phóng trước khi sang sheet tiếp theo, nên bộ nhớ dùng cho
+        việc chuyển đổi chỉ tỉ lệ với sheet lớn nhất (đọc workbook ở chế độ read-only, xem `open_workbook`).
+        """
+        for sheet_name in self.sheet_names():
+            yield self.sheet_to_xml(sheet_name, kw)
 
-            df = self.excel.parse(sheet_name)
-            df.drop(
-                df.columns[df.columns.str.contains("unnamed", case=False)],
-                axis=1,
-                inplace=True,
-            )
-            model_name_from_col = None
-            model_name_col = None
-            for col in df.columns:
-                if str(col).strip().lower() == "model_name":
-                    model_name_col = col
-                    break
-            if model_name_col is not None:
-                non_null = df[model_name_col].dropna()
-                if not non_null.empty:
-                    candidate = str(non_null.iloc[0]).strip()
-                    if candidate:
-                        model_name_from_col = candidate.lower()
-                df.drop(columns=[model_name_col], inplace=True)
-            prefix = kw.get("system_code", "SYS").lower()
-            clean_name = re.sub(r"^[0-9]+\.?\s*", "", sheet_name).lower()
-            clean_name = re.sub(f"{prefix}_", "", clean_name)
-            # Tạm thời để tên là model nhưng về sau phải đổi từ request.
-            model_name = model_name_from_col or f"{prefix}_{re.sub('.xlsx', '', clean_name)}"
-            xml_string = self._dataframe_to_xml(df, model=model_name, kw=kw)
-            result[model_name] = xml_string
-
-        return result
+    def sheet_to_xml(self, sheet_name: str, kw: dict) -> tuple[str, str]:
+        """
+        Chuyển một sheet thành `(model_name, xml_string)`. Các sheet độc lập với nhau nên có thể xử lý song song.
+        """
+        df = self.excel.parse(sheet_name)
+        df.drop(
+            df.columns[df.columns.str.contains("unnamed", case=False)],
+            axis=1,
+            inplace=True,
+        )
+        model_name_from_col = None
+        model_name_col = None
+        for col in df.columns:
+            if str(col).strip().lower() == "model_name":
+                model_name_col = col
+                break
+        if model_name_col is not None:
+            non_null = df[model_name_col].dropna()
+            if not non_null.empty:
+                candidate = str(non_null.iloc[0]).strip()
+                if candidate:
+                    model_name_from_col = candidate.lower()
+            df.drop(columns=[model_name_col], inplace=True)
+        prefix = kw.get("system_code", "SYS").lower()
+        clean_name = re.sub(r"^[0-9]+\.?\s*", "", sheet_name).lower()
+        clean_name = re.sub(f"{prefix}_", "", clean_name)
+        # Tạm thời để tên là model nhưng về sau phải đổi từ request.
+        model_name = model_name_from_col or f"{prefix}_{re.sub('.xlsx', '', clean_name)}"
+        return model_name, self._dataframe_to_xml(df, model=model_name, kw=kw)
@@ -4,6 +4,11 @@ from .be_deployer import *
 from .xml_generator import *
 from .db_writer import *
 from .unit_test_generator import *
+from .template_loader import *
+from .artifact_writer import *
+from .artifact_cache_ops import *
+from .xml_file_loader import *
+from .shard_parts import *
 
 fe_activities = [
     generate_column_setting,
@@ -12,23 +17,65 @@ fe_activities = [
     generate_configuration,
     generate_i18n,
     generate_validator,
+    generate_fe_artifacts,
 ]
 be_activities = [
     generate_model,
     generate_controller,
     generate_route,
     generate_view,
+    generate_be_artifacts,
     deploy_backend_artifacts,
+    deploy_backend_parts,
 ]
 xml_activities = [
     generate_xml,
+    list_xml_sheets,
+    generate_sheet_xml,
 ]
 
 db_writer_activities = [
     save_generated_xml,
 ]
 
+xml_file_activities = [load_xml_file_templates]
+
+shard_activities = [write_template_manifest, load_template_manifest, write_shard_part, write_archive_from_parts]
+
 unit_test_activities = [generate_unit_tests, collect_table_contexts]
 
+template_activities = [describe_templates]
+
+artifact_activities = [write_archive]
+
+cache_activities = [lookup_artifact_cache]
+
 # Flatten everything
-all_activities = [*fe_activities, *be_activities, *xml_activities, *db_writer_activities, *unit_test_activities]
+all_activities = [*fe_activities, *be_activities, *xml_activities, *db_writer_activities, *unit_test_activities, *template_activities, *artifact_activities, *cache_activities, *xml_file_activities, *shard_activities]
+
+# Phân nhóm theo task queue (xem `temporal/constants.py`)
+# - codegen-cpu: generator thuần CPU, chạy trên process pool
+codegen_activities = [
+    describe_templates,
+    lookup_artifact_cache,
+    generate_column_setting,
+    generate_service,
+    generate_menu,
+    generate_configuration,
+    generate_i18n,
+    generate_validator,
+    generate_fe_artifacts,
+    generate_model,
+    generate_controller,
+    generate_route,
+    generate_be_artifacts,
+    generate_unit_tests,
+]
+# - excel-parse: đọc Excel bằng pandas, chạy trên process pool riêng
+excel_activities = [generate_xml, list_xml_sheets, generate_sheet_xml]
+# - deploy-io: ghi code vào addon workspace và chạy Black
+deploy_activities = [deploy_backend_artifacts, deploy_backend_parts]
+# - db-context: truy vấn database để lấy context sinh view/unit test
+db_context_activities = [generate_view, collect_table_contexts]
+# - default: các activity nhẹ đi kèm workflow (ghi ZIP, lưu/đọc XML trong DB, manifest/kết quả shard)
+default_activities = [*db_writer_activities, *artifact_activities, *xml_file_activities, *shard_activities]
@@ -0,0 +1,63 @@
+import hashlib
+import json
+
+from temporalio import activity
+
+from api.services.artifact_cache import get_artifact_cache
+from config.configuration import ARTIFACT_CACHE_ENABLED
+from temporal.generator_version import get_generator_version
+from .template_loader import xml_digest
+
+# Mã nguồn quyết định output của từng nhóm artifact, dùng để tính phiên bản cache riêng cho nhóm đó
+CACHE_SOURCES = {
+    "be": ("scripts/backend", "temporal/activities/be_generator.py"),
+    "fe": ("scripts/frontend", "temporal/activities/fe_generator.py"),
+    "ut": ("scripts/unit_test", "temporal/activities/unit_test_generator.py"),
+}
+
+
+def context_digest(digest: str, context=None) -> str:
+    """
+    Gộp thêm dữ liệu ngoài XML mà generator phụ thuộc (ví dụ `db_context` của unit test) vào digest.
+    """
+    if context is None:
+        return digest
+    return hashlib.sha256((digest + json.dumps(context, sort_keys=True, ensure_ascii=False, default=str)).encode("utf-8")).hexdigest()
+
+
+def cache_artifact(family: str, kind: str, digest: str, content):
+    """
+    Ghi kết quả vừa sinh vào cache (nếu bật) và trả lại nguyên `content` để activity dùng tiếp.
+    """
+    if ARTIFACT_CACHE_ENABLED:
+        get_artifact_cache().put(f"{family}:{kind}", digest, get_generator_version(*CACHE_SOURCES[family]), content)
+    return content
+
+
+@activity.defn
+def lookup_artifact_cache(family: str, digests: list[str], kinds: list[str], context=None) -> list[dict]:
+    """
+    Tra cache cho nhiều model một lần trước khi workflow lập lịch các activity sinh mã.
+
+    - `family`: nhóm artifact (`be`, `fe`, `ut`), quyết định phiên bản generator trong khóa cache.
+    - `digests`: digest XML của từng model (lấy từ `describe_templates`).
+    - `kinds`: các loại artifact cần tra.
+    - `context`: dữ liệu phụ thuộc ngoài XML, được gộp vào digest giống lúc ghi.
+
+    Trả về danh sách `{kind: nội dung}` chỉ gồm các loại hit, theo đúng thứ tự `digests`.
+    """
+    if not ARTIFACT_CACHE_ENABLED:
+        return [{} for _ in digests]
+
+    cache = get_artifact_cache()
+    version = get_generator_version(*CACHE_SOURCES[family])
+    results = []
+    for digest in digests:
+        key_digest = context_digest(digest, context)
+        hits = {}
+        for kind in kinds:
+            content = cache.get(f"{family}:{kind}", key_digest, version)
+            if content is not None:
+                hits[kind] = content
+        results.append(hits)
+    return results
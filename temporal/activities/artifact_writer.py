@@ -0,0 +1,17 @@
+from temporalio import activity
+
+from api.services.artifact_store import get_artifact_store
+from temporal.executors import run_io
+
+
+@activity.defn
+async def write_archive(artifact_id: str, entries: list[dict]) -> dict:
+    """
+    Đóng gói các file đã sinh thành ZIP trong artifact store.
+
+    - `artifact_id`: định danh artifact, thường là workflow ID.
+    - `entries`: danh sách `{"path", "content"}` theo đúng thứ tự cần ghi vào ZIP.
+
+    Trả về tham chiếu `{artifact_id, size, sha256}` để workflow dùng làm kết quả.
+    """
+    return await run_io(get_artifact_store().write_zip, artifact_id, entries)
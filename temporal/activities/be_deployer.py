@@ -1,10 +1,13 @@
 from __future__ import annotations
 
+import json
 import shutil
 import subprocess
 from pathlib import Path
 from temporalio import activity
+from api.services.blob_store import get_blob_store
 from config.configuration import BACKEND_ADDON_MAP, BACKEND_ADDONS_ROOT
+from temporal.executors import run_io
 
 
 def _normalize_bool(value, default: bool = False) -> bool:
@@ -221,6 +224,30 @@ async def deploy_backend_artifacts(artifacts: list[dict], kw: dict | None = None
     bước sinh mã với bước đưa code vào workspace. Vì vậy nếu deploy lỗi, workflow
     sinh code chính vẫn có thể hoàn tất và trả file ZIP để người dùng import thủ công.
     """
+    return await run_io(_deploy_backend_artifacts, artifacts, kw)
+
+
+@activity.defn
+async def deploy_backend_parts(parts: list[dict], kw: dict | None = None) -> dict:
+    """
+    Giống `deploy_backend_artifacts` nhưng đọc artifact từ các kết quả shard (`write_shard_part`) trong blob store,
+    dùng khi batch backend lớn được chia thành nhiều child workflow. Toàn bộ artifact được deploy trong một lần
+    để các `__init__.py`/`annotations.py` chỉ được cập nhật tuần tự bởi một activity.
+    """
+    return await run_io(_deploy_backend_parts, parts, kw)
+
+
+def _deploy_backend_parts(parts: list[dict], kw: dict | None = None) -> dict:
+    blob_store = get_blob_store()
+    artifacts = [artifact for ref in parts for artifact in json.loads(blob_store.read_bytes(ref["sha256"])).get("artifacts", [])]
+    return _deploy_backend_artifacts(artifacts, kw)
+
+
+def _deploy_backend_artifacts(artifacts: list[dict], kw: dict | None = None) -> dict:
+    """
+    Phần thân đồng bộ của `deploy_backend_artifacts` (ghi file, chạy Black qua subprocess),
+    được chạy trên thread pool I/O để không chặn event loop của worker.
+    """
     options = kw or {}
     if not _normalize_bool(options.get("deploy_generated_code", True), True):
         return {"status": "skipped", "reason": "deploy_generated_code=false"}
@@ -3,28 +3,71 @@ from scripts.backend.controller_generator import ControllerGenerator
 from scripts.backend.model_generator import ModelGenerator
 from scripts.backend.route_generator import RouteGenerator
 from scripts.backend.view_generator import ViewGenerator
+from temporal.executors import run_io
+from .artifact_cache_ops import cache_artifact
+from .template_loader import load_xml_dict, xml_digest
 
 
 # Các hoạt động cho BE
+# Các activity sinh mã là hàm đồng bộ, worker chạy chúng trên process pool (xem `temporal/executors.py`)
 @activity.defn
-async def generate_controller(xml_dict):
+def generate_controller(template):
     # Sinh các controller
-    return ControllerGenerator(xml_dict).generate_controller()
+    return _generate_cached("controller", template)
 
 
 @activity.defn
-async def generate_route(xml_dict):
+def generate_route(template):
     # Sinh các route
-    return RouteGenerator(xml_dict).generate_route()
+    return _generate_cached("route", template)
 
 
 @activity.defn
-async def generate_model(xml_dict):
+def generate_model(template):
     # Sinh các model
-    return ModelGenerator(xml_dict).generate_model()
+    return _generate_cached("model", template)
 
 
 @activity.defn
-async def generate_view(xml_dict):
-    # Sinh các view
-    return ViewGenerator(xml_dict).generate_view()
+async def generate_view(template):
+    # Sinh các view, generator truy vấn constraint qua psycopg2 (blocking I/O) nên chạy trên thread pool
+    return await run_io(lambda: ViewGenerator(load_xml_dict(template)).generate_view())
+
+
+# Bảng generator theo loại artifact chỉ phụ thuộc XML, dùng cho activity batch và cache.
+# View không nằm ở đây: nó truy vấn constraint hiện tại trong database (psycopg2, blocking) nên không được cache
+# và luôn chạy bằng activity `generate_view` riêng trên queue `db-context`, không chiếm process pool sinh mã.
+BE_ARTIFACT_GENERATORS = {
+    "model": lambda xml_dict: ModelGenerator(xml_dict).generate_model(),
+    "controller": lambda xml_dict: ControllerGenerator(xml_dict).generate_controller(),
+    "route": lambda xml_dict: RouteGenerator(xml_dict).generate_route(),
+}
+BE_CACHEABLE_KINDS = list(BE_ARTIFACT_GENERATORS)
+BE_ARTIFACT_KINDS = [*BE_CACHEABLE_KINDS, "view"]
+
+
+def _generate_cached(kind, template):
+    xml_dict = load_xml_dict(template)
+    return cache_artifact("be", kind, xml_digest(xml_dict), BE_ARTIFACT_GENERATORS[kind](xml_dict))
+
+
+@activity.defn
+def generate_be_artifacts(templates, kinds=None):
+    """
+    Sinh nhiều loại artifact backend cho một nhóm model trong một lần gọi activity.
+
+    - `templates`: danh sách tham chiếu blob (mỗi phần tử là 1 model), mỗi template chỉ được parse một lần.
+    - `kinds`: các loại cần sinh trong `BE_ARTIFACT_GENERATORS` (không gồm `view`), mặc định là tất cả.
+
+    Trả về danh sách `{kind: nội dung}` theo đúng thứ tự `templates`.
+    """
+    kinds = kinds or BE_CACHEABLE_KINDS
+    results = []
+    for template in templates:
+        xml_dict = load_xml_dict(template)
+        digest = xml_digest(xml_dict)
+        outputs = {}
+        for kind in kinds:
+            outputs[kind] = cache_artifact("be", kind, digest, BE_ARTIFACT_GENERATORS[kind](xml_dict))
+        results.append(outputs)
+    return results
@@ -1,40 +1,35 @@
 from temporalio import activity
 from db.session import async_session
-from db.models import XmlFile
-from sqlalchemy import select
+from db.xml_files import upsert_xml_files, xml_file_row
 import xmltodict
 
 
-@activity.defn
-async def save_generated_xml(xml_dict: dict, category: str):
-    async with async_session() as session:
-        for model_name, xml_string in xml_dict.items():
-            dict_data = xmltodict.parse(xml_string)
-            system_code = dict_data["root"]["system_code"]
-            sub_system_code = dict_data["root"]["sub_system_code"]
-            module = dict_data["root"]["module_code"]
-            filename = f"{model_name}_schema.xml"
+def _xml_file_row(model_name: str, xml_string: str, category: str) -> dict:
+    root = xmltodict.parse(xml_string)["root"]
+    return xml_file_row(
+        filename=f"{model_name}_schema.xml",
+        content=xml_string,
+        system=root["system_code"],
+        sub_system=root["sub_system_code"],
+        module=root["module_code"],
+        category=category,
+    )
 
-            # 1. Tìm hoặc tạo XmlFile
-            stmt = select(XmlFile).where(XmlFile.module == module, XmlFile.filename == filename)
-            result = await session.execute(stmt)
-            xml_file = result.scalar_one_or_none()
 
-            if not xml_file:
-                xml_file = XmlFile(
-                    filename=filename,
-                    system=system_code,
-                    sub_system=sub_system_code,
-                    module=module,
-                    category=category,
-                    content=xml_string,
-                )
-                session.add(xml_file)
-            else:
-                xml_file.system = system_code
-                xml_file.sub_system = sub_system_code
-                xml_file.category = category
-                xml_file.content = xml_string
+@activity.defn
+async def save_generated_xml(xml_dict: dict, category: str) -> int:
+    """
+    Lưu XML vừa sinh vào bảng `xml_files`, mỗi model một bản ghi theo khóa `(module, filename)`; trả về số bản ghi đã ghi.
 
-            await session.commit()
-            await session.refresh(xml_file)
+    - Upsert theo lô bằng `upsert_xml_files` (`INSERT ... ON CONFLICT (module, filename) DO UPDATE`, dùng chung với
+      `XmlService`), tất cả trong một transaction: workbook 500 model chỉ tốn vài câu lệnh thay vì select/insert/commit từng model.
+    - Bản ghi đã có được cập nhật `system`, `sub_system`, `category`, `content`; `id` và `created_at` giữ nguyên.
+    - Nếu hai model cho cùng khóa, model sau ghi đè model trước như khi lưu tuần tự.
+    """
+    rows = [_xml_file_row(model_name, xml_string, category) for model_name, xml_string in xml_dict.items()]
+    if not rows:
+        return 0
+
+    async with async_session() as session:
+        async with session.begin():
+            return len(await upsert_xml_files(session, rows))
@@ -5,40 +5,82 @@ from scripts.frontend.service_generator import ServiceGenerator
 from scripts.frontend.navigation_generator import NavigationGenerator
 from scripts.frontend.configuration_generator import ConfigurationGenerator
 from scripts.frontend.validator_generator import ValidatorGenerator
+from .artifact_cache_ops import cache_artifact
+from .template_loader import load_xml_dict, xml_digest
 
 
 # Các hoạt động cho FE
+# Các activity sinh mã là hàm đồng bộ, worker chạy chúng trên process pool (xem `temporal/executors.py`)
 @activity.defn
-async def generate_service(model_name, xml_dict):
+def generate_service(model_name, template):
     # Sinh các services
-    return ServiceGenerator().generate(model_name, xml_dict)
+    xml_dict = load_xml_dict(template)
+    return cache_artifact("fe", "service", xml_digest(xml_dict), ServiceGenerator().generate(model_name, xml_dict))
 
 
 @activity.defn
-async def generate_i18n(xml_dict):
+def generate_i18n(template):
     # Sinh đa ngôn ngữ
-    return I18nGenerator(xml_dict).generate()
+    return _generate_cached("i18n", template)
 
 
 @activity.defn
-async def generate_column_setting(xml_dict):
+def generate_column_setting(template):
     # Sinh cấu hình của các cột
-    return FieldsGenerator(xml_dict).generate()
+    return _generate_cached("column_setting", template)
 
 
 @activity.defn
-async def generate_menu(xml_dict, module_name="categories"):
-    # Sinh menu
-    return NavigationGenerator(xml_dict, module_name).generate()
+def generate_menu(template, module_name="categories"):
+    # Sinh menu, chỉ cache với module mặc định vì khóa cache không chứa `module_name`
+    if module_name != "categories":
+        return NavigationGenerator(load_xml_dict(template), module_name).generate()
+    return _generate_cached("menu", template)
 
 
 @activity.defn
-async def generate_configuration(xml_dict, module_name="categories"):
+def generate_configuration(template, module_name="categories"):
     # Sinh config
-    return ConfigurationGenerator(xml_dict).generate()
+    return _generate_cached("configuration", template)
 
 
 @activity.defn
-async def generate_validator(xml_dict):
+def generate_validator(template):
     # Sinh validator JSON từ XML
-    return ValidatorGenerator(xml_dict).generate()
+    return _generate_cached("validator", template)
+
+
+# Bảng generator theo loại artifact, dùng cho activity batch
+FE_ARTIFACT_GENERATORS = {
+    "column_setting": lambda xml_dict: FieldsGenerator(xml_dict).generate(),
+    "service": lambda xml_dict: ServiceGenerator().generate(xml_dict["root"]["model"].strip(), xml_dict),
+    "i18n": lambda xml_dict: I18nGenerator(xml_dict).generate(),
+    "validator": lambda xml_dict: ValidatorGenerator(xml_dict).generate(),
+    "menu": lambda xml_dict: NavigationGenerator(xml_dict).generate(),
+    "configuration": lambda xml_dict: ConfigurationGenerator(xml_dict).generate(),
+}
+FE_ARTIFACT_KINDS = list(FE_ARTIFACT_GENERATORS)
+
+
+def _generate_cached(kind, template):
+    xml_dict = load_xml_dict(template)
+    return cache_artifact("fe", kind, xml_digest(xml_dict), FE_ARTIFACT_GENERATORS[kind](xml_dict))
+
+
+@activity.defn
+def generate_fe_artifacts(templates, kinds=None):
+    """
+    Sinh nhiều loại artifact frontend cho một nhóm model trong một lần gọi activity.
+
+    - `templates`: danh sách tham chiếu blob (mỗi phần tử là 1 model), mỗi template chỉ được parse một lần.
+    - `kinds`: các loại cần sinh trong `FE_ARTIFACT_GENERATORS`, mặc định là tất cả.
+
+    Trả về danh sách `{kind: nội dung}` theo đúng thứ tự `templates`.
+    """
+    kinds = kinds or FE_ARTIFACT_KINDS
+    results = []
+    for template in templates:
+        xml_dict = load_xml_dict(template)
+        digest = xml_digest(xml_dict)
+        results.append({kind: cache_artifact("fe", kind, digest, FE_ARTIFACT_GENERATORS[kind](xml_dict)) for kind in kinds})
+    return results
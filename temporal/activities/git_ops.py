@@ -77,6 +77,8 @@ async def sync_git_to_db() -> dict:
             filename = repo_file["filename"]
             content = repo_file["content"]
             system, sub_system, module_code, category = await _extract_system_info(content)
+            # `xml_files.module` không NULL, cùng quy ước với `db.xml_files.xml_file_row`
+            module_code = module_code or ""
             seen_paths.add(relative_path)
 
             existing = existing_by_path.get(relative_path)
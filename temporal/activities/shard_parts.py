@@ -0,0 +1,72 @@
+import json
+
+from temporalio import activity
+
+from api.services.artifact_store import get_artifact_store
+from api.services.blob_store import get_blob_store
+from temporal.executors import run_io
+
+
+def _put_json(data, filename: str) -> dict:
+    return get_blob_store().put_bytes(json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), filename)
+
+
+def _read_json(ref: dict):
+    return json.loads(get_blob_store().read_bytes(ref["sha256"]))
+
+
+@activity.defn
+async def write_template_manifest(template_contents: list[dict]) -> dict:
+    """
+    Ghi danh sách tham chiếu template của một batch lớn vào blob store, để workflow cha và các lần
+    continue-as-new chỉ mang theo một tham chiếu thay vì toàn bộ danh sách.
+    """
+    return await run_io(_put_json, template_contents, "template-manifest.json")
+
+
+@activity.defn
+async def load_template_manifest(manifest: dict, start: int, end: int) -> list[dict]:
+    """
+    Đọc đoạn `[start, end)` của manifest template (phần việc của một shard).
+    """
+    templates = await run_io(_read_json, manifest)
+    return templates[start:end]
+
+
+@activity.defn
+async def write_shard_part(part: dict) -> dict:
+    """
+    Lưu kết quả của một shard vào blob store và trả về tham chiếu, để workflow cha không phải nhận
+    nội dung code qua history. `part` gồm:
+
+    - `entries`: các file `{path, content}` của từng model, theo đúng thứ tự ghi vào ZIP.
+    - `fragments`: phần đóng góp của shard vào các file gộp (`__init__.py`, `config.js`...), theo khóa.
+    - `models`: tên các model đã sinh; các khóa khác (vd. `artifacts` cho deploy backend) được giữ nguyên.
+    """
+    return await run_io(_put_json, part, "shard-part.json")
+
+
+def _write_archive_from_parts(artifact_id: str, parts: list[dict], trailing: list[dict]) -> dict:
+    loaded = [_read_json(ref) for ref in parts]
+    entries = [entry for part in loaded for entry in part["entries"]]
+    for spec in trailing:
+        content = "".join(item["text"] if isinstance(item, dict) else "".join(part["fragments"].get(item, "") for part in loaded) for item in spec["fragments"])
+        entries.append({"path": spec["path"], "content": content})
+    return {
+        "artifact": get_artifact_store().write_zip(artifact_id, entries),
+        "models": [model for part in loaded for model in part["models"]],
+    }
+
+
+@activity.defn
+async def write_archive_from_parts(artifact_id: str, parts: list[dict], trailing: list[dict]) -> dict:
+    """
+    Gộp kết quả các shard thành một ZIP trong artifact store.
+
+    - `parts`: tham chiếu do `write_shard_part` trả về, theo thứ tự shard; file của từng model được ghi theo đúng thứ tự này.
+    - `trailing`: các file gộp ghi sau cùng, mỗi phần tử `{path, fragments}`; `fragments` là danh sách khóa (nối phần đóng góp
+      của mọi shard theo thứ tự) hoặc `{"text": ...}` (chuỗi cố định). Nhờ vậy ZIP giống hệt khi chạy không chia shard.
+
+    Trả về `{artifact, models}` với `models` là danh sách model đã sinh theo thứ tự đầu vào.
+    """
+    return await run_io(_write_archive_from_parts, artifact_id, parts, trailing)
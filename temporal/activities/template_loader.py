@@ -0,0 +1,80 @@
+import hashlib
+import json
+
+import xmltodict
+from temporalio import activity
+
+from api.services.blob_store import get_blob_store
+
+
+def read_template_bytes(template: dict) -> bytes:
+    """
+    Đọc nội dung thô của một template.
+
+    - Template dạng tham chiếu `{filename, sha256, size}` được đọc lazily từ blob store.
+    - Template kiểu cũ `{filename, content}` (bytes nhúng thẳng trong args) vẫn được chấp nhận
+      để các workflow khởi chạy trước khi chuyển sang blob store vẫn replay được.
+    """
+    if "content" in template:
+        return bytes(template["content"])
+    return get_blob_store().read_bytes(template["sha256"])
+
+
+def load_xml_dict(template: dict) -> dict:
+    """
+    Trả về `xml_dict` của template, parse từ blob nếu cần.
+
+    Nếu đầu vào đã là dict parse sẵn (có khóa `root`) thì trả về nguyên trạng.
+    """
+    if "root" in template:
+        return template
+    return xmltodict.parse(read_template_bytes(template).decode("utf-8"))
+
+
+def xml_digest(xml_dict: dict) -> str:
+    """
+    Digest của XML đã chuẩn hóa: băm cấu trúc `xml_dict` sau khi parse, nên khác biệt về định dạng
+    (khoảng trắng, thụt lề, khai báo encoding) không làm đổi digest, còn thứ tự field vẫn được giữ.
+    """
+    return hashlib.sha256(json.dumps(xml_dict, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _foreign_models(root: dict) -> list[str]:
+    fields = (root.get("fields") or {}).get("field", [])
+    if isinstance(fields, dict):
+        fields = [fields]
+    models = []
+    for field in fields:
+        fk = field.get("foreign_key")
+        if fk:
+            model_name = fk.split(",")[0].strip()
+            if model_name:
+                models.append(model_name)
+    return models
+
+
+@activity.defn
+def describe_templates(templates: list[dict]) -> list[dict]:
+    """
+    Đọc metadata nhẹ của từng template để workflow điều phối mà không phải mang nội dung XML.
+
+    Mỗi phần tử trả về gồm `filename`, `model_name`, `system_code`, `sub_system_code`,
+    `module_code`, `foreign_models` (các model được tham chiếu qua `foreign_key`) và `xml_digest`
+    (digest XML chuẩn hóa, dùng làm khóa cache artifact), theo đúng thứ tự của `templates`.
+    """
+    result = []
+    for template in templates:
+        xml_dict = load_xml_dict(template)
+        root = xml_dict["root"]
+        result.append(
+            {
+                "filename": template.get("filename"),
+                "model_name": (root.get("model") or "").strip(),
+                "system_code": root.get("system_code"),
+                "sub_system_code": root.get("sub_system_code"),
+                "module_code": root.get("module_code"),
+                "foreign_models": _foreign_models(root),
+                "xml_digest": xml_digest(xml_dict),
+            }
+        )
+    return result
@@ -1,5 +1,7 @@
 from temporalio import activity
 from scripts.unit_test.unit_test_generator import UnitTestGenerator
+from .artifact_cache_ops import cache_artifact, context_digest
+from .template_loader import load_xml_dict, xml_digest
 
 
 @activity.defn
@@ -18,9 +20,11 @@ async def collect_table_contexts(table_names):
 
 
 @activity.defn
-async def generate_unit_tests(xml_context, db_context):
+def generate_unit_tests(template, db_context):
     """
     Generate unit tests based on XML context and database context.
+    `template` is a blob reference (or an already parsed XML dict).
     """
-    generator = UnitTestGenerator(xml_context, db_context)
-    return generator.generate()
+    xml_dict = load_xml_dict(template)
+    generator = UnitTestGenerator(xml_dict, db_context)
+    return cache_artifact("ut", "unit_tests", context_digest(xml_digest(xml_dict), db_context), generator.generate())
@@ -0,0 +1,41 @@
+from sqlalchemy import select
+from temporalio import activity
+from temporalio.exceptions import ApplicationError
+
+from api.services.blob_store import get_blob_store
+from api.services.xml_file_selection import xml_file_conditions
+from db.models import XmlFile
+from db.session import async_session
+from ..executors import run_io
+
+# Số bản ghi lấy về mỗi lượt khi stream kết quả, giới hạn bộ nhớ của activity khi chọn nhiều file
+XML_FILE_FETCH_SIZE = 100
+
+
+@activity.defn
+async def load_xml_file_templates(selection: dict) -> list[dict]:
+    """
+    Nạp các template XML đã lưu trong bảng `xml_files` cho workflow sinh mã.
+
+    - `selection` đã chuẩn hóa bởi `normalize_xml_file_selection` (`xml_file_ids` hoặc `filters`), nên args workflow
+      chỉ vài trăm byte bất kể số file.
+    - Nội dung được đọc bằng **một** truy vấn (`id IN (...)` hoặc theo bộ lọc), stream theo từng lô
+      `XML_FILE_FETCH_SIZE` bản ghi và ghi vào blob store; activity chỉ trả về tham chiếu `{filename, sha256, size}`
+      giống template upload, nên các bước sau của workflow không đổi.
+    - Thứ tự kết quả: theo `xml_file_ids` nếu chọn theo ID, ngược lại theo `id` tăng dần.
+    - ID không tồn tại (bị xóa sau khi API kiểm tra) là lỗi không retry.
+    """
+    blob_store = get_blob_store()
+    refs = {}
+    async with async_session() as session:
+        result = await session.stream(select(XmlFile.id, XmlFile.filename, XmlFile.content).where(*xml_file_conditions(selection)).order_by(XmlFile.id).execution_options(yield_per=XML_FILE_FETCH_SIZE))
+        async for row in result:
+            refs[row.id] = await run_io(blob_store.put_bytes, (row.content or "").encode("utf-8"), row.filename)
+
+    if "xml_file_ids" not in selection:
+        return list(refs.values())
+
+    missing = [xml_file_id for xml_file_id in selection["xml_file_ids"] if xml_file_id not in refs]
+    if missing:
+        raise ApplicationError(f"XmlFile not found: {missing}", non_retryable=True)
+    return [refs[xml_file_id] for xml_file_id in selection["xml_file_ids"]]
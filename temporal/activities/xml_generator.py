@@ -1,13 +1,34 @@
 # activities/xml_generator.py
-import xml.etree.ElementTree as ET
 from temporalio import activity
-from scripts.xml.xml_generator import XmlGenerator
-import pandas as pd
-import io
+
+from config.configuration import EXCEL_READER_ENGINE
+from scripts.xml.xml_generator import XmlGenerator, open_workbook
+from .template_loader import read_template_bytes
+
+
+@activity.defn
+def generate_xml(template: dict, kw) -> dict:
+    with open_workbook(read_template_bytes(template), EXCEL_READER_ENGINE) as excel:
+        generator = XmlGenerator(excel)
+        return generator.generate_xml(kw)
+
+
+@activity.defn
+def list_xml_sheets(template: dict) -> list[str]:
+    """
+    Danh sách sheet sẽ được chuyển thành model của một workbook, theo thứ tự trong workbook.
+    Chỉ đọc metadata workbook (read-only), không parse dữ liệu các sheet.
+    """
+    with open_workbook(read_template_bytes(template), EXCEL_READER_ENGINE) as excel:
+        return XmlGenerator(excel).sheet_names()
 
 
 @activity.defn
-async def generate_xml(file_bytes: bytes, kw) -> dict:
-    excel = pd.ExcelFile(io.BytesIO(file_bytes), engine="openpyxl")
-    generator = XmlGenerator(excel)
-    return generator.generate_xml(kw)
+def generate_sheet_xml(template: dict, sheet_names: list[str], kw) -> list[list[str]]:
+    """
+    Sinh XML cho các sheet `sheet_names` của một workbook, trả về `[model_name, xml_string]` theo đúng thứ tự `sheet_names`.
+    Mỗi activity chỉ parse các sheet của mình, nên các sheet của cùng workbook được xử lý song song trên pool `excel-parse`.
+    """
+    with open_workbook(read_template_bytes(template), EXCEL_READER_ENGINE) as excel:
+        generator = XmlGenerator(excel)
+        return [list(generator.sheet_to_xml(sheet_name, kw)) for sheet_name in sheet_names]
@@ -0,0 +1,81 @@
+import dataclasses
+import zlib
+from typing import Sequence
+
+import temporalio.converter
+from temporalio.api.common.v1 import Payload
+from temporalio.client import Client
+from temporalio.converter import PayloadCodec
+
+from config.configuration import PAYLOAD_CODEC, PAYLOAD_COMPRESSION_THRESHOLD, TEMPORAL_ADDRESS
+
+try:
+    import zstandard
+except ImportError:  # zstd là tùy chọn, mặc định dùng zlib
+    zstandard = None
+
+ZLIB_ENCODING = b"binary/zlib"
+ZSTD_ENCODING = b"binary/zstd"
+
+
+class CompressionCodec(PayloadCodec):
+    """
+    Payload codec nén args/result của workflow và activity (XML, xml_dict, mã nguồn sinh ra... đều là text dễ nén).
+
+    - Chỉ nén payload có kích thước serialize >= `threshold` và khi kết quả nén thực sự nhỏ hơn.
+    - Payload nén được bọc trong một payload mới với metadata `encoding` = `binary/zlib` hoặc `binary/zstd`;
+      khi decode, payload không mang các encoding này được giữ nguyên, nên history cũ (chưa nén) vẫn đọc được
+      và client chưa bật codec vẫn đọc được payload nhỏ.
+    """
+
+    def __init__(self, algorithm: str = PAYLOAD_CODEC, threshold: int = PAYLOAD_COMPRESSION_THRESHOLD):
+        if algorithm == "auto":
+            algorithm = "zstd" if zstandard is not None else "zlib"
+        if algorithm == "zstd" and zstandard is None:
+            raise ValueError("PAYLOAD_CODEC=zstd requires the `zstandard` package")
+        if algorithm not in ("zlib", "zstd", "none"):
+            raise ValueError(f"Unsupported payload codec: {algorithm}")
+        self.algorithm = algorithm
+        self.threshold = threshold
+
+    async def encode(self, payloads: Sequence[Payload]) -> list[Payload]:
+        return [self._encode_one(payload) for payload in payloads]
+
+    async def decode(self, payloads: Sequence[Payload]) -> list[Payload]:
+        return [self._decode_one(payload) for payload in payloads]
+
+    def _encode_one(self, payload: Payload) -> Payload:
+        if self.algorithm == "none":
+            return payload
+        data = payload.SerializeToString()
+        if len(data) < self.threshold:
+            return payload
+        if self.algorithm == "zstd":
+            encoding, compressed = ZSTD_ENCODING, zstandard.ZstdCompressor().compress(data)
+        else:
+            encoding, compressed = ZLIB_ENCODING, zlib.compress(data)
+        if len(compressed) >= len(data):
+            return payload
+        return Payload(metadata={"encoding": encoding}, data=compressed)
+
+    def _decode_one(self, payload: Payload) -> Payload:
+        encoding = payload.metadata.get("encoding")
+        if encoding == ZLIB_ENCODING:
+            return Payload.FromString(zlib.decompress(payload.data))
+        if encoding == ZSTD_ENCODING:
+            if zstandard is None:
+                raise ValueError("Payload is zstd-compressed but the `zstandard` package is not installed")
+            return Payload.FromString(zstandard.ZstdDecompressor().decompress(payload.data))
+        return payload
+
+
+def create_data_converter() -> temporalio.converter.DataConverter:
+    return dataclasses.replace(temporalio.converter.default(), payload_codec=CompressionCodec())
+
+
+async def connect_client(address: str = TEMPORAL_ADDRESS) -> Client:
+    """
+    Kết nối Temporal với data converter có nén payload. API và mọi worker phải dùng chung hàm này
+    để cùng encode/decode được payload của nhau.
+    """
+    return await Client.connect(address, data_converter=create_data_converter())
@@ -1,2 +1,8 @@
 DEFAULT_TASK_QUEUE = "default"
 GIT_TASK_QUEUE = "git-ops"
+
+# Task queue riêng theo loại tải, mỗi queue có worker và giới hạn đồng thời riêng (xem `temporal/workers/pools.py`)
+CODEGEN_TASK_QUEUE = "codegen-cpu"
+EXCEL_TASK_QUEUE = "excel-parse"
+DEPLOY_TASK_QUEUE = "deploy-io"
+DB_CONTEXT_TASK_QUEUE = "db-context"
@@ -0,0 +1,55 @@
+import asyncio
+import functools
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+
+from temporalio.worker import SharedStateManager
+
+from config.configuration import CODEGEN_PROCESS_POOL_SIZE, IO_THREAD_POOL_SIZE
+
+# Dùng "spawn" thay vì "fork": worker Temporal đã có sẵn nhiều thread (core Rust, event loop)
+# nên fork tiến trình con từ đó có thể deadlock.
+_MP_CONTEXT = multiprocessing.get_context("spawn")
+
+
+def _lower_process_priority(niceness: int):
+    try:
+        os.nice(niceness)
+    except (AttributeError, OSError):
+        pass
+
+
+def create_codegen_executor(max_workers: int = None, niceness: int = 0) -> ProcessPoolExecutor:
+    """
+    Tạo process pool chạy các activity sinh mã đồng bộ (`def`, không phải `async def`).
+
+    Các generator trong `scripts/` là code Python thuần tốn CPU; chạy trên process pool giúp
+    một file XML/Excel lớn không chặn event loop của worker và tận dụng được nhiều core.
+    `niceness` > 0 hạ độ ưu tiên CPU của các process (dùng cho làn bulk).
+    """
+    if niceness > 0:
+        return ProcessPoolExecutor(max_workers=max_workers or CODEGEN_PROCESS_POOL_SIZE, mp_context=_MP_CONTEXT, initializer=_lower_process_priority, initargs=(niceness,))
+    return ProcessPoolExecutor(max_workers=max_workers or CODEGEN_PROCESS_POOL_SIZE, mp_context=_MP_CONTEXT)
+
+
+def create_shared_state_manager() -> SharedStateManager:
+    """
+    Temporal cần `SharedStateManager` để heartbeat/cancel được activity chạy trong process pool.
+    """
+    return SharedStateManager.create_from_multiprocessing(_MP_CONTEXT.Manager())
+
+
+@lru_cache(maxsize=1)
+def get_io_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=IO_THREAD_POOL_SIZE, thread_name_prefix="activity-io")
+
+
+async def run_io(fn, *args, **kwargs):
+    """
+    Chạy một hàm blocking I/O (psycopg2, ghi file, subprocess) trên thread pool dùng chung
+    để activity `async def` không chặn event loop của worker.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_io_executor(), functools.partial(fn, *args, **kwargs))
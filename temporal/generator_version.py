@@ -0,0 +1,32 @@
+import hashlib
+from functools import lru_cache
+from pathlib import Path
+
+from config.configuration import GENERATOR_VERSION
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+# Mã nguồn quyết định nội dung file sinh ra: các generator và activity/workflow gọi chúng
+_SOURCE_DIRS = ["scripts", "temporal/activities", "temporal/workflows"]
+
+
+@lru_cache(maxsize=None)
+def get_generator_version(*source_paths: str) -> str:
+    """
+    Trả về phiên bản generator dùng làm một phần khóa cache/dedupe kết quả sinh mã.
+
+    - Nếu env `GENERATOR_VERSION` được đặt (ví dụ git SHA lúc build image) thì dùng nguyên giá trị đó.
+    - Ngược lại tính sha256 trên nội dung các file `.py` trong `source_paths` (thư mục hoặc file, mặc định `_SOURCE_DIRS`),
+      nên mọi thay đổi generator đều tự động làm các kết quả cũ không còn được dùng lại.
+    """
+    if GENERATOR_VERSION:
+        return GENERATOR_VERSION
+
+    digest = hashlib.sha256()
+    for source_path in source_paths or _SOURCE_DIRS:
+        root = _PROJECT_ROOT / source_path
+        for path in [root] if root.is_file() else sorted(root.rglob("*.py")):
+            digest.update(path.relative_to(_PROJECT_ROOT).as_posix().encode("utf-8"))
+            digest.update(b"\0")
+            digest.update(path.read_bytes())
+            digest.update(b"\0")
+    return digest.hexdigest()[:16]
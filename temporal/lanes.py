@@ -0,0 +1,43 @@
+from temporalio import workflow
+
+from config.configuration import GENERATION_BULK_THRESHOLD
+
+# Làn ưu tiên của workflow sinh mã. Làn `interactive` dùng đúng các task queue hiện có (`default`, `codegen-cpu`...),
+# làn `bulk` dùng bản sao có hậu tố `-bulk` (`default-bulk`, `codegen-cpu-bulk`...) với worker và số slot riêng,
+# để một job tái sinh hàng trăm model không chiếm slot của các yêu cầu nhỏ từ UI.
+INTERACTIVE_PRIORITY = "interactive"
+BULK_PRIORITY = "bulk"
+PRIORITIES = (INTERACTIVE_PRIORITY, BULK_PRIORITY)
+BULK_QUEUE_SUFFIX = "-bulk"
+
+
+def lane_task_queue(task_queue: str, priority: str) -> str:
+    """
+    Tên task queue của `task_queue` trong làn `priority`.
+    """
+    return f"{task_queue}{BULK_QUEUE_SUFFIX}" if priority == BULK_PRIORITY else task_queue
+
+
+def priority_of_task_queue(task_queue: str) -> str:
+    return BULK_PRIORITY if task_queue.endswith(BULK_QUEUE_SUFFIX) else INTERACTIVE_PRIORITY
+
+
+def resolve_priority(priority: str, template_count: int) -> str:
+    """
+    Chuẩn hóa `priority` do client gửi. Không chỉ định thì job từ `GENERATION_BULK_THRESHOLD` template trở lên
+    chạy ở làn `bulk`, còn lại ở làn `interactive`. Raise `ValueError` nếu giá trị không hợp lệ.
+    """
+    if not priority:
+        return BULK_PRIORITY if GENERATION_BULK_THRESHOLD and template_count >= GENERATION_BULK_THRESHOLD else INTERACTIVE_PRIORITY
+    priority = priority.strip().lower()
+    if priority not in PRIORITIES:
+        raise ValueError(f"Invalid priority: {priority} (expected one of {', '.join(PRIORITIES)})")
+    return priority
+
+
+def lane_queue(task_queue: str) -> str:
+    """
+    Dùng trong workflow: task queue của `task_queue` trong cùng làn với workflow hiện tại
+    (suy ra từ task queue mà workflow được khởi động, nên không cần truyền thêm tham số và tất định khi replay).
+    """
+    return lane_task_queue(task_queue, priority_of_task_queue(workflow.info().task_queue))
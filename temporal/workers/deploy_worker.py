@@ -0,0 +1,20 @@
+import asyncio
+
+from temporal.codec import connect_client
+from temporal.workers.pools import create_deploy_worker, create_lane_workers, shutdown_executors
+
+
+async def main():
+    client = await connect_client()
+
+    # Một worker cho mỗi làn trong `WORKER_LANES`, mỗi làn có slot riêng
+    workers = create_lane_workers(create_deploy_worker, client)
+    print("Deploy worker started...")
+    try:
+        await asyncio.gather(*(worker.run() for worker in workers))
+    finally:
+        shutdown_executors(*workers)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,9 +1,8 @@
 import asyncio
 
-from temporalio.client import Client
 from temporalio.worker import Worker
 
-from config.configuration import TEMPORAL_ADDRESS
+from temporal.codec import connect_client
 from temporal.activities.git_job_ops import set_git_job_completed, set_git_job_failed, set_git_job_running
 from temporal.activities.git_ops import sync_db_to_git, sync_git_to_db
 from temporal.constants import GIT_TASK_QUEUE
@@ -11,7 +10,7 @@ from temporal.workflows.git_sync_workflow import GitSyncWorkflow
 
 
 async def main():
-    client = await Client.connect(TEMPORAL_ADDRESS)
+    client = await connect_client()
 
     worker = Worker(
         client,
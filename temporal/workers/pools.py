@@ -0,0 +1,114 @@
+from temporalio.client import Client
+from temporalio.worker import SharedStateManager, Worker
+
+from config.configuration import (
+    BULK_CODEGEN_PROCESS_POOL_SIZE,
+    BULK_DB_CONTEXT_MAX_CONCURRENT_ACTIVITIES,
+    BULK_DEPLOY_MAX_CONCURRENT_ACTIVITIES,
+    BULK_EXCEL_PROCESS_POOL_SIZE,
+    BULK_PROCESS_NICENESS,
+    CODEGEN_PROCESS_POOL_SIZE,
+    DB_CONTEXT_MAX_CONCURRENT_ACTIVITIES,
+    DEPLOY_MAX_CONCURRENT_ACTIVITIES,
+    EXCEL_PROCESS_POOL_SIZE,
+    WORKER_LANES,
+)
+from ..activities import codegen_activities, db_context_activities, deploy_activities, excel_activities
+from ..constants import CODEGEN_TASK_QUEUE, DB_CONTEXT_TASK_QUEUE, DEPLOY_TASK_QUEUE, EXCEL_TASK_QUEUE
+from ..executors import create_codegen_executor, create_shared_state_manager
+from ..lanes import BULK_PRIORITY, INTERACTIVE_PRIORITY, PRIORITIES, lane_task_queue
+
+
+def _lane_value(priority: str, interactive, bulk):
+    return bulk if priority == BULK_PRIORITY else interactive
+
+
+def create_codegen_worker(client: Client, shared_state_manager: SharedStateManager = None, priority: str = INTERACTIVE_PRIORITY) -> Worker:
+    """
+    Worker cho queue `codegen-cpu` (hoặc `codegen-cpu-bulk` với làn bulk): các generator đồng bộ chạy trên process pool,
+    số activity đồng thời bằng đúng số process để task không phải chờ executor trong lúc đã tính timeout.
+    Làn bulk có pool riêng (`BULK_CODEGEN_PROCESS_POOL_SIZE`) với process được hạ độ ưu tiên CPU.
+    """
+    pool_size = _lane_value(priority, CODEGEN_PROCESS_POOL_SIZE, BULK_CODEGEN_PROCESS_POOL_SIZE)
+    return Worker(
+        client,
+        task_queue=lane_task_queue(CODEGEN_TASK_QUEUE, priority),
+        activities=codegen_activities,
+        activity_executor=create_codegen_executor(pool_size, niceness=_lane_value(priority, 0, BULK_PROCESS_NICENESS)),
+        shared_state_manager=shared_state_manager or create_shared_state_manager(),
+        max_concurrent_activities=pool_size,
+    )
+
+
+def create_excel_worker(client: Client, shared_state_manager: SharedStateManager = None, priority: str = INTERACTIVE_PRIORITY) -> Worker:
+    """
+    Worker cho queue `excel-parse`: đọc Excel bằng pandas trên process pool riêng,
+    để một file lớn không chiếm hết slot của phần sinh mã.
+    """
+    pool_size = _lane_value(priority, EXCEL_PROCESS_POOL_SIZE, BULK_EXCEL_PROCESS_POOL_SIZE)
+    return Worker(
+        client,
+        task_queue=lane_task_queue(EXCEL_TASK_QUEUE, priority),
+        activities=excel_activities,
+        activity_executor=create_codegen_executor(pool_size, niceness=_lane_value(priority, 0, BULK_PROCESS_NICENESS)),
+        shared_state_manager=shared_state_manager or create_shared_state_manager(),
+        max_concurrent_activities=pool_size,
+    )
+
+
+def create_deploy_worker(client: Client, priority: str = INTERACTIVE_PRIORITY) -> Worker:
+    """
+    Worker cho queue `deploy-io`: ghi code vào addon workspace và chạy Black.
+    """
+    return Worker(
+        client,
+        task_queue=lane_task_queue(DEPLOY_TASK_QUEUE, priority),
+        activities=deploy_activities,
+        max_concurrent_activities=_lane_value(priority, DEPLOY_MAX_CONCURRENT_ACTIVITIES, BULK_DEPLOY_MAX_CONCURRENT_ACTIVITIES),
+    )
+
+
+def create_db_context_worker(client: Client, priority: str = INTERACTIVE_PRIORITY) -> Worker:
+    """
+    Worker cho queue `db-context`: truy vấn database lấy constraint (sinh view) và context cho unit test.
+    """
+    return Worker(
+        client,
+        task_queue=lane_task_queue(DB_CONTEXT_TASK_QUEUE, priority),
+        activities=db_context_activities,
+        max_concurrent_activities=_lane_value(priority, DB_CONTEXT_MAX_CONCURRENT_ACTIVITIES, BULK_DB_CONTEXT_MAX_CONCURRENT_ACTIVITIES),
+    )
+
+
+WORKER_FACTORIES = {
+    CODEGEN_TASK_QUEUE: create_codegen_worker,
+    EXCEL_TASK_QUEUE: create_excel_worker,
+    DEPLOY_TASK_QUEUE: create_deploy_worker,
+    DB_CONTEXT_TASK_QUEUE: create_db_context_worker,
+}
+
+
+def create_lane_workers(factory, client: Client, shared_state_manager: SharedStateManager = None) -> list[Worker]:
+    """
+    Tạo một worker của `factory` cho mỗi làn trong `WORKER_LANES`; các worker có process pool dùng chung `shared_state_manager`.
+    """
+    workers = []
+    for priority in WORKER_LANES:
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown lane in WORKER_LANES: {priority}")
+        if factory in (create_codegen_worker, create_excel_worker):
+            shared_state_manager = shared_state_manager or create_shared_state_manager()
+            workers.append(factory(client, shared_state_manager, priority=priority))
+        else:
+            workers.append(factory(client, priority=priority))
+    return workers
+
+
+def shutdown_executors(*workers: Worker):
+    """
+    Dừng process pool của các worker sau khi worker kết thúc.
+    """
+    for worker in workers:
+        executor = worker.config().get("activity_executor")
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
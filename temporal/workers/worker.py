@@ -1,34 +1,42 @@
 import asyncio
-from temporalio.client import Client
 from temporalio.worker import Worker
-from config.configuration import TEMPORAL_ADDRESS
+from config.configuration import WORKER_EMBEDDED_QUEUES, WORKER_LANES
 from ..workflows.fe_workflow import FeCodeGenerationWorkflow
 from ..workflows.be_workflow import BeCodeGenerationWorkflow
 from ..workflows.be_deploy_workflow import BeWorkspaceDeployWorkflow
 from ..workflows.xml_workflow import XMLGenerationWorkflow
 from ..workflows.unit_test_workflow import UnitTestGenerationWorkflow
-from ..activities import all_activities
+from ..activities import default_activities
 from ..activities.git_job_ops import request_git_sync, set_git_job_completed, set_git_job_failed, set_git_job_running
 from ..activities.git_ops import sync_db_to_git, sync_git_to_db
+from ..codec import connect_client
 from ..constants import DEFAULT_TASK_QUEUE, GIT_TASK_QUEUE
+from ..executors import create_shared_state_manager
 from ..workflows.git_sync_workflow import GitSyncWorkflow
+from ..lanes import lane_task_queue
+from .pools import WORKER_FACTORIES, create_codegen_worker, create_excel_worker, create_lane_workers, shutdown_executors
 
 
 async def main():
-    client = await Client.connect(TEMPORAL_ADDRESS)
+    client = await connect_client()
 
-    default_worker = Worker(
-        client,
-        task_queue=DEFAULT_TASK_QUEUE,
-        workflows=[
-            FeCodeGenerationWorkflow,
-            BeCodeGenerationWorkflow,
-            BeWorkspaceDeployWorkflow,
-            XMLGenerationWorkflow,
-            UnitTestGenerationWorkflow,
-        ],
-        activities=[*all_activities, request_git_sync],
-    )
+    # Queue mặc định chỉ chạy workflow và các activity nhẹ; activity nặng được route sang queue riêng.
+    # Mỗi làn ưu tiên (`default`, `default-bulk`) có worker riêng để workflow task của job bulk không chờ chung slot.
+    default_workers = [
+        Worker(
+            client,
+            task_queue=lane_task_queue(DEFAULT_TASK_QUEUE, priority),
+            workflows=[
+                FeCodeGenerationWorkflow,
+                BeCodeGenerationWorkflow,
+                BeWorkspaceDeployWorkflow,
+                XMLGenerationWorkflow,
+                UnitTestGenerationWorkflow,
+            ],
+            activities=[*default_activities, request_git_sync],
+        )
+        for priority in WORKER_LANES
+    ]
 
     # Poll git-ops in the main worker process so git sync does not depend on
     # a separate container being up.
@@ -39,8 +47,25 @@ async def main():
         activities=[sync_db_to_git, sync_git_to_db, set_git_job_running, set_git_job_completed, set_git_job_failed],
     )
 
+    # Các queue theo loại tải trong `WORKER_EMBEDDED_QUEUES` cũng được poll ngay trong process này,
+    # để chạy được với một container worker duy nhất. Khi scale, tắt bớt và chạy worker riêng
+    # (`temporal.workers.codegen_worker`, `excel_worker`, `deploy_worker`, `db_context_worker`).
+    # Mỗi queue được poll cho mọi làn trong `WORKER_LANES`.
+    shared_state_manager = None
+    embedded_workers = []
+    for task_queue in WORKER_EMBEDDED_QUEUES:
+        factory = WORKER_FACTORIES.get(task_queue)
+        if factory is None:
+            raise ValueError(f"Unknown task queue in WORKER_EMBEDDED_QUEUES: {task_queue}")
+        if factory in (create_codegen_worker, create_excel_worker):
+            shared_state_manager = shared_state_manager or create_shared_state_manager()
+        embedded_workers.extend(create_lane_workers(factory, client, shared_state_manager))
+
     print("Workers started...")
-    await asyncio.gather(default_worker.run(), git_worker.run())
+    try:
+        await asyncio.gather(*(worker.run() for worker in default_workers), git_worker.run(), *(worker.run() for worker in embedded_workers))
+    finally:
+        shutdown_executors(*embedded_workers)
 
 
 if __name__ == "__main__":
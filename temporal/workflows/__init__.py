@@ -0,0 +1,12 @@
+"""
+Workflow sinh mã và đồng bộ git.
+
+Temporal replay lịch sử của run đang chạy bằng code workflow hiện tại, nên đổi thứ tự hoặc loại lệnh (activity, child
+workflow, timer) của một workflow làm các run bắt đầu trước khi deploy lỗi non-determinism:
+
+- `XMLGenerationWorkflow` rẽ nhánh bằng `workflow.patched` (xem `SHEET_ACTIVITIES_PATCH`), run cũ vẫn chạy tiếp theo luồng cũ.
+- `BeCodeGenerationWorkflow`, `FeCodeGenerationWorkflow`, `UnitTestGenerationWorkflow` (cache artifact theo model, chia
+  shard bằng child workflow) không giữ luồng cũ: trước khi deploy phải dừng nhận job mới và chờ các run đang chạy
+  của ba workflow này kết thúc (hoặc terminate chúng), rồi mới khởi động worker bản mới.
+- Activity cũ (`generate_xml`...) vẫn được đăng ký trên worker để run ở luồng cũ gọi được.
+"""
@@ -2,7 +2,9 @@ from datetime import timedelta
 
 from temporalio import workflow
 
-from ..activities.be_deployer import deploy_backend_artifacts
+from ..activities.be_deployer import deploy_backend_artifacts, deploy_backend_parts
+from ..constants import DEPLOY_TASK_QUEUE
+from ..lanes import lane_queue
 
 
 @workflow.defn(sandboxed=False)
@@ -21,13 +23,22 @@ class BeWorkspaceDeployWorkflow:
         """
         Chạy activity deploy duy nhất cho toàn bộ batch artifact backend.
 
-        - `artifacts`: danh sách artifact đã sinh từ workflow backend chính.
+        - `artifacts`: danh sách artifact đã sinh từ workflow backend chính, hoặc `{"parts": [...]}` là tham chiếu
+          kết quả các shard khi batch được chia thành child workflow (artifact được đọc từ blob store trong activity).
         - `kw`: cấu hình phụ truyền xuyên suốt từ request gốc.
 
         Trả về trực tiếp kết quả của activity `deploy_backend_artifacts`.
         """
+        if isinstance(artifacts, dict):
+            return await workflow.execute_activity(
+                deploy_backend_parts,
+                args=[artifacts["parts"], kw or {}],
+                task_queue=lane_queue(DEPLOY_TASK_QUEUE),
+                start_to_close_timeout=timedelta(minutes=5),
+            )
         return await workflow.execute_activity(
             deploy_backend_artifacts,
             args=[artifacts, kw or {}],
+            task_queue=lane_queue(DEPLOY_TASK_QUEUE),
             start_to_close_timeout=timedelta(minutes=5),
         )
@@ -1,12 +1,40 @@
-import io
-import zipfile
-import base64
-import xmltodict
+import asyncio
 from temporalio import workflow
 from datetime import timedelta
-from ..activities.be_generator import generate_controller, generate_model, generate_route, generate_view
-from ..constants import DEFAULT_TASK_QUEUE
+from config.configuration import GENERATION_CHUNK_SIZE, MAX_PARALLEL_MODELS
+from ..activities.artifact_cache_ops import lookup_artifact_cache
+from ..activities.be_generator import BE_ARTIFACT_KINDS, BE_CACHEABLE_KINDS, generate_be_artifacts, generate_controller, generate_model, generate_route, generate_view
+from ..activities.template_loader import describe_templates
+from ..activities.artifact_writer import write_archive
+from ..constants import CODEGEN_TASK_QUEUE, DB_CONTEXT_TASK_QUEUE, DEFAULT_TASK_QUEUE
+from ..lanes import lane_queue
 from ..workflows.be_deploy_workflow import BeWorkspaceDeployWorkflow
+from .fan_out import fan_out_models, option_int
+from .progress import GenerationProgress
+from .sharding import finish_shard, generate_in_shards, is_shard, is_sharding, merge_shards, shard_kw, should_shard
+from .template_source import resolve_templates
+
+BE_ACTIVITIES = {
+    "model": generate_model,
+    "controller": generate_controller,
+    "route": generate_route,
+    "view": generate_view,
+}
+
+ANNOTATION_HEADER = """from __future__ import annotations
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+"""
+
+# Các file gộp ghi cuối ZIP khi batch được chia shard: nội dung nối phần đóng góp của từng shard theo thứ tự
+BE_TRAILING_FILES = [
+    {"path": "controller/__init__.py", "fragments": ["controller/__init__.py"]},
+    {"path": "route/__init__.py", "fragments": ["route/__init__.py"]},
+    {"path": "model/__init__.py", "fragments": ["model/__init__.py"]},
+    {"path": "model/view/__init__.py", "fragments": ["model/view/__init__.py"]},
+    {"path": "model/annotations.py", "fragments": [{"text": ANNOTATION_HEADER}, "model/annotations.py"]},
+]
 
 
 @workflow.defn(sandboxed=False)
@@ -23,16 +51,28 @@ class BeCodeGenerationWorkflow:
 
     Cách hoạt động:
     ---------------
-    1. Nhận danh sách các file XML (`template_contents`) — mỗi file mô tả 1 model.
-    2. Parse nội dung XML thành `dict`.
-    3. Gọi các activity:
+    1. Nhận danh sách tham chiếu blob của các file XML (`template_contents`) — mỗi file mô tả 1 model.
+    2. Gọi activity `describe_templates` để lấy metadata (tên model, `system_code`, digest XML) của từng file,
+       rồi `lookup_artifact_cache` để lấy các artifact đã sinh trước đó với cùng XML và phiên bản generator.
+    3. Chỉ gọi activity cho các artifact còn thiếu trong cache (mỗi activity tự đọc blob, parse XML và ghi kết quả vào cache):
        - `generate_model`
        - `generate_controller`
        - `generate_route`
-       - `generate_view`
-    4. Ghi nội dung sinh ra vào file zip theo cấu trúc thư mục.
+       - `generate_view` (luôn sinh lại vì phụ thuộc constraint trong database)
+       4 activity của một model chạy đồng thời, và tối đa `max_parallel_models` model được xử lý cùng lúc.
+       Nếu `chunk_size` > 0, mỗi nhóm `chunk_size` model được sinh bằng một activity batch `generate_be_artifacts`
+       thay cho 4 activity riêng mỗi model (giảm độ dài history và overhead lập lịch khi chạy số lượng lớn).
+       Kết quả được gộp lại theo đúng thứ tự `template_contents` nên ZIP và các `__init__.py` luôn tất định.
+    4. Gọi activity `write_archive` ghi nội dung sinh ra vào file zip (theo cấu trúc thư mục) trong artifact store.
     5. Lên lịch một workflow deploy riêng nếu có artifact backend được sinh ra.
-    6. Mã hóa zip sang base64 và trả về.
+    6. Trả về tham chiếu artifact.
+
+    Batch lớn hơn `shard_threshold` được chia thành các child workflow (chính workflow này ở chế độ shard,
+    mỗi shard `shard_size` model) và workflow cha continue-as-new định kỳ để history không phình theo kích thước
+    batch; kết quả các shard được gộp thành cùng một ZIP như khi chạy không chia (xem `sharding.py`).
+
+    Trong khi chạy, query `progress` trả về tiến độ chi tiết (số model đã xử lý/tổng, model đang sinh,
+    thời gian theo từng loại artifact), xem `GenerationProgress`.
 
     Thuộc tính lớp:
     ---------------
@@ -45,20 +85,22 @@ class BeCodeGenerationWorkflow:
     -------
     ### `async def run(self, template_contents, kw={})`
     - **Tham số**:
-      - `template_contents`: List[Dict], chứa `filename` và `content` (dạng bytes hoặc chuỗi encode).
-      - `kw`: Dict tùy chọn, có thể chứa cờ điều khiển deploy hoặc giá trị
-        mặc định như `system_code`.
+      - `template_contents`: List[Dict], tham chiếu blob `{filename, sha256, size}` do API ghi vào blob store.
+        Hoặc Dict selection `{xml_file_ids}`/`{filters}` trên bảng `xml_files`, được nạp bằng activity `load_xml_file_templates`.
+      - `kw`: Dict tùy chọn, có thể chứa cờ điều khiển deploy, giá trị
+        mặc định như `system_code`, `max_parallel_models` (mặc định lấy từ `MAX_PARALLEL_MODELS`)
+        hoặc `chunk_size` (mặc định lấy từ `GENERATION_CHUNK_SIZE`).
 
     - **Trả về**:
       - Dict có:
-        - `"zip_content"`: dữ liệu zip đã mã hóa base64.
+        - `"artifact"`: tham chiếu `{artifact_id, size, sha256}` tới file zip trong artifact store.
         - `"deploy_result"`: trạng thái schedule workflow deploy riêng.
         - `"generated_models"`: danh sách model đã được sinh.
 
     - **Quy trình chi tiết**:
     ```text
-    [XML model files] → [parse XML] → [generate code with activity] → [viết zip file]
-    → [schedule deploy workflow nếu cần] → [base64] → [return]
+    [blob refs] → [describe_templates] → [generate code with activity] → [write_archive]
+    → [schedule deploy workflow nếu cần] → [return artifact ref]
     """
 
     def __init__(self):
@@ -66,16 +108,17 @@ class BeCodeGenerationWorkflow:
         self.init_view_string = ""
         self.init_controller_string = ""
         self.init_model_string = ""
-        self.annotation_string = """from __future__ import annotations
-from typing import TYPE_CHECKING
+        self.annotation_string = ANNOTATION_HEADER
+        self.generation_progress = GenerationProgress()
 
-if TYPE_CHECKING:
-"""
+    @workflow.query
+    def progress(self) -> dict:
+        return self.generation_progress.snapshot()
 
     @workflow.run
     async def run(self, template_contents, kw={}):
         """
-        Sinh toàn bộ backend artifacts và đóng gói thành ZIP.
+        Sinh toàn bộ backend artifacts và đóng gói thành ZIP trong artifact store.
 
         Điểm quan trọng của phiên bản hiện tại:
         - workflow này không trực tiếp ghi vào workspace/repo đích,
@@ -84,99 +127,218 @@ if TYPE_CHECKING:
         - vì vậy nếu deploy thất bại, kết quả ZIP vẫn được giữ nguyên để
           tải xuống và import thủ công.
         """
-        # Tạo buffer zip
-        zip_buffer = io.BytesIO()
-        generated_artifacts = []
+        # Danh sách file sẽ ghi vào ZIP, theo đúng thứ tự
+        entries = []
+        max_parallel_models = option_int(kw, "max_parallel_models", MAX_PARALLEL_MODELS)
+        chunk_size = option_int(kw, "chunk_size", GENERATION_CHUNK_SIZE, minimum=0)
 
         try:
             # await workflow.sleep(5)
-            with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
-                # Lặp qua từng model trong template_contents
-                for model in template_contents:
-                    byte_content = bytes(model["content"])
-                    # Kiểm tra xem content có phải là byte string không
-                    if isinstance(byte_content, bytes):
-                        # Nếu là byte string, giải mã nó
-                        content = byte_content.decode("utf-8")
-                    else:
-                        # Nếu không phải byte string, không thể giải mã
-                        workflow.logger.error(f"Invalid content type for {model['filename']}")
-                        raise ValueError(f"Content of {model['filename']} is not a valid byte string", type(model["content"]))
-
-                    xml_dict = xmltodict.parse(content)
-                    model_name: str = xml_dict["root"]["model"].strip()
-
-                    # Logging thông tin để theo dõi
-                    workflow.logger.info(f"Processing model: {model_name}")
-
-                    # Gọi các hoạt động trong workflow với timeout
-                    try:
-                        model_string = await workflow.execute_activity(generate_model, xml_dict, start_to_close_timeout=timedelta(seconds=30))
-                        controller_string = await workflow.execute_activity(generate_controller, xml_dict, start_to_close_timeout=timedelta(seconds=30))
-                        route_string = await workflow.execute_activity(generate_route, xml_dict, start_to_close_timeout=timedelta(seconds=30))
-                        view_string = await workflow.execute_activity(generate_view, xml_dict, start_to_close_timeout=timedelta(seconds=30))
-                        self.init_route_string += f"from . import {model_name}_route\n"
-                        self.init_view_string += f"from . import {model_name}_view\n"
-                        self.init_controller_string += f"from . import {model_name}_controller\n"
-                        self.init_model_string += f"from . import {model_name}_model\n"
-                        class_string = model_name.replace("_", " ").title().replace(" ", "_")
-                        self.annotation_string += f"\tfrom .{model_name}_model import {class_string}\n"
-                        generated_artifacts.append(
-                            {
-                                "model_name": model_name,
-                                "system_code": xml_dict["root"].get("system_code", kw.get("system_code", "")).strip().upper(),
-                                "class_name": class_string,
-                                "model": model_string,
-                                "controller": controller_string,
-                                "route": route_string,
-                                "view": view_string,
-                            }
-                        )
-                    except Exception as e:
-                        workflow.logger.error(f"Error during activity execution: {e}")
-                        raise
-
-                    # Tạo tên file cho các tệp cần nén
-                    zip_file.writestr(f"controller/{model_name}_controller.py", controller_string)
-                    zip_file.writestr(f"route/{model_name}_route.py", route_string)
-                    zip_file.writestr(f"model/{model_name}_model.py", model_string)
-                    zip_file.writestr(f"model/view/{model_name}_view.py", view_string)
-
-                zip_file.writestr(f"controller/__init__.py", self.init_controller_string)
-                zip_file.writestr(f"route/__init__.py", self.init_route_string)
-                zip_file.writestr(f"model/__init__.py", self.init_model_string)
-                zip_file.writestr(f"model/view/__init__.py", self.init_view_string)
-                zip_file.writestr(f"model/annotations.py", self.annotation_string)
-            # Lấy nội dung zip và trả về kết quả
-            zip_buffer.seek(0)
-            zip_content = zip_buffer.getvalue()
-            zip_b64 = base64.b64encode(zip_content).decode("utf-8")
-
-            deploy_result = {"status": "skipped", "reason": "no generated artifacts"}
-            if generated_artifacts:
-                try:
-                    deploy_workflow_id = f"{workflow.info().workflow_id}-deploy"
-                    await workflow.start_child_workflow(
-                        BeWorkspaceDeployWorkflow.run,
-                        args=[generated_artifacts, kw],
-                        id=deploy_workflow_id,
-                        task_queue=DEFAULT_TASK_QUEUE,
-                        parent_close_policy=workflow.ParentClosePolicy.ABANDON,
-                    )
-                    deploy_result = {"status": "scheduled", "workflow_id": deploy_workflow_id}
-                except Exception as e:
-                    deploy_result = {"status": "error", "message": str(e)}
-                    workflow.logger.error(f"Error during backend deploy workflow scheduling: {e}")
+            # Template có thể là tham chiếu blob (upload) hoặc selection trên bảng xml_files
+            if not is_sharding(kw):
+                template_contents = await resolve_templates(template_contents)
+            if is_sharding(kw) or should_shard(template_contents, kw):
+                return await self._run_sharded(template_contents, kw)
+
+            self.generation_progress.set_phase("describing", total=len(template_contents))
+            metadata = await self.generation_progress.timed(
+                "describe_templates",
+                workflow.execute_activity(describe_templates, template_contents, task_queue=lane_queue(CODEGEN_TASK_QUEUE), start_to_close_timeout=timedelta(seconds=30)),
+            )
+
+            # Tra cache theo digest XML, chỉ những artifact miss mới được lập lịch sinh lại
+            cached = await self.generation_progress.timed(
+                "lookup_artifact_cache",
+                workflow.execute_activity(
+                    lookup_artifact_cache,
+                    args=["be", [meta["xml_digest"] for meta in metadata], BE_CACHEABLE_KINDS],
+                    task_queue=lane_queue(CODEGEN_TASK_QUEUE),
+                    start_to_close_timeout=timedelta(seconds=30),
+                ),
+            )
+            self.generation_progress.set_phase("generating")
+
+            # Sinh đồng thời nhiều model (giới hạn bởi `max_parallel_models`), theo từng activity hoặc theo nhóm `chunk_size`.
+            # Kết quả luôn giữ đúng thứ tự template_contents
+            generated_artifacts = await fan_out_models(
+                list(zip(template_contents, metadata, cached)),
+                lambda item: self._generate_artifact(*item, kw),
+                lambda items: self._generate_artifact_chunk(items, kw),
+                max_parallel_models,
+                chunk_size,
+            )
+
+            for generated in generated_artifacts:
+                model_name = generated["model_name"]
+                class_string = generated["class_name"]
+                self.init_route_string += f"from . import {model_name}_route\n"
+                self.init_view_string += f"from . import {model_name}_view\n"
+                self.init_controller_string += f"from . import {model_name}_controller\n"
+                self.init_model_string += f"from . import {model_name}_model\n"
+                self.annotation_string += f"\tfrom .{model_name}_model import {class_string}\n"
+
+                # Tạo tên file cho các tệp cần nén
+                entries.append({"path": f"controller/{model_name}_controller.py", "content": generated["controller"]})
+                entries.append({"path": f"route/{model_name}_route.py", "content": generated["route"]})
+                entries.append({"path": f"model/{model_name}_model.py", "content": generated["model"]})
+                entries.append({"path": f"model/view/{model_name}_view.py", "content": generated["view"]})
+
+            if is_shard(kw):
+                # Shard: workflow cha gộp các file `__init__.py`/`annotations.py` và lên lịch deploy cho cả batch
+                fragments = {
+                    "controller/__init__.py": self.init_controller_string,
+                    "route/__init__.py": self.init_route_string,
+                    "model/__init__.py": self.init_model_string,
+                    "model/view/__init__.py": self.init_view_string,
+                    "model/annotations.py": self.annotation_string.removeprefix(ANNOTATION_HEADER),
+                }
+                models = [generated["model_name"] for generated in generated_artifacts]
+                return await finish_shard(entries, fragments, models, self.generation_progress, artifacts=generated_artifacts)
+
+            entries.append({"path": "controller/__init__.py", "content": self.init_controller_string})
+            entries.append({"path": "route/__init__.py", "content": self.init_route_string})
+            entries.append({"path": "model/__init__.py", "content": self.init_model_string})
+            entries.append({"path": "model/view/__init__.py", "content": self.init_view_string})
+            entries.append({"path": "model/annotations.py", "content": self.annotation_string})
+
+            # Ghi ZIP vào artifact store, workflow chỉ giữ tham chiếu
+            self.generation_progress.set_phase("archiving")
+            artifact = await self.generation_progress.timed("write_archive", workflow.execute_activity(write_archive, args=[workflow.info().workflow_id, entries], start_to_close_timeout=timedelta(seconds=60)))
+
+            deploy_result = await self._schedule_deploy(generated_artifacts, kw) if generated_artifacts else {"status": "skipped", "reason": "no generated artifacts"}
 
             # Logging thông tin thành công
             workflow.logger.info("Workflow completed successfully")
+            self.generation_progress.set_phase("completed")
 
             return {
-                "zip_content": zip_b64,
+                "artifact": artifact,
                 "deploy_result": deploy_result,
                 "generated_models": [artifact["model_name"] for artifact in generated_artifacts],
             }
 
         except Exception as e:
             workflow.logger.error(f"Error in workflow execution: {e}")
+            self.generation_progress.set_phase("failed")
             raise
+
+    async def _run_sharded(self, template_contents, kw):
+        """
+        Chạy batch lớn bằng các child workflow shard rồi gộp ZIP và lên lịch deploy một lần cho cả batch
+        (workflow deploy đọc artifact từ kết quả các shard trong blob store).
+        """
+        parts = await generate_in_shards(BeCodeGenerationWorkflow.run, template_contents, kw, self.generation_progress)
+        merged = await merge_shards(parts, BE_TRAILING_FILES, self.generation_progress)
+
+        deploy_result = await self._schedule_deploy({"parts": parts}, shard_kw(kw)) if merged["models"] else {"status": "skipped", "reason": "no generated artifacts"}
+        workflow.logger.info("Workflow completed successfully")
+        self.generation_progress.set_phase("completed")
+        return {"artifact": merged["artifact"], "deploy_result": deploy_result, "generated_models": merged["models"]}
+
+    async def _schedule_deploy(self, artifacts, kw):
+        """
+        Khởi động workflow deploy riêng với `ParentClosePolicy.ABANDON`; lỗi khi lên lịch không làm fail workflow sinh mã.
+        """
+        try:
+            deploy_workflow_id = f"{workflow.info().workflow_id}-deploy"
+            await workflow.start_child_workflow(
+                BeWorkspaceDeployWorkflow.run,
+                args=[artifacts, kw],
+                id=deploy_workflow_id,
+                task_queue=lane_queue(DEFAULT_TASK_QUEUE),
+                parent_close_policy=workflow.ParentClosePolicy.ABANDON,
+            )
+            return {"status": "scheduled", "workflow_id": deploy_workflow_id}
+        except Exception as e:
+            workflow.logger.error(f"Error during backend deploy workflow scheduling: {e}")
+            return {"status": "error", "message": str(e)}
+
+    async def _generate_artifact(self, template, meta, cached, kw):
+        """
+        Chạy đồng thời các activity sinh model/controller/route/view còn thiếu trong cache cho một model.
+        """
+        model_name: str = meta["model_name"]
+        missing = [kind for kind in BE_ARTIFACT_KINDS if kind not in cached]
+
+        # Logging thông tin để theo dõi
+        workflow.logger.info(f"Processing model: {model_name} ({len(BE_ARTIFACT_KINDS) - len(missing)} cached)")
+        self.generation_progress.start_model(model_name)
+
+        # Gọi các hoạt động trong workflow với timeout
+        try:
+            results = await asyncio.gather(
+                *(
+                    self.generation_progress.timed(
+                        kind,
+                        workflow.execute_activity(BE_ACTIVITIES[kind], template, task_queue=lane_queue(DB_CONTEXT_TASK_QUEUE if kind == "view" else CODEGEN_TASK_QUEUE), start_to_close_timeout=timedelta(seconds=30)),
+                    )
+                    for kind in missing
+                )
+            )
+        except Exception as e:
+            workflow.logger.error(f"Error during activity execution: {e}")
+            raise
+
+        self.generation_progress.finish_model(model_name, cached=not missing)
+        return self._build_artifact(meta, {**cached, **dict(zip(missing, results))}, kw)
+
+    async def _generate_artifact_chunk(self, items, kw):
+        """
+        Sinh các artifact còn thiếu trong cache của một nhóm model: model/controller/route bằng một activity batch
+        `generate_be_artifacts` duy nhất, song song với `generate_view` từng model trên queue `db-context`
+        (view truy vấn database nên không chạy trên process pool sinh mã).
+        """
+        pending = [index for index, (_, _, cached) in enumerate(items) if any(kind not in cached for kind in BE_ARTIFACT_KINDS)]
+        batch_pending = [index for index in pending if any(kind not in items[index][2] for kind in BE_CACHEABLE_KINDS)]
+        kinds = [kind for kind in BE_CACHEABLE_KINDS if any(kind not in items[index][2] for index in batch_pending)]
+        view_pending = [index for index in pending if "view" not in items[index][2]]
+        workflow.logger.info(f"Processing chunk of {len(items)} models ({len(items) - len(pending)} cached)")
+
+        for index in pending:
+            self.generation_progress.start_model(items[index][1]["model_name"])
+
+        async def generate_batch():
+            if not batch_pending:
+                return []
+            return await self.generation_progress.timed(
+                "generate_be_artifacts",
+                workflow.execute_activity(
+                    generate_be_artifacts,
+                    args=[[items[index][0] for index in batch_pending], kinds],
+                    task_queue=lane_queue(CODEGEN_TASK_QUEUE),
+                    start_to_close_timeout=timedelta(seconds=30 * len(batch_pending)),
+                ),
+            )
+
+        async def generate_view_of(index):
+            return await self.generation_progress.timed(
+                "view",
+                workflow.execute_activity(generate_view, items[index][0], task_queue=lane_queue(DB_CONTEXT_TASK_QUEUE), start_to_close_timeout=timedelta(seconds=30)),
+            )
+
+        try:
+            outputs, *views = await asyncio.gather(generate_batch(), *(generate_view_of(index) for index in view_pending))
+        except Exception as e:
+            workflow.logger.error(f"Error during activity execution: {e}")
+            raise
+
+        generated = {index: {} for index in pending}
+        for index, output in zip(batch_pending, outputs):
+            generated[index].update(output)
+        for index, view in zip(view_pending, views):
+            generated[index]["view"] = view
+        for index, (_, meta, _) in enumerate(items):
+            self.generation_progress.finish_model(meta["model_name"], cached=index not in generated)
+        return [self._build_artifact(meta, {**generated.get(index, {}), **cached}, kw) for index, (_, meta, cached) in enumerate(items)]
+
+    def _build_artifact(self, meta, outputs, kw):
+        model_name: str = meta["model_name"]
+        return {
+            "model_name": model_name,
+            "system_code": (meta["system_code"] or kw.get("system_code", "")).strip().upper(),
+            "class_name": model_name.replace("_", " ").title().replace(" ", "_"),
+            "model": outputs["model"],
+            "controller": outputs["controller"],
+            "route": outputs["route"],
+            "view": outputs["view"],
+        }
@@ -0,0 +1,59 @@
+import asyncio
+from typing import Awaitable, Iterable
+
+
+def option_int(kw: dict, key: str, default: int, minimum: int = 1) -> int:
+    """
+    Đọc một tùy chọn số nguyên từ `kw`.
+
+    Giá trị từ form-data luôn là chuỗi nên được ép kiểu; giá trị rỗng,
+    không hợp lệ hoặc nhỏ hơn `minimum` sẽ dùng `default`.
+    """
+    raw = (kw or {}).get(key)
+    if raw is None or raw == "":
+        return default
+    try:
+        value = int(raw)
+    except (TypeError, ValueError):
+        return default
+    return value if value >= minimum else default
+
+
+def chunked(items: list, size: int) -> list[list]:
+    """
+    Chia `items` thành các nhóm liên tiếp tối đa `size` phần tử, giữ nguyên thứ tự.
+    """
+    return [items[index : index + size] for index in range(0, len(items), size)]
+
+
+async def gather_bounded(awaitables: Iterable[Awaitable], limit: int) -> list:
+    """
+    Chờ các awaitable với tối đa `limit` cái chạy đồng thời.
+
+    Kết quả trả về theo đúng thứ tự đầu vào (không theo thứ tự hoàn thành),
+    nên các bước gộp phía sau như ghi ZIP hay sinh `__init__.py` luôn tất định
+    khi workflow replay.
+    """
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def run(awaitable):
+        async with semaphore:
+            return await awaitable
+
+    return await asyncio.gather(*(run(awaitable) for awaitable in awaitables))
+
+
+async def fan_out_models(items: list, generate_one, generate_chunk, max_parallel_models: int, chunk_size: int = 0) -> list:
+    """
+    Phân phối việc sinh mã cho danh sách model theo một trong hai chế độ.
+
+    - `chunk_size == 0`: gọi `generate_one(item)` cho từng model, tối đa `max_parallel_models` model cùng lúc.
+    - `chunk_size > 0`: gom từng nhóm `chunk_size` model và gọi `generate_chunk(items)` (một activity batch
+      cho cả nhóm), số nhóm chạy đồng thời được suy ra để vẫn xấp xỉ `max_parallel_models` model.
+
+    Cả hai chế độ đều trả về một kết quả cho mỗi model, theo đúng thứ tự `items`.
+    """
+    if chunk_size > 0:
+        chunk_results = await gather_bounded((generate_chunk(chunk) for chunk in chunked(items, chunk_size)), max(1, max_parallel_models // chunk_size))
+        return [result for chunk_result in chunk_results for result in chunk_result]
+    return await gather_bounded((generate_one(item) for item in items), max_parallel_models)
@@ -1,10 +1,26 @@
-import io
-import zipfile
-import base64
-import xmltodict
+import asyncio
 from temporalio import workflow
 from datetime import timedelta
-from ..activities.fe_generator import generate_column_setting, generate_i18n, generate_menu, generate_service, generate_configuration, generate_validator
+from config.configuration import GENERATION_CHUNK_SIZE, MAX_PARALLEL_MODELS
+from ..activities.artifact_cache_ops import lookup_artifact_cache
+from ..activities.fe_generator import FE_ARTIFACT_KINDS, generate_fe_artifacts, generate_column_setting, generate_i18n, generate_menu, generate_service, generate_configuration, generate_validator
+from ..activities.template_loader import describe_templates
+from ..activities.artifact_writer import write_archive
+from ..constants import CODEGEN_TASK_QUEUE
+from ..lanes import lane_queue
+from .fan_out import fan_out_models, option_int
+from .progress import GenerationProgress
+from .sharding import finish_shard, generate_in_shards, is_shard, is_sharding, merge_shards, should_shard
+from .template_source import resolve_templates
+
+FE_ACTIVITIES = {
+    "column_setting": generate_column_setting,
+    "service": generate_service,
+    "i18n": generate_i18n,
+    "validator": generate_validator,
+    "menu": generate_menu,
+    "configuration": generate_configuration,
+}
 
 
 @workflow.defn(sandboxed=False)
@@ -19,15 +35,21 @@ class FeCodeGenerationWorkflow:
 
     Cách hoạt động:
     ---------------
-    1. Nhận danh sách các file XML (`template_contents`), mỗi file chứa nội dung mô tả 1 model.
-    2. Parse XML → Dict (`xml_dict`)
-    3. Gọi các activity với timeout:
+    1. Nhận danh sách tham chiếu blob của các file XML (`template_contents`), mỗi file mô tả 1 model.
+    2. Gọi activity `describe_templates` để lấy tên model và digest XML của từng file,
+       rồi `lookup_artifact_cache` để lấy các file đã sinh trước đó với cùng XML và phiên bản generator.
+    3. Chỉ gọi activity cho các file còn thiếu trong cache (mỗi activity tự đọc blob, parse XML và ghi kết quả vào cache):
        - `generate_column_setting`
        - `generate_service`
        - `generate_i18n`
+       - `generate_validator`
        - `generate_menu`
        - `generate_configuration`
-    4. Ghi các file đã sinh vào một file ZIP (dạng base64) để trả về client.
+       Các activity của một model chạy đồng thời, và tối đa `max_parallel_models` model được xử lý cùng lúc.
+       Nếu `chunk_size` > 0, mỗi nhóm `chunk_size` model được sinh bằng một activity batch `generate_fe_artifacts`
+       thay cho 6 activity riêng mỗi model.
+    4. Gộp navigation/configuration theo đúng thứ tự `template_contents` ở bước cuối, nên kết quả luôn tất định.
+    5. Gọi activity `write_archive` ghi các file đã sinh vào một file ZIP trong artifact store để API stream về client.
 
     Thuộc tính lớp:
     ---------------
@@ -35,105 +57,215 @@ class FeCodeGenerationWorkflow:
     - `self.configuration_declare_string`: phần khai báo model trong `config.js`
     - `self.navigation_string`: nội dung file `navigation.js`
     - `self.system_code`, `self.sub_system_code`: mã hệ thống và phân hệ, gắn vào config.
+    - `self.generation_progress`: tiến độ chi tiết, trả về qua query `progress` (xem `GenerationProgress`).
 
     Phương thức:
     ------------
     ### `async def run(self, template_contents, kw={})`
     - **Tham số**:
-      - `template_contents`: List[Dict], mỗi phần tử gồm `filename` và `content` (dạng bytes).
-      - `kw`: Dict tùy chọn (không sử dụng trong phiên bản hiện tại).
+      - `template_contents`: List[Dict], tham chiếu blob `{filename, sha256, size}` do API ghi vào blob store.
+        Hoặc Dict selection `{xml_file_ids}`/`{filters}` trên bảng `xml_files`, được nạp bằng activity `load_xml_file_templates`.
+      - `kw`: Dict tùy chọn, hiện hỗ trợ `max_parallel_models` (mặc định lấy từ `MAX_PARALLEL_MODELS`)
+        và `chunk_size` (mặc định lấy từ `GENERATION_CHUNK_SIZE`).
 
     - **Trả về**:
-      - Dict chứa `"zip_content"` (dữ liệu zip đã encode base64).
+      - Dict chứa `"artifact"`: tham chiếu `{artifact_id, size, sha256}` tới file zip trong artifact store.
 
     - **Chi tiết xử lý**:
     ```text
-    [XML] → [parse] → [generate từng phần] → [ghi file zip] → [base64] → [trả kết quả]
+    [blob refs] → [describe_templates] → [generate song song] → [gộp theo thứ tự] → [write_archive] → [trả tham chiếu artifact]
     """
 
     def __init__(self, **kw):
         self.configuration_import_string = ""
         self.system_code = kw.get("system_code", "SYS")
         self.sub_system_code = kw.get("sub_system_code", "SUB")
-        self.configuration_declare_string = f"""export const config = {{
+        self.configuration_declare_header = f"""export const config = {{
         SYSTEM_CODE: "{self.system_code}",
         SUB_SYSTEM_CODE: "{self.sub_system_code}",
         """
+        self.configuration_declare_string = self.configuration_declare_header
         self.navigation_string = ""
+        self.generation_progress = GenerationProgress()
+
+    @workflow.query
+    def progress(self) -> dict:
+        return self.generation_progress.snapshot()
 
     @workflow.run
     async def run(self, template_contents, kw={}):
         # await workflow.sleep(5)
-        # Tạo buffer zip
-        zip_buffer = io.BytesIO()
+        # Danh sách file sẽ ghi vào ZIP, theo đúng thứ tự
+        entries = []
+        max_parallel_models = option_int(kw, "max_parallel_models", MAX_PARALLEL_MODELS)
+        chunk_size = option_int(kw, "chunk_size", GENERATION_CHUNK_SIZE, minimum=0)
         try:
-            with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
-                # Lặp qua từng model trong template_contents
-                for model in template_contents:
-                    byte_content = bytes(model["content"])
-                    # Kiểm tra xem content có phải là byte string không
-                    if isinstance(byte_content, bytes):
-                        # Nếu là byte string, giải mã nó
-                        content = byte_content.decode("utf-8")
-                    else:
-                        # Nếu không phải byte string, không thể giải mã
-                        workflow.logger.error(f"Invalid content type for {model['filename']}")
-                        raise ValueError(f"Content of {model['filename']} is not a valid byte string", type(model["content"]))
-
-                    xml_dict = xmltodict.parse(content)
-                    model_name = xml_dict["root"]["model"].strip()
-                    class_name = model_name.replace("_", " ").title().replace(" ", "")
-
-                    # Logging thông tin để theo dõi
-                    workflow.logger.info(f"Processing model: {model_name}")
-
-                    # Gọi các hoạt động trong workflow với timeout
-                    try:
-                        column_setting_string = await workflow.execute_activity(generate_column_setting, xml_dict, start_to_close_timeout=timedelta(seconds=30))
-                        service_string = await workflow.execute_activity(generate_service, args=[model_name, xml_dict], start_to_close_timeout=timedelta(seconds=30))
-                        translation_string_vi, translation_string_en = await workflow.execute_activity(generate_i18n, xml_dict, start_to_close_timeout=timedelta(seconds=30))
-                        validator_json = await workflow.execute_activity(generate_validator, xml_dict, start_to_close_timeout=timedelta(seconds=30))
-                        # service_string, translation_string_vi, translation_string_en = "", "", ""
-                    except Exception as e:
-                        workflow.logger.error(f"Error during activity execution: {e}")
-                        raise
-
-                    # Tạo tên file cho các tệp cần nén
-                    class_file_prefix = f"{class_name}"
-                    zip_file.writestr(f"columnsettings/{class_file_prefix}Fields.js", column_setting_string)
-                    zip_file.writestr(f"services/{class_file_prefix}Service.js", service_string)
-                    zip_file.writestr(f"translations/{model_name}/vi.json", translation_string_vi)
-                    zip_file.writestr(f"translations/{model_name}/en.json", translation_string_en)
-                    zip_file.writestr(f"validator/{model_name}.json", validator_json)
-
-                    # Xử lý navigation và configuration
-                    try:
-                        menu_string = await workflow.execute_activity(generate_menu, xml_dict, start_to_close_timeout=timedelta(seconds=30))
-                        import_string, declare_string = await workflow.execute_activity(generate_configuration, xml_dict, start_to_close_timeout=timedelta(seconds=30))
-                        self.navigation_string += menu_string
-                        self.configuration_import_string += import_string
-                        self.configuration_declare_string += declare_string
-                    except Exception as e:
-                        workflow.logger.error(f"Error during configuration generation: {e}")
-                        raise
-
-                # Tạo file configuration.js
-                zip_file.writestr(
-                    "configuration/config.js",
-                    self.configuration_import_string + self.configuration_declare_string + "}",
-                )
-                zip_file.writestr("navigation/navigation.js", self.navigation_string)
+            # Template có thể là tham chiếu blob (upload) hoặc selection trên bảng xml_files
+            if not is_sharding(kw):
+                template_contents = await resolve_templates(template_contents)
+            if is_sharding(kw) or should_shard(template_contents, kw):
+                return await self._run_sharded(template_contents, kw)
+
+            self.generation_progress.set_phase("describing", total=len(template_contents))
+            metadata = await self.generation_progress.timed(
+                "describe_templates",
+                workflow.execute_activity(describe_templates, template_contents, task_queue=lane_queue(CODEGEN_TASK_QUEUE), start_to_close_timeout=timedelta(seconds=30)),
+            )
+
+            # Tra cache theo digest XML, chỉ những file miss mới được lập lịch sinh lại
+            cached = await self.generation_progress.timed(
+                "lookup_artifact_cache",
+                workflow.execute_activity(
+                    lookup_artifact_cache,
+                    args=["fe", [meta["xml_digest"] for meta in metadata], FE_ARTIFACT_KINDS],
+                    task_queue=lane_queue(CODEGEN_TASK_QUEUE),
+                    start_to_close_timeout=timedelta(seconds=30),
+                ),
+            )
+            self.generation_progress.set_phase("generating")
+
+            # Sinh đồng thời nhiều model (giới hạn bởi `max_parallel_models`), theo từng activity hoặc theo nhóm `chunk_size`.
+            # Kết quả luôn giữ đúng thứ tự template_contents
+            generated_models = await fan_out_models(
+                list(zip(template_contents, metadata, cached)),
+                lambda item: self._generate_model_files(*item),
+                lambda items: self._generate_model_files_chunk(items),
+                max_parallel_models,
+                chunk_size,
+            )
+
+            # Bước gộp tất định: ghi file từng model rồi nối navigation/configuration theo thứ tự đầu vào
+            for generated in generated_models:
+                model_name = generated["model_name"]
+
+                # Tạo tên file cho các tệp cần nén
+                class_file_prefix = f"{generated['class_name']}"
+                entries.append({"path": f"columnsettings/{class_file_prefix}Fields.js", "content": generated["column_setting"]})
+                entries.append({"path": f"services/{class_file_prefix}Service.js", "content": generated["service"]})
+                entries.append({"path": f"translations/{model_name}/vi.json", "content": generated["translation_vi"]})
+                entries.append({"path": f"translations/{model_name}/en.json", "content": generated["translation_en"]})
+                entries.append({"path": f"validator/{model_name}.json", "content": generated["validator"]})
 
-            # Lấy nội dung zip và trả về kết quả
-            zip_buffer.seek(0)
-            zip_content = zip_buffer.getvalue()
-            zip_b64 = base64.b64encode(zip_content).decode("utf-8")
+                self.navigation_string += generated["menu"]
+                self.configuration_import_string += generated["configuration_import"]
+                self.configuration_declare_string += generated["configuration_declare"]
+
+            if is_shard(kw):
+                # Shard: workflow cha gộp `config.js`/`navigation.js` từ phần đóng góp của các shard
+                fragments = {
+                    "configuration_import": self.configuration_import_string,
+                    "configuration_declare": self.configuration_declare_string.removeprefix(self.configuration_declare_header),
+                    "navigation": self.navigation_string,
+                }
+                return await finish_shard(entries, fragments, [generated["model_name"] for generated in generated_models], self.generation_progress)
+
+            # Tạo file configuration.js
+            entries.append({"path": "configuration/config.js", "content": self.configuration_import_string + self.configuration_declare_string + "}"})
+            entries.append({"path": "navigation/navigation.js", "content": self.navigation_string})
+
+            # Ghi ZIP vào artifact store, workflow chỉ giữ tham chiếu
+            self.generation_progress.set_phase("archiving")
+            artifact = await self.generation_progress.timed("write_archive", workflow.execute_activity(write_archive, args=[workflow.info().workflow_id, entries], start_to_close_timeout=timedelta(seconds=60)))
 
             # Logging thông tin thành công
             workflow.logger.info("Workflow completed successfully")
+            self.generation_progress.set_phase("completed")
 
-            return {"zip_content": zip_b64}
+            return {"artifact": artifact}
 
         except Exception as e:
             workflow.logger.error(f"Error in workflow execution: {e}")
+            self.generation_progress.set_phase("failed")
+            raise
+
+    async def _run_sharded(self, template_contents, kw):
+        """
+        Chạy batch lớn bằng các child workflow shard rồi gộp kết quả thành một ZIP (xem `sharding.py`).
+        """
+        parts = await generate_in_shards(FeCodeGenerationWorkflow.run, template_contents, kw, self.generation_progress)
+        trailing = [
+            {"path": "configuration/config.js", "fragments": ["configuration_import", {"text": self.configuration_declare_header}, "configuration_declare", {"text": "}"}]},
+            {"path": "navigation/navigation.js", "fragments": ["navigation"]},
+        ]
+        merged = await merge_shards(parts, trailing, self.generation_progress)
+        workflow.logger.info("Workflow completed successfully")
+        self.generation_progress.set_phase("completed")
+        return {"artifact": merged["artifact"]}
+
+    async def _generate_model_files(self, template, meta, cached):
+        """
+        Chạy đồng thời các activity sinh file frontend còn thiếu trong cache cho một model và trả về kết quả thô để bước gộp xử lý.
+        """
+        model_name = meta["model_name"]
+        missing = [kind for kind in FE_ARTIFACT_KINDS if kind not in cached]
+
+        # Logging thông tin để theo dõi
+        workflow.logger.info(f"Processing model: {model_name} ({len(FE_ARTIFACT_KINDS) - len(missing)} cached)")
+        self.generation_progress.start_model(model_name)
+
+        # Gọi các hoạt động trong workflow với timeout
+        try:
+            results = await asyncio.gather(
+                *(
+                    self.generation_progress.timed(
+                        kind,
+                        workflow.execute_activity(FE_ACTIVITIES[kind], args=[model_name, template] if kind == "service" else [template], task_queue=lane_queue(CODEGEN_TASK_QUEUE), start_to_close_timeout=timedelta(seconds=30)),
+                    )
+                    for kind in missing
+                )
+            )
+        except Exception as e:
+            workflow.logger.error(f"Error during activity execution: {e}")
             raise
+
+        self.generation_progress.finish_model(model_name, cached=not missing)
+        return self._build_model_files(meta, {**cached, **dict(zip(missing, results))})
+
+    async def _generate_model_files_chunk(self, items):
+        """
+        Sinh các file frontend còn thiếu trong cache của một nhóm model bằng một activity batch `generate_fe_artifacts` duy nhất.
+        """
+        pending = [index for index, (_, _, cached) in enumerate(items) if any(kind not in cached for kind in FE_ARTIFACT_KINDS)]
+        kinds = [kind for kind in FE_ARTIFACT_KINDS if any(kind not in items[index][2] for index in pending)]
+        workflow.logger.info(f"Processing chunk of {len(items)} models ({len(items) - len(pending)} cached)")
+
+        for index in pending:
+            self.generation_progress.start_model(items[index][1]["model_name"])
+
+        outputs = []
+        if pending:
+            try:
+                outputs = await self.generation_progress.timed(
+                    "generate_fe_artifacts",
+                    workflow.execute_activity(
+                        generate_fe_artifacts,
+                        args=[[items[index][0] for index in pending], kinds],
+                        task_queue=lane_queue(CODEGEN_TASK_QUEUE),
+                        start_to_close_timeout=timedelta(seconds=30 * len(pending)),
+                    ),
+                )
+            except Exception as e:
+                workflow.logger.error(f"Error during activity execution: {e}")
+                raise
+
+        generated = dict(zip(pending, outputs))
+        for index, (_, meta, _) in enumerate(items):
+            self.generation_progress.finish_model(meta["model_name"], cached=index not in generated)
+        return [self._build_model_files(meta, {**generated.get(index, {}), **cached}) for index, (_, meta, cached) in enumerate(items)]
+
+    def _build_model_files(self, meta, outputs):
+        model_name = meta["model_name"]
+        translation_string_vi, translation_string_en = outputs["i18n"]
+        import_string, declare_string = outputs["configuration"]
+        return {
+            "model_name": model_name,
+            "class_name": model_name.replace("_", " ").title().replace(" ", ""),
+            "column_setting": outputs["column_setting"],
+            "service": outputs["service"],
+            "translation_vi": translation_string_vi,
+            "translation_en": translation_string_en,
+            "validator": outputs["validator"],
+            "menu": outputs["menu"],
+            "configuration_import": import_string,
+            "configuration_declare": declare_string,
+        }
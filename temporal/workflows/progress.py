@@ -0,0 +1,89 @@
+from typing import Awaitable
+
+from temporalio import workflow
+
+
+class GenerationProgress:
+    """
+    Tiến độ chi tiết của một workflow sinh mã, được trả về qua query `progress` của workflow.
+
+    - `phase`: bước hiện tại (`describing`, `generating`, `archiving`, `completed`, `failed`...).
+    - `processed`/`total`: số model (hoặc file) đã xử lý xong trên tổng số; `cached`: số model lấy hoàn toàn từ cache.
+    - `current`: các model đang được sinh (nhiều model chạy song song), `current_model` là model bắt đầu gần nhất.
+    - `timings`: thời gian theo từng loại artifact/activity (số lần, tổng, trung bình, lớn nhất, tính bằng ms).
+    - `version` tăng sau mỗi thay đổi để phía API phát hiện snapshot mới mà không phải so sánh toàn bộ.
+
+    Thời gian được đo bằng `workflow.now()` nên tất định khi replay.
+    """
+
+    def __init__(self):
+        self.phase = "pending"
+        self.total = 0
+        self.processed = 0
+        self.cached = 0
+        self.current: list[str] = []
+        self.timings: dict[str, dict] = {}
+        self.version = 0
+        self.updated_at = None
+
+    def _touch(self):
+        self.version += 1
+        self.updated_at = workflow.now().isoformat()
+
+    def set_phase(self, phase: str, total: int = None):
+        self.phase = phase
+        if total is not None:
+            self.total = total
+        self._touch()
+
+    def start_model(self, name: str):
+        self.current.append(name)
+        self._touch()
+
+    def finish_model(self, name: str, cached: bool = False):
+        if name in self.current:
+            self.current.remove(name)
+        self.processed += 1
+        if cached:
+            self.cached += 1
+        self._touch()
+
+    def finish_batch(self, name: str, count: int, cached: int = 0):
+        """
+        Ghi nhận một nhóm model đã xong cùng lúc (vd. một child workflow shard).
+        """
+        if name in self.current:
+            self.current.remove(name)
+        self.processed += count
+        self.cached += cached
+        self._touch()
+
+    def record_timing(self, kind: str, milliseconds: float):
+        timing = self.timings.setdefault(kind, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+        timing["count"] += 1
+        timing["total_ms"] += milliseconds
+        timing["max_ms"] = max(timing["max_ms"], milliseconds)
+        self._touch()
+
+    async def timed(self, kind: str, awaitable: Awaitable):
+        """
+        Chờ `awaitable` (thường là `workflow.execute_activity(...)`) và ghi thời gian chạy vào `timings[kind]`.
+        """
+        started = workflow.now()
+        try:
+            return await awaitable
+        finally:
+            self.record_timing(kind, (workflow.now() - started).total_seconds() * 1000)
+
+    def snapshot(self) -> dict:
+        return {
+            "phase": self.phase,
+            "total": self.total,
+            "processed": self.processed,
+            "cached": self.cached,
+            "current": list(self.current),
+            "current_model": self.current[-1] if self.current else None,
+            "timings": {kind: {**timing, "avg_ms": round(timing["total_ms"] / timing["count"], 1), "total_ms": round(timing["total_ms"], 1), "max_ms": round(timing["max_ms"], 1)} for kind, timing in self.timings.items()},
+            "version": self.version,
+            "updated_at": self.updated_at,
+        }
@@ -0,0 +1,108 @@
+import math
+from datetime import timedelta
+
+from temporalio import workflow
+
+from config.configuration import GENERATION_MAX_PARALLEL_SHARDS, GENERATION_SHARD_SIZE, GENERATION_SHARD_THRESHOLD, GENERATION_SHARDS_PER_RUN
+from ..activities.shard_parts import write_archive_from_parts, write_shard_part, write_template_manifest
+from ..constants import DEFAULT_TASK_QUEUE
+from ..lanes import lane_queue
+from .fan_out import gather_bounded, option_int
+from .progress import GenerationProgress
+
+# Khóa trong `kw` đánh dấu child workflow là một shard (giá trị là số thứ tự shard)
+SHARD_KW = "_shard"
+# Khóa trong `kw` mang trạng thái của workflow cha qua các lần continue-as-new
+SHARDING_KW = "_sharding"
+
+
+def is_shard(kw: dict) -> bool:
+    return SHARD_KW in (kw or {})
+
+
+def is_sharding(kw: dict) -> bool:
+    return SHARDING_KW in (kw or {})
+
+
+def should_shard(template_contents: list, kw: dict) -> bool:
+    """
+    Batch có nhiều hơn `shard_threshold` template (mặc định `GENERATION_SHARD_THRESHOLD`, 0 = tắt) được chia shard.
+    Bản thân shard không bao giờ chia tiếp.
+    """
+    threshold = option_int(kw, "shard_threshold", GENERATION_SHARD_THRESHOLD, minimum=0)
+    return not is_shard(kw) and threshold > 0 and len(template_contents) > threshold
+
+
+def shard_kw(kw: dict) -> dict:
+    """
+    `kw` gốc của request, bỏ các khóa nội bộ dùng cho sharding (vd. để truyền sang workflow deploy).
+    """
+    return {key: value for key, value in (kw or {}).items() if key not in (SHARD_KW, SHARDING_KW)}
+
+
+async def generate_in_shards(workflow_run, template_contents, kw: dict, progress: GenerationProgress) -> list[dict]:
+    """
+    Sinh mã cho một batch lớn bằng các child workflow, mỗi child `shard_size` model.
+
+    - Lần chạy đầu ghi danh sách template vào manifest trong blob store; child chỉ nhận `{manifest, start, end}`
+      và trả về tham chiếu kết quả (`write_shard_part`), nên history của workflow cha không chứa nội dung code.
+    - Tối đa `max_parallel_shards` child chạy cùng lúc. Sau mỗi `shards_per_run` shard, workflow cha
+      continue-as-new với trạng thái gọn (manifest, tham chiếu các shard đã xong, tiến độ), nên history
+      luôn bị chặn bất kể kích thước batch.
+    - Trả về tham chiếu kết quả của mọi shard theo thứ tự (chỉ ở lần chạy cuối).
+    """
+    state = kw.get(SHARDING_KW)
+    if state is None:
+        manifest = await workflow.execute_activity(write_template_manifest, template_contents, start_to_close_timeout=timedelta(seconds=60))
+        state = {"manifest": manifest, "total": len(template_contents), "shard_size": option_int(kw, "shard_size", GENERATION_SHARD_SIZE), "next": 0, "parts": [], "processed": 0, "cached": 0}
+
+    total, shard_size = state["total"], state["shard_size"]
+    shard_count = math.ceil(total / shard_size)
+    run_end = min(shard_count, state["next"] + option_int(kw, "shards_per_run", GENERATION_SHARDS_PER_RUN))
+    child_kw = shard_kw(kw)
+
+    progress.set_phase("generating", total=total)
+    progress.processed, progress.cached = state["processed"], state["cached"]
+
+    async def run_shard(index: int) -> dict:
+        shard_id = f"{workflow.info().workflow_id}-shard-{index}"
+        start = index * shard_size
+        progress.start_model(shard_id)
+        result = await workflow.execute_child_workflow(
+            workflow_run,
+            args=[{"manifest": state["manifest"], "start": start, "end": min(start + shard_size, total)}, {**child_kw, SHARD_KW: index}],
+            id=shard_id,
+            task_queue=lane_queue(DEFAULT_TASK_QUEUE),
+        )
+        progress.finish_batch(shard_id, result["count"], result["cached"])
+        return result["part"]
+
+    parts = state["parts"] + await gather_bounded((run_shard(index) for index in range(state["next"], run_end)), option_int(kw, "max_parallel_shards", GENERATION_MAX_PARALLEL_SHARDS))
+    if run_end < shard_count:
+        workflow.continue_as_new(args=[None, {**kw, SHARDING_KW: {**state, "next": run_end, "parts": parts, "processed": progress.processed, "cached": progress.cached}}])
+    return parts
+
+
+async def finish_shard(entries: list[dict], fragments: dict, models: list[str], progress: GenerationProgress, **extra) -> dict:
+    """
+    Kết thúc một shard: lưu file từng model và phần đóng góp vào các file gộp vào blob store,
+    trả về kết quả gọn cho workflow cha.
+    """
+    progress.set_phase("archiving")
+    part = await progress.timed(
+        "write_shard_part",
+        workflow.execute_activity(write_shard_part, {"entries": entries, "fragments": fragments, "models": models, **extra}, start_to_close_timeout=timedelta(seconds=60)),
+    )
+    progress.set_phase("completed")
+    return {"part": part, "count": len(models), "cached": progress.cached}
+
+
+async def merge_shards(parts: list[dict], trailing: list[dict], progress: GenerationProgress) -> dict:
+    """
+    Gộp kết quả các shard thành ZIP cuối cùng (xem `write_archive_from_parts`), trả về `{artifact, models}`.
+    """
+    progress.set_phase("archiving")
+    return await progress.timed(
+        "write_archive",
+        workflow.execute_activity(write_archive_from_parts, args=[workflow.info().workflow_id, parts, trailing], start_to_close_timeout=timedelta(seconds=300)),
+    )
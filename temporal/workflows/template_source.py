@@ -0,0 +1,21 @@
+from datetime import timedelta
+
+from temporalio import workflow
+
+from ..activities.shard_parts import load_template_manifest
+from ..activities.xml_file_loader import load_xml_file_templates
+
+
+async def resolve_templates(template_contents) -> list[dict]:
+    """
+    Chuẩn hóa đầu vào của workflow sinh mã thành danh sách tham chiếu blob `{filename, sha256, size}`.
+
+    - Danh sách: template đã được API ghi vào blob store (upload/raw), dùng nguyên trạng.
+    - Dict selection (`xml_file_ids` hoặc `filters`): template lấy từ bảng `xml_files` qua activity `load_xml_file_templates`.
+    - Dict `{manifest, start, end}`: phần việc của một shard, đọc từ manifest do workflow cha ghi (xem `sharding.py`).
+    """
+    if isinstance(template_contents, dict) and "manifest" in template_contents:
+        return await workflow.execute_activity(load_template_manifest, args=[template_contents["manifest"], template_contents["start"], template_contents["end"]], start_to_close_timeout=timedelta(seconds=60))
+    if isinstance(template_contents, dict):
+        return await workflow.execute_activity(load_xml_file_templates, template_contents, start_to_close_timeout=timedelta(seconds=120))
+    return template_contents
@@ -1,81 +1,92 @@
-import io
-import zipfile
-import base64
-import xmltodict
 import asyncio
 from temporalio import workflow
 from datetime import timedelta
+from ..activities.artifact_cache_ops import lookup_artifact_cache
 from ..activities.unit_test_generator import generate_unit_tests, collect_table_contexts
+from ..activities.template_loader import describe_templates
+from ..activities.artifact_writer import write_archive
+from ..constants import CODEGEN_TASK_QUEUE, DB_CONTEXT_TASK_QUEUE
+from ..lanes import lane_queue
+from .progress import GenerationProgress
+from .template_source import resolve_templates
 import json
 
 
-def extract_foreign_keys_from_all(xml_dicts):
+def extract_foreign_keys_from_all(metadata):
     foreign_keys = set()
-    for xml_dict in xml_dicts:
-        try:
-            foreign_keys.add(xml_dict.get("root", {}).get("model", ""))
-            fields = xml_dict.get("root", {}).get("fields", {}).get("field", [])
-            if isinstance(fields, dict):
-                fields = [fields]  # convert single field to list
-            for field in fields:
-                fk = field.get("foreign_key")
-                if fk:
-                    model_name = fk.split(",")[0].strip()
-                    if model_name:
-                        foreign_keys.add(model_name)
-        except Exception as e:
-            workflow.logger.error(f"Error extracting foreign key: {e}")
-            return []
-    return list(foreign_keys)
+    for meta in metadata:
+        if meta.get("model_name"):
+            foreign_keys.add(meta["model_name"])
+        foreign_keys.update(meta.get("foreign_models", []))
+    return sorted(foreign_keys)
 
 
 @workflow.defn(sandboxed=False)
 class UnitTestGenerationWorkflow:
+    def __init__(self):
+        self.generation_progress = GenerationProgress()
+
+    @workflow.query
+    def progress(self) -> dict:
+        return self.generation_progress.snapshot()
 
     @workflow.run
     async def run(self, template_contents, kw={}):
         await workflow.sleep(5)
-        zip_buffer = io.BytesIO()
+        entries = []
         try:
-            xml_contexts = []
-            parsed_models = []
-
-            # Parse all XML models first
-            for model in template_contents:
-                byte_content = bytes(model["content"])
-                if isinstance(byte_content, bytes):
-                    content = byte_content.decode("utf-8")
-                else:
-                    workflow.logger.error(f"Invalid content type for {model['filename']}")
-                    raise ValueError(f"Content of {model['filename']} is not a valid byte string", type(model["content"]))
-
-                xml_dict = xmltodict.parse(content)
-                xml_contexts.append(xml_dict)
-                parsed_models.append({"filename": model["filename"], "xml_context": xml_dict})
+            # Read model metadata (model name + foreign keys) from the blob references
+            # Templates are blob refs (upload) or a selection over the xml_files table
+            template_contents = await resolve_templates(template_contents)
+            self.generation_progress.set_phase("describing", total=len(template_contents))
+            metadata = await self.generation_progress.timed(
+                "describe_templates",
+                workflow.execute_activity(describe_templates, template_contents, task_queue=lane_queue(CODEGEN_TASK_QUEUE), start_to_close_timeout=timedelta(seconds=30)),
+            )
 
             # Extract all foreign keys at once
-            foreign_list = extract_foreign_keys_from_all(xml_contexts)
+            foreign_list = extract_foreign_keys_from_all(metadata)
 
             # Load DB context once
-            db_context = await workflow.execute_activity(collect_table_contexts, foreign_list, start_to_close_timeout=timedelta(seconds=30))
+            db_context = await self.generation_progress.timed(
+                "collect_table_contexts",
+                workflow.execute_activity(collect_table_contexts, foreign_list, task_queue=lane_queue(DB_CONTEXT_TASK_QUEUE), start_to_close_timeout=timedelta(seconds=30)),
+            )
+
+            # Reuse test cases generated earlier for the same XML, DB context and generator version
+            cached = await workflow.execute_activity(
+                lookup_artifact_cache,
+                args=["ut", [meta["xml_digest"] for meta in metadata], ["unit_tests"], db_context],
+                task_queue=lane_queue(CODEGEN_TASK_QUEUE),
+                start_to_close_timeout=timedelta(seconds=30),
+            )
 
-            # Generate test cases per model
-            with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
-                for parsed in parsed_models:
-                    unit_test_files = await workflow.execute_activity(generate_unit_tests, args=[parsed["xml_context"], db_context], start_to_close_timeout=timedelta(seconds=60))
+            # Generate test cases per model (cache misses only)
+            self.generation_progress.set_phase("generating")
+            for template, meta, hits in zip(template_contents, metadata, cached):
+                model_name = meta.get("model_name") or template["filename"]
+                self.generation_progress.start_model(model_name)
+                unit_test_files = hits.get("unit_tests")
+                if unit_test_files is None:
+                    unit_test_files = await self.generation_progress.timed(
+                        "unit_tests",
+                        workflow.execute_activity(generate_unit_tests, args=[template, db_context], task_queue=lane_queue(CODEGEN_TASK_QUEUE), start_to_close_timeout=timedelta(seconds=60)),
+                    )
+                self.generation_progress.finish_model(model_name, cached="unit_tests" in hits)
 
-                    for filename, content in unit_test_files.items():
-                        if isinstance(content, list):
-                            content = json.dumps(content, ensure_ascii=False, indent=2)
-                        zip_file.writestr(filename + ".js", content)
+                for filename, content in unit_test_files.items():
+                    if isinstance(content, list):
+                        content = json.dumps(content, ensure_ascii=False, indent=2)
+                    entries.append({"path": filename + ".js", "content": content})
 
-            # Return base64 encoded zip
-            zip_buffer.seek(0)
-            zip_content = zip_buffer.getvalue()
-            zip_b64 = base64.b64encode(zip_content).decode("utf-8")
+            # Write the zip to the artifact store and return its reference
+            self.generation_progress.set_phase("archiving")
+            artifact = await self.generation_progress.timed("write_archive", workflow.execute_activity(write_archive, args=[workflow.info().workflow_id, entries], start_to_close_timeout=timedelta(seconds=60)))
             workflow.logger.info("Unit test generation workflow completed successfully")
-            return {"zip_content": zip_b64}
+            self.generation_progress.set_phase("completed")
+            return {"artifact": artifact}
 
         except Exception as e:
             workflow.logger.error(f"Error in unit test generation workflow: {e}")
+            self.generation_progress.set_phase("failed")
             raise
@@ -1,63 +1,177 @@
 from temporalio import workflow
 
-from ..activities.xml_generator import generate_xml
-import base64
-import zipfile
-import io
+from ..activities.xml_generator import generate_sheet_xml, generate_xml, list_xml_sheets
 from datetime import timedelta
+from config.configuration import GENERATION_CHUNK_SIZE, MAX_PARALLEL_MODELS, XML_MAX_PARALLEL_WORKBOOKS
+from ..activities.artifact_writer import write_archive
 from ..activities.db_writer import save_generated_xml
 from ..activities.git_job_ops import request_git_sync
+from ..constants import EXCEL_TASK_QUEUE
+from ..lanes import lane_queue
+from .fan_out import fan_out_models, gather_bounded, option_int
+from .progress import GenerationProgress
+
+# Patch ID của luồng sinh XML theo sheet (`generate_workbook`). Run bắt đầu trước khi có patch này vẫn replay
+# theo luồng cũ (`run_per_workbook`: một activity `generate_xml` và một `save_generated_xml` cho mỗi workbook).
+# Khi không còn run cũ nào đang chạy, đổi sang `workflow.deprecate_patch` rồi xóa `run_per_workbook`.
+SHEET_ACTIVITIES_PATCH = "xml-sheet-activities"
 
 
 @workflow.defn(sandboxed=False)
 class XMLGenerationWorkflow:
+    def __init__(self):
+        self.generation_progress = GenerationProgress()
+
+    @workflow.query
+    def progress(self) -> dict:
+        return self.generation_progress.snapshot()
+
+    async def generate_workbook(self, file: dict, kw: dict) -> dict:
+        """
+        Sinh XML cho một workbook, mỗi sheet (model) là một activity riêng trên queue `excel-parse`.
+
+        - Tối đa `max_parallel_models` sheet chạy cùng lúc; `chunk_size` > 0 gom mỗi nhóm N sheet vào một activity.
+        - Kết quả được gộp theo thứ tự sheet trong workbook (không theo thứ tự hoàn thành), nên giống hệt khi
+          xử lý tuần tự, kể cả khi hai sheet cho cùng tên model (sheet sau ghi đè).
+        """
+        self.generation_progress.start_model(file["filename"])
+        sheet_names = await workflow.execute_activity(
+            list_xml_sheets,
+            file,
+            task_queue=lane_queue(EXCEL_TASK_QUEUE),
+            start_to_close_timeout=timedelta(seconds=30),
+        )
+
+        async def generate_sheets(names: list[str]) -> list:
+            # Mỗi activity mở lại workbook và xử lý tuần tự các sheet của nhóm: timeout tăng theo số sheet
+            return await self.generation_progress.timed(
+                "generate_xml",
+                workflow.execute_activity(
+                    generate_sheet_xml,
+                    args=[file, names, kw],
+                    task_queue=lane_queue(EXCEL_TASK_QUEUE),
+                    start_to_close_timeout=timedelta(seconds=30 * len(names)),
+                ),
+            )
+
+        async def generate_sheet(name: str) -> list:
+            return (await generate_sheets([name]))[0]
+
+        results = await fan_out_models(
+            sheet_names,
+            generate_sheet,
+            generate_sheets,
+            option_int(kw, "max_parallel_models", MAX_PARALLEL_MODELS),
+            option_int(kw, "chunk_size", GENERATION_CHUNK_SIZE, minimum=0),
+        )
+        self.generation_progress.finish_model(file["filename"])
+        return {model_name: xml_string for model_name, xml_string in results}
+
+    async def generate_and_save(self, template_contents, kw: dict) -> list:
+        """
+        Sinh XML các workbook song song (`generate_workbook`), lưu một lần và yêu cầu một lần đồng bộ git; trả về danh sách file cho ZIP.
+        """
+        workbooks = await gather_bounded(
+            (self.generate_workbook(file, kw) for file in template_contents),
+            option_int(kw, "max_parallel_workbooks", XML_MAX_PARALLEL_WORKBOOKS),
+        )
+        xml_dict = {}
+        for workbook in workbooks:
+            xml_dict.update(workbook)
+
+        if xml_dict:
+            self.generation_progress.set_phase("saving")
+            await self.generation_progress.timed(
+                "save_generated_xml",
+                workflow.execute_activity(
+                    save_generated_xml,
+                    args=[xml_dict, kw.get("module", "categories")],
+                    start_to_close_timeout=timedelta(seconds=120),
+                ),
+            )
+            await workflow.execute_activity(
+                request_git_sync,
+                "db_to_git",
+                start_to_close_timeout=timedelta(seconds=30),
+            )
+
+        # Danh sách file sẽ ghi vào ZIP, theo đúng thứ tự
+        return [{"path": f"xml/{model_name}_schema.xml", "content": xml_string} for model_name, xml_string in xml_dict.items()]
+
+    async def run_per_workbook(self, template_contents, kw: dict) -> list:
+        """
+        Luồng trước patch `SHEET_ACTIVITIES_PATCH`, giữ nguyên thứ tự lệnh để các run cũ replay được:
+        mỗi workbook một activity `generate_xml` rồi một `save_generated_xml`, tuần tự; trả về danh sách file cho ZIP.
+        """
+        entries = []
+        for file in template_contents:
+            self.generation_progress.start_model(file["filename"])
+            xml_dict = await self.generation_progress.timed(
+                "generate_xml",
+                workflow.execute_activity(
+                    generate_xml,
+                    args=[file, kw],
+                    task_queue=lane_queue(EXCEL_TASK_QUEUE),
+                    start_to_close_timeout=timedelta(seconds=30),
+                ),
+            )
+
+            await self.generation_progress.timed(
+                "save_generated_xml",
+                workflow.execute_activity(
+                    save_generated_xml,
+                    args=[xml_dict, kw.get("module", "categories")],
+                    start_to_close_timeout=timedelta(seconds=60),
+                ),
+            )
+            self.generation_progress.finish_model(file["filename"])
+            for model_name, xml_string in xml_dict.items():
+                entries.append({"path": f"xml/{model_name}_schema.xml", "content": xml_string})
+
+        if template_contents:
+            await workflow.execute_activity(
+                request_git_sync,
+                "db_to_git",
+                start_to_close_timeout=timedelta(seconds=30),
+            )
+        return entries
 
     @workflow.run
     async def run(self, template_contents, kw={}):
-        # await workflow.sleep(5)
-        # Tạo buffer zip
-        zip_buffer = io.BytesIO()
-        requires_git_sync = False
+        """
+        Sinh XML từ các workbook được upload, lưu vào DB, đồng bộ git và ghi ZIP kết quả.
+
+        - Tối đa `max_parallel_workbooks` workbook (mặc định `XML_MAX_PARALLEL_WORKBOOKS`) được xử lý cùng lúc,
+          mỗi workbook tách thành activity theo sheet (xem `generate_workbook`), nên thông lượng tăng theo số worker `excel-parse`.
+        - XML của mọi workbook được gộp theo thứ tự upload (model trùng tên thì workbook sau ghi đè), lưu bằng một activity
+          `save_generated_xml` duy nhất, rồi yêu cầu đúng một lần đồng bộ DB -> git cho toàn bộ thay đổi.
+        - Run bắt đầu trước patch `SHEET_ACTIVITIES_PATCH` đi theo `run_per_workbook`.
+        """
         try:
-            with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
-                for file in template_contents:
-                    content = bytes(file["content"])
-                    if not isinstance(content, bytes):
-                        raise ValueError("File content must be bytes")
-
-                    xml_dict = await workflow.execute_activity(
-                        generate_xml,
-                        args=[content, kw],
-                        start_to_close_timeout=timedelta(seconds=30),
-                    )
-
-                    await workflow.execute_activity(
-                        save_generated_xml,
-                        args=[xml_dict, kw.get("module", "categories")],
-                        start_to_close_timeout=timedelta(seconds=60),
-                    )
-                    requires_git_sync = True
-                    for model_name, xml_string in xml_dict.items():
-                        # Tạo tên file cho các tệp cần nén
-                        zip_file.writestr(f"xml/{model_name}_schema.xml", xml_string)
-
-            if requires_git_sync:
-                await workflow.execute_activity(
-                    request_git_sync,
-                    "db_to_git",
-                    start_to_close_timeout=timedelta(seconds=30),
-                )
+            self.generation_progress.set_phase("generating", total=len(template_contents))
+            if workflow.patched(SHEET_ACTIVITIES_PATCH):
+                entries = await self.generate_and_save(template_contents, kw)
+            else:
+                entries = await self.run_per_workbook(template_contents, kw)
 
-            # Lấy nội dung zip và trả về kết quả
-            zip_buffer.seek(0)
-            zip_content = zip_buffer.getvalue()
-            zip_b64 = base64.b64encode(zip_content).decode("utf-8")
+            # Ghi ZIP vào artifact store, workflow chỉ giữ tham chiếu
+            self.generation_progress.set_phase("archiving")
+            artifact = await self.generation_progress.timed(
+                "write_archive",
+                workflow.execute_activity(
+                    write_archive,
+                    args=[workflow.info().workflow_id, entries],
+                    start_to_close_timeout=timedelta(seconds=60),
+                ),
+            )
 
             # Logging thông tin thành công
             workflow.logger.info("Workflow completed successfully")
+            self.generation_progress.set_phase("completed")
 
-            return {"zip_content": zip_b64}
+            return {"artifact": artifact}
 
         except Exception as e:
             workflow.logger.error(f"Error in workflow execution: {e}")
+            self.generation_progress.set_phase("failed")
             raise